@@ -2,7 +2,9 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import json, random, time
 from typing import List, Optional
-from .participants_api import ROOMS, topics, votes
+from .participants_api import ROOMS, save_room_workspace
+from .room_store import room_store
+from .room_lifecycle import room_lifecycle
 from .ai_config import ai_config
 from .ai_client import ai_client
 from .ai_prompts import prompt_builder, topic_parser
@@ -70,12 +72,11 @@ async def summary_ai(req: SummaryRequest):
     - summary (str): AI 生成的總結文字
     """
     # 檢查討論室是否存在
-    if req.room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(req.room):
         return {"summary": "錯誤：找不到指定的討論室。"}
 
-    # 組合主題 ID 並檢查主題是否存在
-    topic_id = f"{req.room}_{req.topic}"
-    if topic_id not in topics:
+    # 檢查主題是否存在
+    if not room_store.has_topic(req.room, req.topic):
         return {"summary": "錯誤：在該討論室中找不到指定的主題。"}
 
     # 使用prompt_builder的方法來建立 prompt
@@ -96,10 +97,8 @@ async def summary_ai(req: SummaryRequest):
             print(f"⚠️ 討論 {req.room} 沒有預設workspace，正在創建...")
             workspace_slug = await ai_client.ensure_workspace_exists(req.room, room_title)
             # 更新討論數據
-            ROOMS[req.room]['workspace_slug'] = workspace_slug
             workspace_info = await ai_client.get_workspace_info(workspace_slug)
-            if workspace_info and "id" in workspace_info:
-                ROOMS[req.room]['workspace_id'] = workspace_info["id"]
+            await save_room_workspace(req.room, workspace_slug, workspace_info)
         else:
             print(f"✅ 使用討論專屬workspace: {workspace_slug}")
         
@@ -170,7 +169,7 @@ async def generate_ai_topics(req: GenerateTopicsRequest):
     # 呼叫 AnythingLLM API
     try:
         # 優先使用討論專屬workspace，如果沒有提供room_code則創建臨時workspace
-        if req.room_code and req.room_code in ROOMS:
+        if req.room_code and room_lifecycle.ensure_loaded(req.room_code):
             # 使用真實討論的專屬workspace
             room_data = ROOMS[req.room_code]
             workspace_slug = room_data.get('workspace_slug')
@@ -178,10 +177,8 @@ async def generate_ai_topics(req: GenerateTopicsRequest):
                 print(f"⚠️ 討論 {req.room_code} 沒有預設workspace，正在創建...")
                 workspace_slug = await ai_client.ensure_workspace_exists(req.room_code, meeting_title)
                 # 更新討論數據
-                ROOMS[req.room_code]['workspace_slug'] = workspace_slug
                 workspace_info = await ai_client.get_workspace_info(workspace_slug)
-                if workspace_info and "id" in workspace_info:
-                    ROOMS[req.room_code]['workspace_id'] = workspace_info["id"]
+                await save_room_workspace(req.room_code, workspace_slug, workspace_info)
             else:
                 print(f"✅ 使用討論專屬workspace: {workspace_slug}")
         else:
@@ -218,7 +215,7 @@ async def generate_single_topic(req: GenerateSingleTopicRequest):
     - topic (str): AI 生成的主題字串
     """
     # 檢查討論室是否存在
-    if req.room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(req.room):
         return {"topic": "錯誤：找不到指定的討論室。"}
 
     room_data = ROOMS[req.room]
@@ -241,10 +238,8 @@ async def generate_single_topic(req: GenerateSingleTopicRequest):
             print(f"⚠️ 討論 {req.room} 沒有預設workspace，正在創建...")
             workspace_slug = await ai_client.ensure_workspace_exists(req.room, room_title)
             # 更新討論數據
-            ROOMS[req.room]['workspace_slug'] = workspace_slug
             workspace_info = await ai_client.get_workspace_info(workspace_slug)
-            if workspace_info and "id" in workspace_info:
-                ROOMS[req.room]['workspace_id'] = workspace_info["id"]
+            await save_room_workspace(req.room, workspace_slug, workspace_info)
         else:
             print(f"✅ 使用討論專屬workspace: {workspace_slug}")
         
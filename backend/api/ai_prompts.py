@@ -6,7 +6,10 @@ AI Prompt 構建模組
 import json
 import re
 from typing import List, Dict, Any, Optional
-from .participants_api import ROOMS, topics, votes
+from .room_store import room_store
+
+# 總結 prompt 最多列出的留言數（依票數排名取前幾名），避免超出模型的上下文長度
+SUMMARY_MAX_COMMENTS = 200
 
 class PromptBuilder:
     """AI Prompt 構建器"""
@@ -24,16 +27,14 @@ class PromptBuilder:
             構建好的 prompt 字串
         """
         # 檢查討論室是否存在
-        if room not in ROOMS:
+        room_data = room_store.get_room(room)
+        if room_data is None:
             return "錯誤：找不到指定的討論室。"
 
-        # 組合主題 ID 並檢查主題是否存在
-        topic_id = f"{room}_{topic}"
-        if topic_id not in topics:
+        # 檢查主題是否存在
+        topic_data = room_store.get_topic(room, topic)
+        if topic_data is None:
             return "錯誤：在該討論室中找不到指定的主題。"
-
-        room_data = ROOMS[room]
-        topic_data = topics[topic_id]
         
         # 開始建立 Prompt
         prompt = f"主題: {topic}\n"
@@ -45,26 +46,26 @@ class PromptBuilder:
 
         prompt += "\n留言與票數:\n"
 
-        # 取得該主題的所有留言與其對應的票數
+        # 依票數排名取出留言（由分數索引直接取前幾名）與其對應的票數
         comments_for_prompt = []
-        if "comments" in topic_data:
-            for c in topic_data["comments"]:
-                comment_id = c.get("id")
-                nickname = c.get("nickname", "匿名")
-                content = c.get("content", "")
-                
-                # 從 votes 字典中取得票數
-                good_votes = len(votes.get(comment_id, {}).get("good", []))
-                bad_votes = len(votes.get(comment_id, {}).get("bad", []))
+        for c in room_store.top_comments(room, topic, SUMMARY_MAX_COMMENTS):
+            nickname = c.nickname or "匿名"
+            content = c.content
 
-                comments_for_prompt.append(
-                    f"- {nickname}：{content}（👍{good_votes}、👎{bad_votes}）"
-                )
+            # 從 room_store 取得票數
+            good_votes, bad_votes = room_store.vote_counts(c.id)
+
+            comments_for_prompt.append(
+                f"- {nickname}：{content}（👍{good_votes}、👎{bad_votes}）"
+            )
 
         if not comments_for_prompt:
             prompt += "目前這個主題還沒有任何留言。\n"
         else:
             prompt += "\n".join(comments_for_prompt)
+            total = len(topic_data["comments"])
+            if total > len(comments_for_prompt):
+                prompt += f"\n（共 {total} 則留言，僅列出票數最高的 {len(comments_for_prompt)} 則）"
 
         # 加上固定的指令模板
         prompt += """
@@ -137,11 +138,10 @@ class PromptBuilder:
             構建好的 prompt 字串
         """
         # 檢查討論室是否存在
-        if room not in ROOMS:
+        room_data = room_store.get_room(room)
+        if room_data is None:
             return "錯誤：找不到指定的討論室。"
 
-        room_data = ROOMS[room]
-
         # 開始建立 Prompt
         prompt = f"討論名稱: {room_data.get('title', '未命名討論')}\n"
         prompt += f"討論代碼: {room}\n"
@@ -158,10 +158,7 @@ class PromptBuilder:
             prompt += f"參與者: {', '.join(participants)}\n"
         
         # 找出該討論室的所有已有主題
-        existing_topics = [
-            t["topic_name"] for t_id, t in topics.items() 
-            if t["room_id"] == room and "topic_name" in t
-        ]
+        existing_topics = room_store.topic_names(room)
         
         if existing_topics:
             prompt += "\n已有的主題:\n"
@@ -0,0 +1,332 @@
+"""
+討論室事件日誌儲存模組
+每個變更以二進位紀錄附加到日誌檔，請求執行緒只寫入記憶體緩衝區，
+背景執行緒定期一次寫出並 fsync（批次落盤），每次請求幾乎沒有額外成本。
+
+日誌依段落編號輪替：寫快照時先切換到新段落，再把目前狀態壓縮成只含
+房間、主題、留言、投票的紀錄寫入 snapshot-<段落>.bin，舊段落即可刪除。
+啟動時載入最新快照，再重播其後的日誌段落。重播是冪等的，
+因此快照與新段落有少量重疊也不影響結果。
+
+快照中每個房間的紀錄在該房間的 actor 中取得（與 state_dump 相同），同一房間的內容一致。
+留言紀錄帶有序號，重播後沿用原本的序號，用戶端持有的分頁游標在重新啟動後仍然有效。
+
+紀錄格式：<payload 長度 u32><crc32 u32><操作碼 u8><payload JSON>
+"""
+
+import json
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .records import CommentRecord
+from .room_actor import room_actors
+from .storage import StorageBackend
+
+HEADER = struct.Struct("<IIB")
+
+OP_ROOM = 1
+OP_TOPIC = 2
+OP_DELETE_TOPIC = 3
+OP_RENAME_TOPIC = 4
+OP_COMMENT = 5
+OP_DELETE_COMMENT = 6
+OP_RENAME_DEVICE = 7
+OP_VOTE = 8
+OP_DELETE_VOTE = 9
+OP_DELETE_ROOM = 10
+OP_DELETE_COMMENTS = 11
+# 參與者加入 / 改暱稱：只在共用後端的 worker 之間複製，不寫入日誌與快照，apply_record 略過
+OP_PARTICIPANT = 12
+
+SEGMENT_PATTERN = re.compile(r"^journal-(\d+)\.log$")
+SNAPSHOT_PATTERN = re.compile(r"^snapshot-(\d+)\.bin$")
+
+
+def encode_record(op: int, args: List[Any]) -> bytes:
+    payload = json.dumps(args, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return HEADER.pack(len(payload), zlib.crc32(payload, op), op) + payload
+
+
+def read_records(path: str) -> Iterator[Tuple[int, List[Any]]]:
+    """逐筆讀出日誌檔中的紀錄"""
+    with open(path, "rb") as f:
+        data = f.read()
+    return iter_records(data, os.path.basename(path))
+
+
+def iter_records(data: bytes, source: str = "journal") -> Iterator[Tuple[int, List[Any]]]:
+    """逐筆解出紀錄；遇到寫到一半的尾端紀錄（當機）時停止"""
+    offset = 0
+    while offset + HEADER.size <= len(data):
+        length, crc, op = HEADER.unpack_from(data, offset)
+        start = offset + HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload, op) != crc:
+            print(f"⚠️ 日誌 {source} 在位移 {offset} 處不完整，忽略其後 {len(data) - offset} bytes")
+            return
+        yield op, json.loads(payload)
+        offset = start + length
+
+
+def apply_record(store, op: int, args: List[Any]):
+    """把一筆紀錄套用到 store（可重複套用）"""
+    code = args[0]
+    if op == OP_ROOM:
+        if store.has_room(code):
+            store.replace_room(code, args[1])
+        else:
+            store.create_room(code, args[1])
+        return
+    if not store.has_room(code):
+        return
+    if op == OP_DELETE_ROOM:
+        store.drop_room(code)
+    elif op == OP_TOPIC:
+        store.ensure_topic(code, args[1])
+    elif op == OP_DELETE_TOPIC:
+        store.delete_topic(code, args[1])
+    elif op == OP_RENAME_TOPIC:
+        old_name, new_name = args[1], args[2]
+        if store.has_topic(code, old_name) and not store.has_topic(code, new_name):
+            store.rename_topic(code, old_name, new_name)
+        elif store.has_topic(code, old_name) and not store.get_topic(code, old_name)["comments"]:
+            # 重播快照已涵蓋的改名：舊名稱是前面的 OP_TOPIC 重新建立的空主題
+            store.delete_topic(code, old_name)
+    elif op == OP_COMMENT:
+        # [code, 主題, 留言, 序號]；舊版紀錄沒有序號
+        comment = args[2]
+        if not store.has_comment(code, comment["id"]):
+            store.add_comment(code, args[1], CommentRecord.from_dict(comment), args[3] if len(args) > 3 else None)
+    elif op == OP_DELETE_COMMENT:
+        store.delete_comment(code, args[1])
+    elif op == OP_DELETE_COMMENTS:
+        store.delete_comments(code, args[1])
+    elif op == OP_RENAME_DEVICE:
+        store.rename_device_comments(code, args[1], args[2])
+    elif op == OP_VOTE:
+        if store.has_comment(code, args[1]):
+            store.cast_vote(code, args[1], args[2], args[3])
+    elif op == OP_DELETE_VOTE:
+        vote_type = store.votes.device_votes(code, args[2]).get(args[1])
+        if vote_type:
+            store.retract_vote(code, args[1], args[2], vote_type)
+
+
+def room_dump(store, code: str) -> bytes:
+    """單一房間的紀錄（呼叫端需在房間的 actor 中執行）；房間不存在時回傳空內容"""
+    room = store.get_room(code)
+    if room is None:
+        return b""
+    out = bytearray(encode_record(OP_ROOM, [code, room]))
+    for topic in store.list_topics(code):
+        topic_name = topic["topic_name"]
+        out += encode_record(OP_TOPIC, [code, topic_name])
+        for comment in topic["comments"]:
+            out += encode_record(OP_COMMENT, [code, topic_name, comment.to_dict(), comment.seq])
+            # 投票緊接在留言之後，只輸出單一房間時不必走訪整個投票帳本
+            for device_id, vote_type in store.votes.voters(comment.id):
+                out += encode_record(OP_VOTE, [code, comment.id, device_id, vote_type])
+    return bytes(out)
+
+
+def dump_store(store, codes: Optional[List[str]] = None) -> bytes:
+    """
+    把 store 壓縮成最少的紀錄（房間、主題、留言、投票）。
+    每個房間在自己的 actor 中輸出，不同房間之間不需同時凍結。
+
+    Args:
+        codes: 只輸出這些房間；None 表示全部
+    """
+    if codes is None:
+        codes = list(store.rooms)
+    return b"".join(room_actors.run(code, lambda code=code: room_dump(store, code)) for code in codes)
+
+
+class JournalBackend(StorageBackend):
+    """附加式二進位日誌 + 定期快照"""
+
+    name = "journal"
+
+    def __init__(self, directory: str, flush_interval: float = 0.05,
+                 snapshot_every: int = 100000, snapshot_interval: float = 300):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+        self.snapshot_interval = snapshot_interval
+        os.makedirs(directory, exist_ok=True)
+
+        segments = self._list(SEGMENT_PATTERN)
+        snapshots = self._list(SNAPSHOT_PATTERN)
+        self._snapshot_segment = snapshots[-1] if snapshots else 0
+        # 啟動後一律寫入新段落，既有段落只供重播
+        self._segment = max(segments + snapshots, default=0) + 1
+        self._file = open(self._segment_path(self._segment), "ab")
+
+        self._store = None
+        self._buffer = bytearray()
+        self._lock = threading.Lock()      # 保護緩衝區與目前段落
+        self._io_lock = threading.Lock()   # 同一時間只有一個執行緒寫檔
+        self._records_since_snapshot = 0
+        self._last_snapshot = time.monotonic()
+        self._stop = threading.Event()
+        self.recovery_stats: Dict[str, Any] = {}
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="journal-flusher", daemon=True)
+        self._flusher.start()
+
+    # --- 檔案 ---
+    def _list(self, pattern) -> List[int]:
+        numbers = []
+        for filename in os.listdir(self.directory):
+            match = pattern.match(filename)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"journal-{number:08d}.log")
+
+    def _snapshot_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"snapshot-{number:08d}.bin")
+
+    # --- 載入 ---
+    def load(self, store) -> int:
+        started = time.perf_counter()
+        snapshot_records = journal_records = 0
+
+        if self._snapshot_segment:
+            for op, args in read_records(self._snapshot_path(self._snapshot_segment)):
+                apply_record(store, op, args)
+                snapshot_records += 1
+        for number in self._list(SEGMENT_PATTERN):
+            if self._snapshot_segment <= number < self._segment:
+                for op, args in read_records(self._segment_path(number)):
+                    apply_record(store, op, args)
+                    journal_records += 1
+
+        self._store = store
+        self._records_since_snapshot = journal_records
+        self.recovery_stats = {
+            "snapshot_records": snapshot_records,
+            "journal_records": journal_records,
+            "seconds": time.perf_counter() - started,
+        }
+        print(f"📜 日誌復原：快照 {snapshot_records} 筆 + 日誌 {journal_records} 筆，"
+              f"耗時 {self.recovery_stats['seconds'] * 1000:.1f} ms")
+        return len(store.rooms)
+
+    # --- 寫入（附加到緩衝區） ---
+    def _append(self, op: int, args: List[Any]):
+        record = encode_record(op, args)
+        with self._lock:
+            self._buffer += record
+            self._records_since_snapshot += 1
+
+    def save_room(self, code: str, room: Dict[str, Any]):
+        self._append(OP_ROOM, [code, room])
+
+    def delete_room(self, code: str):
+        self._append(OP_DELETE_ROOM, [code])
+
+    def save_topic(self, code: str, topic_name: str):
+        self._append(OP_TOPIC, [code, topic_name])
+
+    def delete_topic(self, code: str, topic_name: str):
+        self._append(OP_DELETE_TOPIC, [code, topic_name])
+
+    def rename_topic(self, code: str, old_name: str, new_name: str):
+        self._append(OP_RENAME_TOPIC, [code, old_name, new_name])
+
+    def save_comment(self, code: str, topic_name: str, seq: int, comment: CommentRecord):
+        self._append(OP_COMMENT, [code, topic_name, comment.to_dict(), seq])
+
+    def delete_comment(self, code: str, comment_id: str):
+        self._append(OP_DELETE_COMMENT, [code, comment_id])
+
+    def delete_comments(self, code: str, comment_ids: List[str]):
+        self._append(OP_DELETE_COMMENTS, [code, comment_ids])
+
+    def rename_device(self, code: str, device_id: str, nickname: str):
+        self._append(OP_RENAME_DEVICE, [code, device_id, nickname])
+
+    def save_vote(self, code: str, comment_id: str, device_id: str, vote_type: str):
+        self._append(OP_VOTE, [code, comment_id, device_id, vote_type])
+
+    def delete_vote(self, code: str, comment_id: str, device_id: str):
+        self._append(OP_DELETE_VOTE, [code, comment_id, device_id])
+
+    # --- 落盤 ---
+    def flush(self):
+        with self._io_lock:
+            self._write_buffer()
+
+    def _write_buffer(self):
+        """把緩衝區寫入目前段落並 fsync（呼叫端需持有 _io_lock）"""
+        with self._lock:
+            if not self._buffer:
+                return
+            data = bytes(self._buffer)
+            self._buffer.clear()
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                if self._snapshot_due():
+                    self.snapshot()
+            except Exception as e:
+                print(f"❌ 日誌寫入失敗: {e}")
+
+    def _snapshot_due(self) -> bool:
+        if self._store is None or not self._records_since_snapshot:
+            return False
+        return (self._records_since_snapshot >= self.snapshot_every
+                or time.monotonic() - self._last_snapshot >= self.snapshot_interval)
+
+    # --- 快照 ---
+    def snapshot(self):
+        """切換到新段落並寫入目前狀態的壓縮快照，之後刪除已被涵蓋的舊檔"""
+        if self._store is None:
+            return
+        with self._io_lock:
+            self._write_buffer()
+            with self._lock:
+                self._file.close()
+                self._segment += 1
+                segment = self._segment
+                self._file = open(self._segment_path(segment), "ab")
+                self._records_since_snapshot = 0
+            self._last_snapshot = time.monotonic()
+
+        data = dump_store(self._store)
+        temp_path = self._snapshot_path(segment) + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self._snapshot_path(segment))
+        self._snapshot_segment = segment
+
+        for number in self._list(SNAPSHOT_PATTERN):
+            if number < segment:
+                os.remove(self._snapshot_path(number))
+        for number in self._list(SEGMENT_PATTERN):
+            if number < segment:
+                os.remove(self._segment_path(number))
+
+    def close(self):
+        self._stop.set()
+        self._flusher.join(timeout=5)
+        self.flush()
+        # 關閉前壓縮一次，下次啟動只需載入快照
+        if self._records_since_snapshot:
+            self.snapshot()
+        self._file.close()
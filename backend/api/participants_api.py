@@ -1,12 +1,26 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Header, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
 import random, string, time, uuid
+import asyncio
+import json
 import platform
 import os
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
-from .utility import export_room_pdf
+from .utility import export_room_pdf, pdf_executor
+from .records import CommentRecord
+from .room_store import room_store
+from .room_events import room_events
+from .room_actor import fast_path, room_actors, serialized
+from .search_index import highlight_spans, tokenize
+from .state_dump import DUMP_MEDIA_TYPES, dump_formats, stream_rooms
+from .room_lifecycle import room_lifecycle
+from .response_cache import CachedBody, dumps, negotiate, response_cache
+from .presence import presence_tracker
+from .sharding import shard_config
 from .ai_client import ai_client
 
 # --- Pydantic Models for RESTful API ---
@@ -15,10 +29,34 @@ class CommentRequest(BaseModel):
     content: str
     isAISummary: Optional[bool] = False
 
+class CommentImportItem(BaseModel):
+    id: Optional[str] = None
+    nickname: str
+    content: str
+    ts: Optional[float] = None
+    isAISummary: Optional[bool] = False
+    device_id: Optional[str] = None
+
+class CommentImportRequest(BaseModel):
+    topic: Optional[str] = None
+    comments: List[CommentImportItem]
+
+class BulkDeleteCommentsRequest(BaseModel):
+    comment_ids: List[str]
+
 class VoteRequest(BaseModel):
     device_id: str
     vote_type: str
 
+class BatchVoteItem(BaseModel):
+    comment_id: str
+    vote_type: str
+    action: str = "cast"  # "cast" 投票 / "retract" 取消投票
+
+class BatchVoteRequest(BaseModel):
+    device_id: str
+    votes: List[BatchVoteItem]
+
 class UpdateNicknameRequest(BaseModel):
     new_nickname: str
     old_nickname: Optional[str] = None
@@ -56,6 +94,9 @@ class HeartbeatRequest(BaseModel):
     room: str
     device_id: str
 
+class HeartbeatBatchRequest(BaseModel):
+    heartbeats: List[HeartbeatRequest]
+
 class UpdateRoomInfoRequest(BaseModel):
     room: str
     new_title: str
@@ -157,8 +198,8 @@ def format_timestamp_for_display(timestamp):
     except:
         return str(timestamp)
 
-# 簡化後的資料結構
-ROOMS = {}
+# 簡化後的資料結構（實際資料由 room_store 持有，這裡保留相容名稱）
+ROOMS = room_store.rooms
 """
 {
     room_id: {
@@ -175,27 +216,244 @@ ROOMS = {}
 }
 """
 
-topics = {}
+topics = room_store.topics
 """
 {
     topic_id: {
         "room_id": str,
         "topic_name": str,
-        "comments": [{"id": str, "nickname": str, "content": str, "ts": float}]
+        "comments": [CommentRecord]  # 見 records.py
     }
 }
 """
 
-votes = {}
+votes = room_store.votes
 """
-{
-    comment_id: {
-        "good": [device_id1, device_id2, ...],
-        "bad": [device_id1, device_id2, ...]
-    }
-}
+VoteLedger（見 vote_ledger.py），每則留言一個 dict，不再保留好評 / 差評兩個集合：
+    comment_id -> {device_id: "good" | "bad"}
+    comment_id -> (好評數, 差評數)  # 投票時同步更新，讀取票數不必計算
+    (room, device_id) -> {comment_id: "good" | "bad"}  # 單一裝置的投票紀錄
 """
 
+# --- 狀態組裝與事件推播輔助函數 ---
+WS_PING_INTERVAL = 25  # 秒，WebSocket 閒置時送出 ping 保持連線
+SSE_KEEPALIVE_INTERVAL = 15  # 秒，SSE 閒置時送出註解行，避免代理伺服器切斷連線
+VOTE_BATCH_LIMIT = 500  # 單次批次投票的最大筆數
+COMMENT_BATCH_LIMIT = 5000  # 單次批次匯入 / 刪除留言的最大筆數
+# 匯入留言的 ID 由 (目標房間, 來源 ID) 推導，同一份匯出重複匯入時得到相同 ID
+IMPORT_ID_NAMESPACE = uuid.UUID("5b0f7c1e-3d2a-4e8b-9f6a-1c2d3e4f5a6b")
+
+def _comment_view(comment):
+    """組合留言與票數，供 REST 回應與推播事件共用（直接由紀錄組出，不複製 dict）"""
+    return comment.view(*room_store.vote_counts(comment.id))
+
+def _remaining_countdown(room_info):
+    """計算房間剩餘倒數秒數"""
+    if room_info["status"] in ["End", "Stop", "NotFound"]:
+        return 0
+    now = get_current_timestamp()
+    return max(0, int(room_info["countdown"] - (now - room_info["time_start"]))) if room_info["time_start"] else 0
+
+def _comment_records(room, order, after, limit):
+    """
+    取得當前主題的一頁留言紀錄。
+    limit 為 None 時回傳全部留言（依 order 排序），下一頁游標為 None。
+    """
+    current_topic = ROOMS[room]["current_topic"]
+    if not current_topic or not room_store.has_topic(room, current_topic):
+        return [], None
+    if limit is None and order == "score":
+        comments, next_cursor = room_store.top_comments(room, current_topic), None
+    elif limit is None:
+        # 留言依時間順序附加，無需重新排序
+        comments, next_cursor = room_store.get_topic(room, current_topic)["comments"], None
+    else:
+        try:
+            comments, next_cursor = room_store.comment_page(room, current_topic, order, after, limit)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid order or cursor")
+    return comments, next_cursor
+
+def _comments_json(comments):
+    """直接由留言紀錄序列化成 JSON 陣列"""
+    return "[" + ",".join([comment.to_json(*room_store.vote_counts(comment.id)) for comment in comments]) + "]"
+
+def _comments_array(room, order, after, limit):
+    """
+    與 _comment_records 相同範圍的留言 JSON 陣列與下一頁游標。
+    整個當前主題依時間排序時直接取用主題的讀取視圖（寫入時已更新），不需逐則序列化。
+    """
+    if limit is None and order != "score":
+        current_topic = ROOMS[room]["current_topic"]
+        return (room_store.topic_json(room, current_topic) if current_topic else "[]"), None
+    comments, next_cursor = _comment_records(room, order, after, limit)
+    return _comments_json(comments), next_cursor
+
+def _json_with_comments(payload, comments_json):
+    """序列化 payload，並把已序列化的留言陣列直接寫在最後的 comments 欄位"""
+    body = dumps(payload)
+    return b"".join((body[:-1], b"," if len(body) > 2 else b"", b'"comments":', comments_json.encode("utf-8"), b"}"))
+
+def _room_state_fields(room, next_cursor, limit):
+    """房間狀態中留言以外的欄位"""
+    room_info = ROOMS[room]
+    state = {
+        "topic": room_info["current_topic"],
+        "countdown": _remaining_countdown(room_info),
+        "status": room_info["status"],
+        "settings": room_info.get("settings", {"allowQuestions": True, "allowVoting": True}),
+        "version": room_store.version_tag(room),
+    }
+    if limit is not None:
+        state["next_cursor"] = next_cursor
+    return state
+
+def _build_room_state(room, order="time", after=None, limit=None):
+    """組合 GET /api/rooms/{room}/state 的回應內容（推播快照使用）"""
+    comments, next_cursor = _comment_records(room, order, after, limit)
+    state = _room_state_fields(room, next_cursor, limit)
+    state["comments"] = [_comment_view(comment) for comment in comments]
+    return state
+
+def _room_state_json(room, order="time", after=None, limit=None):
+    """與 _build_room_state 相同內容的 JSON，留言不經過中間 dict"""
+    comments_json, next_cursor = _comments_array(room, order, after, limit)
+    return _json_with_comments(_room_state_fields(room, next_cursor, limit), comments_json)
+
+def _touch_participant(room, device_id):
+    """更新參與者最後活動時間，在線人數改變時推播（離線由 presence_tracker 清掃時推播）"""
+    if presence_tracker.touch(room, device_id, get_current_timestamp()):
+        _publish_presence(room)
+
+def _change_for_event(event_type, data):
+    """將推播事件對應到增量同步使用的變更紀錄"""
+    if event_type == "comment_added":
+        return ("added", data["comment"]["id"])
+    if event_type == "comment_deleted":
+        return ("removed", data["comment_id"])
+    if event_type == "votes":
+        return ("votes", data["comment_id"])
+    if event_type == "nickname":
+        return ("nickname", data["device_id"], data["nickname"])
+    if event_type in ("snapshot", "resync"):
+        return ("reset",)
+    return ("state",)
+
+def _publish(room, event_type, data=None):
+    """
+    記錄房間狀態變更：遞增房間版本、寫入變更紀錄並推播事件。
+    在房間的 actor 中呼叫時，整批命令的變更合併成一次版本遞增與一次推播。
+    """
+    room_actors.publish(room, event_type, data, _change_for_event(event_type, data))
+
+def _room_etag(room):
+    """
+    以房間版本組成的弱 ETag（倒數秒數由用戶端自行遞減，不納入比對）；
+    多個 worker 共用狀態時版本帶有 worker 代號，其他 worker 發出的 ETag 不會誤判為相符
+    """
+    return f'W/"{room}-{room_store.version_tag(room)}"'
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or etag[2:] in candidates
+
+def _cached_json(if_none_match, etag, build, accept_encoding=None, cache_key=None):
+    """
+    版本未變時回傳 304，不重建也不序列化回應內容。
+
+    提供 cache_key=(房間, 回應種類, stamp) 時，序列化後的內容與其 gzip / brotli
+    版本由 response_cache 共用：同一 stamp 下所有輪詢者只需產生一次。
+    build 可回傳已序列化的 bytes 或可序列化的物件。
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    def encode():
+        content = build()
+        return content if isinstance(content, bytes) else dumps(content)
+
+    body = response_cache.get(*cache_key, encode) if cache_key else CachedBody(encode())
+    content, encoding = body.encoded(negotiate(accept_encoding))
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content, media_type="application/json", headers=headers)
+
+def _publish_presence(room):
+    if room not in ROOMS or not room_events.subscriber_count(room):
+        return
+    room_events.publish(room, "presence", {
+        "participants": ROOMS[room]["participants"],
+        "online": presence_tracker.online(room),
+    })
+
+def _publish_snapshot(room):
+    """
+    推播完整狀態（切換主題等無法以增量表示的變更）。
+    沒有訂閱者時只記錄 resync 標記，重連補送時再組出最新快照。
+    """
+    if not room_events.subscriber_count(room):
+        _publish(room, "resync")
+        return
+    _publish(room, "snapshot", _build_room_state(room))
+
+async def _snapshot_event(room):
+    """以目前最新事件 ID 組出完整快照事件（在房間的 actor 中組出）"""
+    return await room_actors.run_async(room, lambda: {
+        "id": room_events.last_event_id(room),
+        "type": "snapshot",
+        "room": room,
+        "data": _build_room_state(room),
+        "ts": get_current_timestamp(),
+    })
+
+def _publish_topics(room):
+    _publish(room, "topics", {
+        "topics": room_store.topic_names(room),
+        "current_topic": ROOMS[room].get("current_topic"),
+    })
+
+def _publish_votes(room, comment_id):
+    vote_good, vote_bad = room_store.vote_counts(comment_id)
+    _publish(room, "votes", {
+        "comment_id": comment_id,
+        "vote_good": vote_good,
+        "vote_bad": vote_bad,
+        "votes": vote_good,
+    })
+
+async def save_room_workspace(room, workspace_slug, workspace_info=None):
+    """在房間的 actor 中記錄 AI workspace 並寫入儲存後端（不遞增版本、不推播）"""
+    fields = {"workspace_slug": workspace_slug}
+    if workspace_info and "id" in workspace_info:
+        fields["workspace_id"] = workspace_info["id"]
+    await room_actors.run_async(room, lambda: room_store.update_room(room, fields))
+
+def _on_remote_change(room):
+    """其他 worker 修改了房間（共用儲存後端）：本機連線改收完整快照；房間已被刪除時結束連線"""
+    def publish():
+        if room not in ROOMS:
+            return False
+        _publish_snapshot(room)
+        return True
+
+    if room_actors.run(room, publish):
+        return
+    room_events.drop_room(room)
+    presence_tracker.drop_room(room)
+    response_cache.drop_room(room)
+
+def _on_remote_participant(room, device_id, nickname, last_seen):
+    """其他 worker 有參與者加入或改暱稱：登記到本機，之後的心跳、改暱稱與留言都找得到該裝置"""
+    if room in ROOMS and presence_tracker.join(room, device_id, nickname, last_seen):
+        _publish_presence(room)
+
+room_store.add_remote_listener(_on_remote_change)
+room_store.add_participant_listener(_on_remote_participant)
+presence_tracker.add_listener(_publish_presence)
+
 class RoomCreate(BaseModel):
     title: str
     topics: List[str] # 改為接收 topics 列表
@@ -225,17 +483,16 @@ async def create_room(room: RoomCreate):
     回傳：
     - code (str): 房間代碼
     """
-    code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-    while code in ROOMS:
-        code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        
+    # 分片模式下只產生由本 shard 負責的代碼，房間從建立起就留在本機記憶體
+    code = shard_config.new_room_code(ROOMS)
+
     title = room.title.strip()
     countdown = int(room.countdown or 0)
     countdown = max(0, countdown)
     room_topics = room.topics if room.topics else ["預設主題"]
     first_topic = room_topics[0]
 
-    ROOMS[code] = {
+    room_store.create_room(code, {
         "code": code,
         "title": title,
         "created_at": get_current_timestamp(),
@@ -251,17 +508,14 @@ async def create_room(room: RoomCreate):
         "topic_count": room.topic_count, # 使用前端傳來的值
         "workspace_slug": None,  # 討論專屬的workspace slug
         "workspace_id": None,    # 討論專屬的workspace id
-    }
+    })
     
     # 立即為此討論創建專屬的workspace
     try:
         workspace_slug = await ai_client.ensure_workspace_exists(code, title)
         # 從AnythingLLM API獲取workspace詳細信息包括ID
         workspace_info = await ai_client.get_workspace_info(workspace_slug)
-        
-        ROOMS[code]["workspace_slug"] = workspace_slug
-        if workspace_info and "id" in workspace_info:
-            ROOMS[code]["workspace_id"] = workspace_info["id"]
+        await save_room_workspace(code, workspace_slug, workspace_info)
         
         print(f"✅ 討論 '{title}' (代碼: {code}) 的專屬workspace已創建: {workspace_slug}")
     except Exception as e:
@@ -273,11 +527,7 @@ async def create_room(room: RoomCreate):
         topic_name_stripped = topic_name.strip()
         if not topic_name_stripped:
             continue
-        topics[f"{code}_{topic_name_stripped}"] = {
-            "room_id": code,
-            "topic_name": topic_name_stripped,
-            "comments": [],
-        }
+        room_store.ensure_topic(code, topic_name_stripped)
     
     return {
         "code": ROOMS[code]["code"],
@@ -288,97 +538,132 @@ async def create_room(room: RoomCreate):
     }
 
 @router.get("/api/export_pdf")
-def export_pdf(room: str):
+async def export_pdf(room: str):
     """
     匯出指定討論室的完整記錄為 PDF 檔案，帶有美化排版和圖表。
+    排版在專屬的 pdf_executor 中進行，不會讓其他請求排在 PDF 後面。
     """
-    if room not in ROOMS:
+    return await asyncio.get_running_loop().run_in_executor(pdf_executor, _export_pdf, room)
+
+def _export_pdf(room):
+    # 在 actor 中取得房間的唯讀複本，排版期間房間照常寫入
+    snapshot = room_actors.run(room, lambda: room_store.snapshot(room) if room_lifecycle.ensure_loaded(room) else None)
+    if snapshot is None:
         raise HTTPException(status_code=404, detail="找不到討論室")
-    room_data = ROOMS[room]
-    room_topics = [t for t_id, t in topics.items() if t["room_id"] == room]
     # 過濾掉「AI 主題生成中...」等臨時主題
-    room_topics = [t for t in room_topics if not ("AI" in t.get("topic_name", "") and "生成中" in t.get("topic_name", ""))]
-    return export_room_pdf(room, room_data, room_topics, votes, FONT_NAME)
+    room_topics = [t for t in snapshot.topics if not ("AI" in t.get("topic_name", "") and "生成中" in t.get("topic_name", ""))]
+    return export_room_pdf(room, snapshot.room, room_topics, snapshot, FONT_NAME)
 
 @router.get("/api/room_topics")
+@serialized("room")
 def get_room_topics(room: str):
     """取得指定房間的所有主題列表"""
-    if room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(room):
         raise HTTPException(status_code=404, detail="Room not found")
     
-    room_topics = [
-        t["topic_name"] for t_id, t in topics.items() if t["room_id"] == room
-    ]
-    return {"topics": room_topics}
+    return {"topics": room_store.topic_names(room)}
 
 class AddTopicsRequest(BaseModel):
     room: str
     topics: List[str]
 
 @router.post("/api/room/add_topics")
+@serialized("req.room")
 def add_topics_to_room(req: AddTopicsRequest):
     """為指定房間添加多個主題，並清除舊的「預設主題」"""
-    if req.room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(req.room):
         raise HTTPException(status_code=404, detail="Room not found")
 
     # 1. 刪除舊的預設主題（如果存在）
-    default_topic_id = f"{req.room}_預設主題"
-    if default_topic_id in topics:
-        del topics[default_topic_id]
+    room_store.delete_topic(req.room, "預設主題")
 
     # 2. 添加新主題
     for topic_name in req.topics:
         topic_name_stripped = topic_name.strip()
         if not topic_name_stripped:
             continue
-        
-        topic_id = f"{req.room}_{topic_name_stripped}"
-        if topic_id not in topics:
-            topics[topic_id] = {
-                "room_id": req.room,
-                "topic_name": topic_name_stripped,
-                "comments": [],
-            }
+        room_store.ensure_topic(req.room, topic_name_stripped)
     
     # 3. 更新房間的 current_topic 為新的第一個主題
     if req.topics:
         ROOMS[req.room]["current_topic"] = req.topics[0].strip()
 
+    _publish_topics(req.room)
+    _publish_snapshot(req.room)
     return {"success": True, "message": f"已成功為房間 {req.room} 添加 {len(req.topics)} 個主題。"}
 
 
+def _room_summary(room):
+    """房間列表與單一房間查詢共用的房間資訊"""
+    return {
+        "code": room["code"],
+        "title": room["title"],
+        "created_at": room["created_at"],
+        "participants": room["participants"],
+        "status": room["status"],
+        "current_topic": room.get("current_topic", ""),
+        "topic_count": room.get("topic_count", 1),
+        "topic_summary": room.get("topic_summary", ""),
+        "desired_outcome": room.get("desired_outcome", ""),
+        "countdown": room.get("countdown", 0),
+        "workspace_slug": room.get("workspace_slug", ""),
+        "workspace_id": room.get("workspace_id", ""),
+    }
+
 @router.get("/api/rooms")
-def get_rooms():
+def get_rooms(status: Optional[str] = None,
+              created_after: Optional[float] = None,
+              created_before: Optional[float] = None,
+              after: Optional[str] = None,
+              limit: Optional[int] = Query(None, ge=1, le=500)):
     """
-    獲取所有討論室資訊
+    獲取討論室列表
 
     [GET] /api/rooms
 
     描述：
-    獲取所有已建立的討論室資訊。
+    依建立時間先後列出記憶體中的討論室（已封存的房間不列出，可用 GET /api/rooms/{code} 查詢）。
+    篩選與分頁由房間目錄索引以二分搜尋定位，成本與回傳的筆數有關，而非房間總數。
+
+    參數：
+    - status (str, optional): 只列出此狀態（Stop、Discussion、End）的房間
+    - created_after / created_before (float, optional): 建立時間（Unix 秒）區間，不含端點
+    - after (str, optional): 上一頁回傳的 next_cursor
+    - limit (int, optional): 每頁筆數（1–500）；未指定時回傳全部符合的房間
 
     回傳：
-    - rooms (list): 所有討論室的資訊列表，每個房間包含 code、title、created_at、participants、status、current_topic、topic_count、topic_summary、desired_outcome、countdown。
-    """
-    # 將房間狀態加入到每個房間資訊中
-    rooms = []
-    for room in ROOMS.values():
-        room_info = {
-            "code": room["code"],
-            "title": room["title"],
-            "created_at": room["created_at"],
-            "participants": room["participants"],
-            "status": room["status"],
-            "current_topic": room.get("current_topic", ""),
-            "topic_count": room.get("topic_count", 1),
-            "topic_summary": room.get("topic_summary", ""),
-            "desired_outcome": room.get("desired_outcome", ""),
-            "countdown": room.get("countdown", 0),
-            "workspace_slug": room.get("workspace_slug", ""),
-            "workspace_id": room.get("workspace_id", ""),
-        }
-        rooms.append(room_info)
-    return {"rooms": rooms}
+    - rooms (list): 討論室資訊列表，每個房間包含 code、title、created_at、participants、status、current_topic、topic_count、topic_summary、desired_outcome、countdown。
+    - total (int): 符合篩選條件的房間總數
+    - next_cursor (str | null): 下一頁游標（僅在指定 limit 時提供）
+    """
+    try:
+        codes, total, next_cursor = room_store.directory.page(status, created_after, created_before, after, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    rooms = [_room_summary(ROOMS[code]) for code in codes if code in ROOMS]
+    result = {"rooms": rooms, "total": total}
+    if limit is not None:
+        result["next_cursor"] = next_cursor
+    return result
+
+@router.get("/api/rooms/{room}")
+@serialized("room")
+def get_room(room: str):
+    """
+    取得單一討論室資訊與主題列表
+
+    [GET] /api/rooms/{room}
+
+    描述：
+    主持人頁面載入時使用，一次取得房間資訊與主題列表；已封存的房間會自動載回。
+
+    回傳：
+    - room (dict): 與 GET /api/rooms 相同欄位的房間資訊
+    - topics (list): 主題名稱列表
+    """
+    if not room_lifecycle.ensure_loaded(room):
+        raise HTTPException(status_code=404, detail="Room not found")
+    return {"room": _room_summary(ROOMS[room]), "topics": room_store.topic_names(room)}
 
 class JoinRequest(BaseModel):
     room: str
@@ -386,6 +671,7 @@ class JoinRequest(BaseModel):
     device_id: str
 
 @router.post("/api/participants/join")
+@fast_path("data.room")
 def join_participant(data: JoinRequest):
     """
     參與者加入討論室
@@ -404,41 +690,20 @@ def join_participant(data: JoinRequest):
     - success (bool): 是否成功加入討論室
     """
     room = data.room
-    device_id = data.device_id
-    nickname = data.nickname
-    now = get_current_timestamp()
     
-    if room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(room):
         return {"success": False, "error": "房間不存在"}
     
-    # 初始化參與者列表
-    if "participants_list" not in ROOMS[room]:
-        ROOMS[room]["participants_list"] = []
-    
-    # 先檢查 device_id 是否已存在
-    found = None
-    for p in ROOMS[room]["participants_list"]:
-        if p['device_id'] == device_id:
-            found = p
-            break
-    
-    if found:
-        found['last_seen'] = now
-        found['nickname'] = nickname  # 更新暱稱
-    else:
-        ROOMS[room]["participants_list"].append({"device_id": device_id, "nickname": nickname, "last_seen": now})
-
-    # 更新房間參與者人數（以在線人數為準，10秒內視為在線）
-    try:
-        online_count = sum(1 for p in ROOMS[room]["participants_list"] if (now - p["last_seen"]) <= 10)
-        ROOMS[room]["participants"] = online_count
-    except Exception:
-        # 後備：若出錯則使用列表長度
-        ROOMS[room]["participants"] = len(ROOMS[room].get("participants_list", []))
+    # 已加入過的裝置只更新暱稱與活動時間；在線人數由 presence_tracker 維護
+    now = get_current_timestamp()
+    presence_tracker.join(room, data.device_id, data.nickname, now)
+    room_store.save_participant(room, data.device_id, data.nickname, now)
+    _publish_presence(room)
 
     return {"success": True}
 
 @router.post("/api/participants/heartbeat")
+@fast_path("data.room")
 def participant_heartbeat(data: HeartbeatRequest):
     """
     參與者在線檢測
@@ -455,29 +720,49 @@ def participant_heartbeat(data: HeartbeatRequest):
     回傳：
     - success (bool): 是否成功更新心跳時間
     """
-    now = get_current_timestamp()
     room = data.room
-    device_id = data.device_id
     
-    if room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(room):
         return {"success": False, "error": "房間不存在"}
     
-    if "participants_list" not in ROOMS[room]:
-        ROOMS[room]["participants_list"] = []
-    
-    for p in ROOMS[room]["participants_list"]:
-        if p['device_id'] == device_id:
-            p['last_seen'] = now
-            break
-    # 更新在線人數
-    try:
-        online_count = sum(1 for p in ROOMS[room]["participants_list"] if (now - p["last_seen"]) <= 10)
-        ROOMS[room]["participants"] = online_count
-    except Exception:
-        ROOMS[room]["participants"] = len(ROOMS[room].get("participants_list", []))
+    _touch_participant(room, data.device_id)
     return {"success": True}
 
+@router.post("/api/participants/heartbeat:batch")
+async def participant_heartbeat_batch(data: HeartbeatBatchRequest):
+    """
+    批次更新多個參與者的在線狀態
+
+    [POST] /api/participants/heartbeat:batch
+
+    描述：
+    給同時維持大量參與者連線的情境（展示機、壓力測試）使用，
+    一次送出多組 (房間, 裝置) 心跳，整批只經過一次請求處理與一次 presence 更新。
+
+    參數：
+    - heartbeats (list): [{"room": str, "device_id": str}, ...]
+
+    回傳：
+    - success (bool): 是否處理完成
+    - accepted (int): 房間存在的心跳筆數
+    - missing_rooms (list): 不存在的房間代碼
+    """
+    pairs = [(hb.room, hb.device_id) for hb in data.heartbeats]
+    # 與單筆心跳相同，已封存的房間先載回（讀檔解壓縮，交給 threadpool）
+    unloaded = [room for room in dict.fromkeys(room for room, _ in pairs) if not room_store.has_room(room)]
+    if unloaded:
+        await run_in_threadpool(lambda: [room_lifecycle.ensure_loaded(room) for room in unloaded])
+    changed = presence_tracker.touch_many(pairs, get_current_timestamp())
+    for room, room_changed in changed.items():
+        if room_changed:
+            _publish_presence(room)
+
+    missing_rooms = sorted({room for room, _ in pairs if room not in changed})
+    accepted = sum(1 for room, _ in pairs if room in changed)
+    return {"success": True, "accepted": accepted, "missing_rooms": missing_rooms}
+
 @router.get("/api/participants")
+@fast_path("room")
 def get_participants(room: str):
     """
     獲取房間內的在線參與者列表
@@ -493,22 +778,11 @@ def get_participants(room: str):
     回傳：
     - participants (list): 在線的參與者資訊
     """
-    now = get_current_timestamp()
-    online = []
-    
-    if room in ROOMS and "participants_list" in ROOMS[room]:
-        online = [
-            {"device_id": p["device_id"], "nickname": p["nickname"]}
-            for p in ROOMS[room]["participants_list"]
-            if (now - p["last_seen"]) <= 10
-        ]
-        ROOMS[room]["participants_list"] = [
-            p for p in ROOMS[room]["participants_list"]
-            if (now - p["last_seen"]) <= 30
-        ]
-    return {"participants": online}
+    # 過期的參與者由 presence_tracker 的背景清掃移除
+    return {"participants": presence_tracker.online(room)}
 
 @router.post("/api/room_status")
+@serialized("room")
 def set_room_status(room: str = Body(...), status: str = Body(...)):
     """
     設置房間狀態
@@ -530,13 +804,15 @@ def set_room_status(room: str = Body(...), status: str = Body(...)):
     if status not in ["Stop", "Discussion", "End"]:
         return {"success": True, "status": "NotFound"}
     
-    if room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(room):
         return {"success": True, "status": "NotFound"}
     
-    ROOMS[room]["status"] = status
+    room_store.set_status(room, status)
+    _publish(room, "status", {"status": status, "countdown": _remaining_countdown(ROOMS[room])})
     return {"success": True, "status": status}
 
 @router.get("/api/room_status")
+@serialized("room")
 def get_room_status(room: str):
     """
     獲取房間狀態
@@ -553,12 +829,13 @@ def get_room_status(room: str):
     - status (str): 當前房間狀態，可能的值有 NotFound、Stop、Discussion 或 End
     """
     # 如果找不到房間狀態，預設為 NotFound
-    if room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(room):
         return {"status": "NotFound"}
     return {"status": ROOMS[room]["status"]}
 
 # 主持人設定主題與倒數
 @router.post("/api/room_state")
+@serialized("room")
 def set_room_state(room: str = Body(...),
                    topic: str = Body(...),
                    countdown: int = Body(...),
@@ -581,7 +858,7 @@ def set_room_state(room: str = Body(...),
     - success (bool): 是否成功設定主題與倒數
     - status (str): 當前房間狀態，應為 Discussion
     """
-    if room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(room):
         return {"success": False, "error": "房間不存在"}
     
     # 更新房間資料
@@ -589,19 +866,20 @@ def set_room_state(room: str = Body(...),
     ROOMS[room]["countdown"] = countdown
     ROOMS[room]["time_start"] = time_start
     
-    # 創建主題ID並確保主題存在於 topics 字典中
-    topic_id = f"{room}_{topic}"
-    if topic_id not in topics:
-        topics[topic_id] = {
-            "room_id": room,
-            "topic_name": topic,
-            "comments": []
-        }
+    # 確保主題存在於房間的主題列表中
+    room_store.ensure_topic(room, topic)
+    _publish_snapshot(room)
     return {"success": True, "status": "Discussion"}
 
 # 取得主題、倒數、留言 (RESTful 風格)
 @router.get("/api/rooms/{room}/state")
-def get_room_state(room: str):
+@serialized("room")
+def get_room_state(room: str,
+                   order: str = "time",
+                   after: Optional[str] = None,
+                   limit: Optional[int] = Query(None, ge=1, le=500),
+                   if_none_match: Optional[str] = Header(None),
+                   accept_encoding: Optional[str] = Header(None)):
     """
     取得房間狀態
     
@@ -610,61 +888,124 @@ def get_room_state(room: str):
     描述：
     取得指定房間的當前狀態，包括主題、倒數計時和當前主題的留言。
     
+    回應帶有以房間版本計算的 ETag；請求的 If-None-Match 相符時回傳
+    304 Not Modified，用戶端沿用上次內容並自行遞減倒數。
+    回應內容依房間版本與倒數秒數快取，並依 Accept-Encoding 回傳 br / gzip 壓縮版本。
+    
     參數：
     - room (str): 房間代碼 (路徑參數)
+    - order (str, 選填): 分頁時的排序，"time"（預設）或 "score"
+    - after (str, 選填): 上一頁回傳的 next_cursor
+    - limit (int, 選填): 每頁留言筆數；未提供時回傳全部留言
+    - If-None-Match (header, 選填): 上次取得的 ETag
     
     返回值：
     - topic (str): 當前討論主題
     - countdown (int): 剩餘倒數時間（秒）
     - comments (list): 當前主題的留言列表
     - status (str): 房間狀態
+    - next_cursor (str | None): 提供 limit 時才有，下一頁游標
     """
-    if room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(room):
         raise HTTPException(status_code=404, detail="Room not found")
     
+    # 倒數每秒改變，快取以 (版本, 倒數秒數) 判斷；同一秒內的輪詢者共用同一份內容
+    stamp = (room_store.room_version(room), _remaining_countdown(ROOMS[room]))
+    return _cached_json(if_none_match, _room_etag(room), lambda: _room_state_json(room, order, after, limit),
+                        accept_encoding, (room, ("state", order, after, limit), stamp))
+
+# 增量同步 (RESTful 風格)
+@router.get("/api/rooms/{room}/changes")
+@serialized("room")
+def get_room_changes(room: str, since: str = "0"):
+    """
+    取得指定版本之後的變更
+
+    [GET] /api/rooms/{room}/changes?since={version}
+
+    描述：
+    從房間的變更紀錄中只回傳游標之後新增、刪除的留言與票數有變動的留言，
+    讓錯過少量變更的用戶端不必重新下載整個主題。切換主題或游標已超出
+    保留範圍時，改為回傳完整快照 (full = true)。
+
+    參數：
+    - room (str): 房間代碼 (路徑參數)
+    - since (int | str): 上次取得的版本號 (state 或 changes 回應中的 version，原樣帶回)
+
+    返回值：
+    - version (int | str): 目前版本號，作為下次請求的 since；
+      多個 worker 共用狀態時為帶有 worker 代號的字串，換到其他 worker 時回傳完整快照
+    - full (bool): 是否為完整快照；為 true 時 comments 為完整留言列表
+    - topic / countdown / status / settings: 目前房間狀態
+    - added (list): 新增的留言（含票數）
+    - removed (list): 已刪除的留言 ID
+    - votes (list): 票數有變動的留言 {comment_id, vote_good, vote_bad, votes}
+    - nicknames (list): 暱稱變更 {device_id, nickname}
+    """
+    if not room_lifecycle.ensure_loaded(room):
+        raise HTTPException(status_code=404, detail="Room not found")
+
+    version = room_store.version_tag(room)
+    local_since = room_store.untag(since)
+    changes = room_store.changes_since(room, local_since) if local_since is not None else None
+    if changes is None or any(change[0] == "reset" for change in changes):
+        return {"full": True, **_build_room_state(room)}
+
+    added = {}
+    removed = []
+    voted = {}
+    nicknames = {}
+    for change in changes:
+        kind = change[0]
+        if kind == "added":
+            added[change[1]] = None
+        elif kind == "removed":
+            # 在游標之後新增又刪除的留言，用戶端從未見過，直接略過
+            if change[1] in added:
+                del added[change[1]]
+            else:
+                removed.append(change[1])
+            voted.pop(change[1], None)
+        elif kind == "votes":
+            voted[change[1]] = None
+        elif kind == "nickname":
+            nicknames[change[1]] = change[2]
+
+    current_topic = ROOMS[room]["current_topic"]
+    added_views = []
+    for comment_id in added:
+        found = room_store.find_comment(room, comment_id)
+        if found and found[0] == current_topic:
+            added_views.append(_comment_view(found[1]))
+    vote_updates = []
+    for comment_id in voted:
+        if comment_id in added:
+            continue
+        vote_good, vote_bad = room_store.vote_counts(comment_id)
+        vote_updates.append({"comment_id": comment_id, "vote_good": vote_good, "vote_bad": vote_bad, "votes": vote_good})
+
     room_info = ROOMS[room]
-    
-    current_status = room_info["status"]
-    if current_status in ["End", "Stop", "NotFound"]:
-        left = 0
-    else:
-        now = get_current_timestamp()
-        left = max(0, int(room_info["countdown"] - (now - room_info["time_start"]))) if room_info["time_start"] else 0
-    
-    current_topic = room_info["current_topic"]
-    current_comments = []
-    if current_topic:
-        topic_id = f"{room}_{current_topic}"
-        if topic_id in topics:
-            comments_with_votes = []
-            for comment in topics[topic_id]["comments"]:
-                comment_id = comment["id"]
-                vote_good = len(votes.get(comment_id, {}).get("good", []))
-                vote_bad = len(votes.get(comment_id, {}).get("bad", []))
-                
-                comment_with_votes = comment.copy()
-                comment_with_votes["vote_good"] = vote_good
-                comment_with_votes["vote_bad"] = vote_bad
-                comment_with_votes["votes"] = vote_good
-                comments_with_votes.append(comment_with_votes)
-            
-            current_comments = comments_with_votes
-    
     return {
+        "full": False,
+        "version": version,
         "topic": current_topic,
-        "countdown": left,
-        "comments": current_comments,
-        "status": current_status,
-        "settings": room_info.get("settings", {"allowQuestions": True, "allowVoting": True})
+        "countdown": _remaining_countdown(room_info),
+        "status": room_info["status"],
+        "settings": room_info.get("settings", {"allowQuestions": True, "allowVoting": True}),
+        "added": added_views,
+        "removed": removed,
+        "votes": vote_updates,
+        "nicknames": [{"device_id": device_id, "nickname": nickname} for device_id, nickname in nicknames.items()],
     }
 
 # 新增留言 (RESTful 風格)
 @router.post("/api/rooms/{room}/comments")
+@serialized("room")
 def add_comment(room: str, data: CommentRequest):
     """
     新增留言到當前主題
     """
-    if room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(room):
         raise HTTPException(status_code=404, detail="Room not found")
     
     if not ROOMS[room].get("settings", {}).get("allowQuestions", True):
@@ -674,14 +1015,6 @@ def add_comment(room: str, data: CommentRequest):
     if not current_topic:
         raise HTTPException(status_code=400, detail="No active topic in the room")
     
-    topic_id = f"{room}_{current_topic}"
-    if topic_id not in topics:
-        topics[topic_id] = {
-            "room_id": room,
-            "topic_name": current_topic,
-            "comments": []
-        }
-    
     # 取得提交者的 device_id
     # 這是一個簡化的假設，正式產品中應有更安全的驗證
     device_id = None
@@ -692,21 +1025,28 @@ def add_comment(room: str, data: CommentRequest):
                 break
 
     comment_id = str(uuid.uuid4())
-    new_comment = {
-        "id": comment_id,
-        "nickname": data.nickname,
-        "content": data.content,
-        "ts": get_current_timestamp(),
-        "isAISummary": data.isAISummary,
-        "device_id": device_id  # *** 重要：儲存 device_id ***
-    }
+    new_comment = CommentRecord(
+        comment_id,
+        data.nickname,
+        data.content,
+        get_current_timestamp(),
+        data.isAISummary,
+        device_id,  # *** 重要：儲存 device_id ***
+    )
     
-    topics[topic_id]["comments"].append(new_comment)
+    room_store.add_comment(room, current_topic, new_comment)
+    _publish(room, "comment_added", {"topic": current_topic, "comment": _comment_view(new_comment)})
     return {"success": True, "comment_id": comment_id}
 
 # 取得所有留言 (RESTful 風格)
 @router.get("/api/rooms/{room}/comments")
-def get_room_comments(room: str):
+@serialized("room")
+def get_room_comments(room: str,
+                      order: str = "time",
+                      after: Optional[str] = None,
+                      limit: Optional[int] = Query(None, ge=1, le=500),
+                      if_none_match: Optional[str] = Header(None),
+                      accept_encoding: Optional[str] = Header(None)):
     """
     取得房間當前主題的留言 
     
@@ -714,40 +1054,128 @@ def get_room_comments(room: str):
     
     描述：
     取得指定房間當前主題的所有留言，並按照時間戳升冪排序。
+    提供 limit 時改為游標分頁：order=time 依留言先後，order=score 依
+    (好評 - 差評) 由高到低，皆由儲存層的索引直接取出，不需每次排序。
+    與 state 端點相同，支援 ETag / If-None-Match。
     
     參數：
     - room (str): 房間代碼 (路徑參數)
+    - order (str, 選填): "time"（預設）或 "score"
+    - after (str, 選填): 上一頁回傳的 next_cursor
+    - limit (int, 選填): 每頁筆數 (1-500)；未提供時依 order 回傳全部留言
+    - If-None-Match (header, 選填): 上次取得的 ETag
     
     返回值：
     - comments (list): 當前主題的留言列表
+    - next_cursor (str | None): 提供 limit 時才有，下一頁游標
     """
-    if room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(room):
         raise HTTPException(status_code=404, detail="Room not found")
-        
-    current_topic = ROOMS[room]["current_topic"]
-    if not current_topic:
-        return {"comments": []}
-        
-    topic_id = f"{room}_{current_topic}"
-    if topic_id not in topics:
-        return {"comments": []}
-
-    comments_with_votes = []
-    for comment in topics[topic_id]["comments"]:
-        comment_id = comment["id"]
-        vote_good = len(votes.get(comment_id, {}).get("good", []))
-        vote_bad = len(votes.get(comment_id, {}).get("bad", []))
-        
-        comment_with_votes = comment.copy()
-        comment_with_votes["vote_good"] = vote_good
-        comment_with_votes["vote_bad"] = vote_bad
-        comment_with_votes["votes"] = vote_good
-        comments_with_votes.append(comment_with_votes)
-    
-    return {"comments": sorted(comments_with_votes, key=lambda x: x["ts"])}
+
+    def build():
+        comments_json, next_cursor = _comments_array(room, order, after, limit)
+        if limit is None:
+            return _json_with_comments({}, comments_json)
+        return _json_with_comments({"next_cursor": next_cursor}, comments_json)
+
+    return _cached_json(if_none_match, _room_etag(room), build, accept_encoding,
+                        (room, ("comments", order, after, limit), room_store.room_version(room)))
+
+# 主題排行榜 (RESTful 風格)
+@router.get("/api/rooms/{room}/topics/{topic_title}/top")
+@serialized("room")
+def get_topic_top_comments(room: str,
+                           topic_title: str,
+                           k: int = Query(10, ge=1, le=500),
+                           if_none_match: Optional[str] = Header(None),
+                           accept_encoding: Optional[str] = Header(None)):
+    """
+    取得主題票數最高的留言
+
+    [GET] /api/rooms/{room}/topics/{topic_title}/top?k=10
+
+    描述：
+    依 (好評 - 差評) 由高到低、同分依留言先後，回傳指定主題的前 k 則留言。
+    排名由投票時即時更新的分數索引直接取出，不需重新排序整個主題。
+    支援 ETag / If-None-Match。
+
+    參數：
+    - room (str): 房間代碼 (路徑參數)
+    - topic_title (str): 主題名稱 (路徑參數，不限於當前主題)
+    - k (int, 選填): 筆數 (1-500，預設 10)
+
+    返回值：
+    - topic (str): 主題名稱
+    - comments (list): 排名由高到低的留言（含票數）
+    """
+    if not room_lifecycle.ensure_loaded(room):
+        raise HTTPException(status_code=404, detail="Room not found")
+
+    if not room_store.has_topic(room, topic_title):
+        raise HTTPException(status_code=404, detail=f"Topic '{topic_title}' not found in this room")
+
+    def build():
+        return _json_with_comments({"topic": topic_title}, _comments_json(room_store.top_comments(room, topic_title, k)))
+
+    return _cached_json(if_none_match, _room_etag(room), build, accept_encoding,
+                        (room, ("top", topic_title, k), room_store.room_version(room)))
+
+# 全文檢索留言
+@router.get("/api/rooms/{room}/search")
+@serialized("room")
+def search_room_comments(room: str,
+                         q: str = Query(..., min_length=1, max_length=200),
+                         limit: int = Query(20, ge=1, le=100),
+                         if_none_match: Optional[str] = Header(None)):
+    """
+    全文檢索房間內所有主題的留言
+
+    [GET] /api/rooms/{room}/search?q=預算
+
+    描述：
+    以房間的倒排索引查詢內容或暱稱包含所有查詢詞的留言（中文以兩字詞比對、英文以單字比對），
+    依 BM25 分數由高到低排序。索引在新增、刪除留言與改暱稱時即時更新，查詢不需掃描留言。
+    支援 ETag / If-None-Match。
+
+    參數：
+    - room (str): 房間代碼 (路徑參數)
+    - q (str): 查詢字串
+    - limit (int, 選填): 筆數 (1-100，預設 20)
+
+    返回值：
+    - query (str): 查詢字串
+    - total (int): 符合的留言總數
+    - results (list): 每筆包含 topic、score、comment（含票數）、
+      highlights（{"content": [[起, 迄], ...], "nickname": [...]}，命中詞在原文中的位置）
+    """
+    if not room_lifecycle.ensure_loaded(room):
+        raise HTTPException(status_code=404, detail="Room not found")
+
+    def build():
+        hits, total = room_store.search_comments(room, q, limit)
+        terms = tokenize(q, query=True)
+        return {
+            "query": q,
+            "total": total,
+            "results": [
+                {
+                    "topic": topic_name,
+                    "score": round(score, 4),
+                    "comment": _comment_view(comment),
+                    "highlights": {
+                        "content": highlight_spans(comment.content, terms),
+                        "nickname": highlight_spans(comment.nickname, terms),
+                    },
+                }
+                for topic_name, comment, score in hits
+            ],
+        }
+
+    return _cached_json(if_none_match, _room_etag(room), build)
 
 # 刪除單一留言 (RESTful 風格)
 @router.delete("/api/rooms/{room}/comments/{comment_id}")
+@serialized("room")
 def delete_comment_single(room: str, comment_id: str):
     """
     刪除單一留言與其投票紀錄
@@ -764,32 +1192,159 @@ def delete_comment_single(room: str, comment_id: str):
     回傳：
     - success (bool): 是否刪除成功
     """
-    if room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(room):
         raise HTTPException(status_code=404, detail="Room not found")
 
-    found = False
-    affected_topic_name = None
-    for topic_key, topic_obj in list(topics.items()):
-        if topic_obj.get("room_id") != room:
-            continue
-        comments_list = topic_obj.get("comments", [])
-        idx = next((i for i, c in enumerate(comments_list) if c.get("id") == comment_id), None)
-        if idx is not None:
-            affected_topic_name = topic_obj.get("topic_name", "")
-            comments_list.pop(idx)
-            found = True
-            break
-
-    if not found:
+    # 透過留言索引直接定位，並一併刪除投票紀錄
+    affected_topic_name = room_store.delete_comment(room, comment_id)
+    if affected_topic_name is None:
         raise HTTPException(status_code=404, detail="Comment not found")
 
-    if comment_id in votes:
-        del votes[comment_id]
-
+    _publish(room, "comment_deleted", {"topic": affected_topic_name, "comment_id": comment_id})
     return {"success": True}
 
+def _bulk_delete_comments(room, comment_ids):
+    """刪除多則留言並只推播一次快照，回傳 (被刪除的留言ID, 一併刪除的投票數)"""
+    votes_deleted = 0
+    # 只計算此房間內實際會被刪除的留言，重複的 ID 只算一次
+    for comment_id in dict.fromkeys(comment_ids):
+        if room_store.has_comment(room, comment_id):
+            vote_good, vote_bad = room_store.vote_counts(comment_id)
+            votes_deleted += vote_good + vote_bad
+    removed = room_store.delete_comments(room, comment_ids)
+    deleted = [comment_id for ids in removed.values() for comment_id in ids]
+    if deleted:
+        _publish_snapshot(room)
+    return deleted, votes_deleted
+
+# 批次刪除留言 (RESTful 風格)
+@router.post("/api/rooms/{room}/comments:delete")
+@serialized("room", inline=False)
+def delete_comments_bulk(room: str, data: BulkDeleteCommentsRequest):
+    """
+    批次刪除留言與其投票紀錄
+
+    [POST] /api/rooms/{room}/comments:delete
+
+    描述：
+    一次刪除多則留言（可跨主題），每個受影響的主題只走訪一次，
+    完成後推播一次完整快照，不會為每則留言各推播一個事件。
+
+    參數：
+    - room (str): 房間代碼 (路徑參數)
+    - data.comment_ids (list): 要刪除的留言ID
+
+    回傳：
+    - deleted (list): 已刪除的留言ID
+    - not_found (list): 找不到的留言ID
+    - votes_deleted (int): 一併刪除的投票數
+    """
+    if len(data.comment_ids) > COMMENT_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {COMMENT_BATCH_LIMIT} comments per batch")
+
+    if not room_lifecycle.ensure_loaded(room):
+        raise HTTPException(status_code=404, detail="Room not found")
+
+    not_found = [comment_id for comment_id in data.comment_ids if not room_store.has_comment(room, comment_id)]
+    deleted, votes_deleted = _bulk_delete_comments(room, data.comment_ids)
+    return {"success": True, "deleted": deleted, "not_found": not_found, "votes_deleted": votes_deleted}
+
+# 清空主題留言 (RESTful 風格)
+@router.delete("/api/rooms/{room}/topics/{topic_title}/comments")
+@serialized("room", inline=False)
+def clear_topic_comments(room: str, topic_title: str):
+    """
+    清空主題的所有留言與投票，主題本身保留
+
+    [DELETE] /api/rooms/{room}/topics/{topic_title}/comments
+
+    回傳：
+    - deleted (int): 刪除的留言數
+    - votes_deleted (int): 一併刪除的投票數
+    """
+    if not room_lifecycle.ensure_loaded(room):
+        raise HTTPException(status_code=404, detail="Room not found")
+
+    topic = room_store.get_topic(room, topic_title)
+    if topic is None:
+        raise HTTPException(status_code=404, detail=f"Topic '{topic_title}' not found in this room")
+
+    deleted, votes_deleted = _bulk_delete_comments(room, [comment.id for comment in topic["comments"]])
+    return {"success": True, "deleted": len(deleted), "votes_deleted": votes_deleted}
+
+# 批次匯入留言 (RESTful 風格)
+@router.post("/api/rooms/{room}/comments:import")
+@serialized("room", inline=False)
+def import_comments(room: str, data: CommentImportRequest):
+    """
+    批次匯入留言
+
+    [POST] /api/rooms/{room}/comments:import
+
+    描述：
+    把一組留言依序加入指定主題（例如以上一場討論匯出的留言作為起點）。
+    欄位與 /api/all_rooms、房間匯出的留言格式相同；票數等額外欄位會被忽略，
+    投票紀錄不會匯入。
+
+    匯入的留言不沿用來源的 ID：投票帳本以留言 ID 為鍵、儲存後端的留言列也以 ID 為主鍵，
+    沿用其他房間的 ID 會讓兩個房間共用票數與資料列。帶有 id 的留言改用由
+    (目標房間, 來源 ID) 推導的 UUID，因此同一份匯出重複匯入同一房間時會被辨識為重複而略過；
+    來源 ID 本身已在房間內（或同一批已出現過）時也略過。沒有 id 的留言每次都以新 ID 加入。
+    完成後推播一次完整快照。
+
+    參數：
+    - room (str): 房間代碼 (路徑參數)
+    - data.topic (str, 選填): 目標主題，未提供時使用當前主題；主題不存在時自動建立
+    - data.comments (list): [{id?, nickname, content, ts?, isAISummary?, device_id?}]
+
+    回傳：
+    - imported (list): 新增的留言ID（與輸入順序相同）
+    - skipped (list): 已匯入過或已存在而略過的來源留言ID
+    """
+    if len(data.comments) > COMMENT_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {COMMENT_BATCH_LIMIT} comments per batch")
+
+    if not room_lifecycle.ensure_loaded(room):
+        raise HTTPException(status_code=404, detail="Room not found")
+
+    topic_name = data.topic or ROOMS[room]["current_topic"]
+    if not topic_name:
+        raise HTTPException(status_code=400, detail="No active topic in the room")
+    new_topic = not room_store.has_topic(room, topic_name)
+
+    imported = []
+    skipped = []
+    seen = set()
+    now = get_current_timestamp()
+    for item in data.comments:
+        if item.id:
+            comment_id = str(uuid.uuid5(IMPORT_ID_NAMESPACE, f"{room}/{item.id}"))
+            if item.id in seen or room_store.has_comment(room, item.id) or room_store.has_comment(room, comment_id):
+                skipped.append(item.id)
+                continue
+            seen.add(item.id)
+        else:
+            comment_id = str(uuid.uuid4())
+        comment = CommentRecord(
+            comment_id,
+            item.nickname,
+            item.content,
+            item.ts if item.ts is not None else now,
+            item.isAISummary,
+            item.device_id,
+        )
+        room_store.add_comment(room, topic_name, comment)
+        imported.append(comment.id)
+
+    if new_topic and imported:
+        _publish_topics(room)
+    if imported:
+        _publish_snapshot(room)
+    return {"success": True, "topic": topic_name, "imported": imported, "skipped": skipped}
+
 # 投票功能 (RESTful 風格)
 @router.post("/api/rooms/{room}/comments/{comment_id}/vote")
+@serialized("room")
 def vote_comment(room: str, comment_id: str, data: VoteRequest):
     """
     為留言投票
@@ -814,36 +1369,25 @@ def vote_comment(room: str, comment_id: str, data: VoteRequest):
     if vote_type not in ["good", "bad"]:
         raise HTTPException(status_code=400, detail="Invalid vote type")
     
-    if room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(room):
         raise HTTPException(status_code=404, detail="Room not found")
     
     if not ROOMS[room].get("settings", {}).get("allowVoting", True):
         raise HTTPException(status_code=403, detail="主持人已關閉投票功能")
 
-    comment_found = any(
-        c["id"] == comment_id 
-        for t in topics.values() if t["room_id"] == room 
-        for c in t["comments"]
-    )
-    if not comment_found:
+    if not room_store.has_comment(room, comment_id):
         raise HTTPException(status_code=404, detail="Comment not found")
     
-    if comment_id not in votes:
-        votes[comment_id] = {"good": [], "bad": []}
-    
-    if device_id in votes[comment_id][vote_type]:
+    # 已投相反類型時會自動改票
+    if not room_store.cast_vote(room, comment_id, device_id, vote_type):
         raise HTTPException(status_code=409, detail="Already voted")
     
-    opposite_type = "bad" if vote_type == "good" else "good"
-    if device_id in votes[comment_id][opposite_type]:
-        votes[comment_id][opposite_type].remove(device_id)
-    
-    votes[comment_id][vote_type].append(device_id)
-    
+    _publish_votes(room, comment_id)
     return {"success": True}
 
 # 取消投票 (RESTful 風格)
 @router.delete("/api/rooms/{room}/comments/{comment_id}/vote")
+@serialized("room")
 def remove_vote_comment(room: str, comment_id: str, data: VoteRequest):
     """
     取消投票
@@ -868,21 +1412,95 @@ def remove_vote_comment(room: str, comment_id: str, data: VoteRequest):
     if vote_type not in ["good", "bad"]:
         raise HTTPException(status_code=400, detail="Invalid vote type")
     
-    if room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(room):
         raise HTTPException(status_code=404, detail="Room not found")
         
     if not ROOMS[room].get("settings", {}).get("allowVoting", True):
         raise HTTPException(status_code=403, detail="主持人已關閉投票功能")
 
-    if comment_id not in votes or device_id not in votes[comment_id][vote_type]:
+    if not room_store.retract_vote(room, comment_id, device_id, vote_type):
         raise HTTPException(status_code=404, detail="Vote not found")
     
-    votes[comment_id][vote_type].remove(device_id)
-    
+    _publish_votes(room, comment_id)
     return {"success": True}
 
+# 批次投票 (RESTful 風格)
+@router.post("/api/rooms/{room}/votes:batch")
+@serialized("room")
+def vote_comments_batch(room: str, data: BatchVoteRequest):
+    """
+    批次投票 / 取消投票
+
+    [POST] /api/rooms/{room}/votes:batch
+
+    描述：
+    一次送出同一裝置的多筆投票操作，房間與投票設定只檢查一次，
+    每筆留言以留言索引直接定位。回應包含受影響留言的最新票數與
+    該裝置的投票紀錄，用戶端不需要再另外取得 votes 或 state。
+
+    參數：
+    - room (str): 房間代碼 (路徑參數)
+    - data.device_id (str): 設備ID
+    - data.votes (list): [{comment_id, vote_type: "good" | "bad", action: "cast" | "retract"}]
+
+    返回值：
+    - results (list): 每筆操作的結果 {comment_id, status}，status 為
+      ok、already_voted、not_voted、not_found 或 invalid
+    - counts (list): 受影響留言的票數 {comment_id, vote_good, vote_bad, votes}
+    - voted_good / voted_bad (list): 該裝置目前已投好評 / 差評的留言ID
+    """
+    if len(data.votes) > VOTE_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {VOTE_BATCH_LIMIT} votes per batch")
+
+    if not room_lifecycle.ensure_loaded(room):
+        raise HTTPException(status_code=404, detail="Room not found")
+
+    if not ROOMS[room].get("settings", {}).get("allowVoting", True):
+        raise HTTPException(status_code=403, detail="主持人已關閉投票功能")
+
+    results = []
+    touched = {}
+    changed = {}
+    for item in data.votes:
+        comment_id = item.comment_id
+        if item.vote_type not in ("good", "bad") or item.action not in ("cast", "retract"):
+            status = "invalid"
+        elif not room_store.has_comment(room, comment_id):
+            status = "not_found"
+        elif item.action == "cast":
+            status = "ok" if room_store.cast_vote(room, comment_id, data.device_id, item.vote_type) else "already_voted"
+        else:
+            status = "ok" if room_store.retract_vote(room, comment_id, data.device_id, item.vote_type) else "not_voted"
+        if status not in ("invalid", "not_found"):
+            touched[comment_id] = None
+        if status == "ok":
+            changed[comment_id] = None
+        results.append({"comment_id": comment_id, "status": status})
+
+    # 同一則留言在批次中改了多次也只推播一次
+    for comment_id in changed:
+        _publish_votes(room, comment_id)
+
+    counts = []
+    for comment_id in touched:
+        vote_good, vote_bad = room_store.vote_counts(comment_id)
+        counts.append({"comment_id": comment_id, "vote_good": vote_good, "vote_bad": vote_bad, "votes": vote_good})
+    return {"success": True, "results": results, "counts": counts, **_user_votes(room, data.device_id)}
+
+def _user_votes(room, device_id):
+    """裝置在房間內的投票紀錄 {voted_good, voted_bad}"""
+    voted_good = []
+    voted_bad = []
+    for comment_id, vote_type in votes.device_votes(room, device_id).items():
+        if vote_type == "good":
+            voted_good.append(comment_id)
+        else:
+            voted_bad.append(comment_id)
+    return {"voted_good": voted_good, "voted_bad": voted_bad}
+
 # 獲取用戶投票記錄 (RESTful 風格)
 @router.get("/api/rooms/{room}/votes")
+@serialized("room")
 def get_user_votes(room: str, device_id: str):
     """
     獲取用戶的投票記錄
@@ -900,39 +1518,30 @@ def get_user_votes(room: str, device_id: str):
     - voted_good (list): 已投好評的留言ID列表
     - voted_bad (list): 已投差評的留言ID列表
     """
-    voted_good = []
-    voted_bad = []
-    
-    if room in ROOMS:
-        for topic_id, topic_data in topics.items():
-            if topic_data["room_id"] == room:
-                for comment in topic_data["comments"]:
-                    comment_id = comment["id"]
-                    if comment_id in votes:
-                        if device_id in votes[comment_id].get("good", []):
-                            voted_good.append(comment_id)
-                        if device_id in votes[comment_id].get("bad", []):
-                            voted_bad.append(comment_id)
-    
-    return {"voted_good": voted_good, "voted_bad": voted_bad}
+    if not room_lifecycle.ensure_loaded(room):
+        return {"voted_good": [], "voted_bad": []}
+    return _user_votes(room, device_id)
 
 # 更新房間設定 (新增的端點)
 @router.put("/api/rooms/{room}/settings")
+@serialized("room")
 def update_room_settings(room: str, new_settings: RoomSettingsRequest):
     """
     更新房間的問答與投票設定
     """
-    if room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(room):
         raise HTTPException(status_code=404, detail="Room not found")
     
     ROOMS[room]["settings"]["allowQuestions"] = new_settings.allowQuestions
     ROOMS[room]["settings"]["allowVoting"] = new_settings.allowVoting
+    _publish(room, "settings", ROOMS[room]["settings"])
     
     return {"success": True, "settings": ROOMS[room]["settings"]}
 
 # 更新參與者暱稱 (RESTful 風格)
 
 @router.put("/api/rooms/{room}/participants/{device_id}/nickname")
+@serialized("room")
 def update_participant_nickname(room: str, device_id: str, data: UpdateNicknameRequest):
     """
     更新參與者暱稱，並同步更新該用戶的所有留言。
@@ -942,32 +1551,24 @@ def update_participant_nickname(room: str, device_id: str, data: UpdateNicknameR
     if not new_nickname or len(new_nickname) > 10:
         raise HTTPException(status_code=400, detail="暱稱格式不符或過長")
 
-    if room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(room):
         raise HTTPException(status_code=404, detail="討論室不存在")
     
     # 1. 更新參與者列表中的暱稱
-    participant_found = False
-    if "participants_list" in ROOMS[room]:
-        for p in ROOMS[room]["participants_list"]:
-            if p['device_id'] == device_id:
-                p['nickname'] = new_nickname
-                participant_found = True
-                break
-    
-    if not participant_found:
+    if not presence_tracker.rename(room, device_id, new_nickname):
         raise HTTPException(status_code=404, detail="參與者不存在")
+    room_store.save_participant(room, device_id, new_nickname, get_current_timestamp())
     
     # 2. *** 重要：使用 device_id 更新該用戶所有留言的暱稱 ***
-    for topic in topics.values():
-        if topic["room_id"] == room:
-            for comment in topic["comments"]:
-                if comment.get("device_id") == device_id:
-                    comment["nickname"] = new_nickname
+    room_store.rename_device_comments(room, device_id, new_nickname)
     
+    _publish(room, "nickname", {"device_id": device_id, "nickname": new_nickname})
+    _publish_presence(room)
     return {"success": True, "message": "暱稱已更新"}
 
 # 更新當前主題 (RESTful 風格)
 @router.put("/api/rooms/{room}/topic")
+@serialized("room")
 def update_current_topic(room: str, data: TopicUpdateRequest):
     """
     更新房間的當前主題
@@ -985,34 +1586,30 @@ def update_current_topic(room: str, data: TopicUpdateRequest):
     - success (bool): 是否成功更新
     - status (str): 更新後房間的狀態
     """
-    if room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(room):
         raise HTTPException(status_code=404, detail="Room not found")
     
     new_topic = data.topic.strip()
     
     # 檢查新主題是否存在於該房間的主題列表中
-    topic_id = f"{room}_{new_topic}"
-    if topic_id not in topics:
-        # 如果主題不存在，可以選擇創建它或返回錯誤
-        # 這裡我們選擇創建它，以符合新增主題後直接切換的流程
-        topics[topic_id] = {
-            "room_id": room,
-            "topic_name": new_topic,
-            "comments": []
-        }
+    # 如果主題不存在，可以選擇創建它或返回錯誤
+    # 這裡我們選擇創建它，以符合新增主題後直接切換的流程
+    room_store.ensure_topic(room, new_topic)
 
     ROOMS[room]["current_topic"] = new_topic
-    ROOMS[room]["status"] = "Discussion" # 切換主題時自動進入討論狀態
+    room_store.set_status(room, "Discussion")  # 切換主題時自動進入討論狀態
+    _publish_snapshot(room)
     
     return {"success": True, "status": ROOMS[room]["status"]}
 
 # 重新命名主題 (RESTful 風格)
 @router.post("/api/rooms/{room}/topics/rename")
+@serialized("room")
 def rename_topic(room: str, data: RenameTopicRequest):
     """
     重新命名一個主題
     """
-    if room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(room):
         raise HTTPException(status_code=404, detail="Room not found")
 
     old_topic_name = data.old_topic.strip()
@@ -1024,59 +1621,48 @@ def rename_topic(room: str, data: RenameTopicRequest):
     if old_topic_name == new_topic_name:
         return {"success": True, "is_current_topic": False, "detail": "No change in topic name."}
 
-    old_topic_id = f"{room}_{old_topic_name}"
-    new_topic_id = f"{room}_{new_topic_name}"
-
-    if old_topic_id not in topics:
+    if not room_store.has_topic(room, old_topic_name):
         raise HTTPException(status_code=404, detail=f"Old topic '{old_topic_name}' not found")
     
-    if new_topic_id in topics:
+    if room_store.has_topic(room, new_topic_name):
         raise HTTPException(status_code=409, detail=f"New topic name '{new_topic_name}' already exists")
 
-    # 更新 topics 字典
-    topic_data = topics.pop(old_topic_id)
-    topic_data['topic_name'] = new_topic_name
-    topics[new_topic_id] = topic_data
+    # 更新主題與留言索引
+    room_store.rename_topic(room, old_topic_name, new_topic_name)
 
     # 檢查是否為當前主題
     is_current = (ROOMS[room].get("current_topic") == old_topic_name)
     if is_current:
         ROOMS[room]["current_topic"] = new_topic_name
 
+    _publish_topics(room)
     return {"success": True, "is_current_topic": is_current}
 
 @router.delete("/api/rooms/{room_code}/topics/{topic_title}")
-async def delete_room_topic(room_code: str, topic_title: str):
+@serialized("room_code")
+def delete_room_topic(room_code: str, topic_title: str):
     """
     刪除一個主題及其所有相關資料。
     """
-    if room_code not in ROOMS:
+    if not room_lifecycle.ensure_loaded(room_code):
         raise HTTPException(status_code=404, detail="Room not found")
 
     room = ROOMS[room_code]
-    topic_id_to_delete = f"{room_code}_{topic_title}"
 
-    if topic_id_to_delete not in topics:
+    if not room_store.has_topic(room_code, topic_title):
         raise HTTPException(status_code=404, detail=f"Topic '{topic_title}' not found in this room")
 
-    # 1. 收集要刪除的留言ID
-    comments_in_topic = topics[topic_id_to_delete].get("comments", [])
-    comment_ids_to_delete = [c.get("id") for c in comments_in_topic if c.get("id")]
-
-    # 2. 刪除相關的投票
-    for comment_id in comment_ids_to_delete:
-        if comment_id in votes:
-            del votes[comment_id]
-
-    # 3. 刪除主題本身
-    del topics[topic_id_to_delete]
+    # 1. 刪除主題本身、其留言與相關的投票
+    room_store.delete_topic(room_code, topic_title)
 
-    # 4. 如果被刪除的是當前主題，則更新房間的當前主題
+    # 2. 如果被刪除的是當前主題，則更新房間的當前主題
     if room.get("current_topic") == topic_title:
         # 尋找一個新的主題來設定為當前主題
-        remaining_topics = [t['topic_name'] for t_id, t in topics.items() if t.get("room_id") == room_code]
+        remaining_topics = room_store.topic_names(room_code)
         room["current_topic"] = remaining_topics[0] if remaining_topics else None
+        _publish_snapshot(room_code)
     
+    _publish_topics(room_code)
     return {"success": True, "detail": f"Topic '{topic_title}' and its comments have been deleted."}
 
 
@@ -1092,27 +1678,42 @@ async def delete_room_topic(room_code: str, topic_title: str):
 # @router.post("/api/participants/update_nickname") ...
 
 @router.get("/api/all_rooms")
-def get_all_rooms():
+def get_all_rooms(room: Optional[List[str]] = Query(None),
+                  created_after: Optional[float] = None,
+                  created_before: Optional[float] = None,
+                  since: Optional[float] = None,
+                  format: str = "ndjson"):
     """
-    取得所有房間資訊
+    串流匯出房間狀態（調試用）
 
     [GET] /api/all_rooms
 
     描述：
-    獲取所有房間的資訊（調試用）。
+    逐筆輸出房間、主題、留言與投票紀錄（格式見 state_dump），一次只序列化一個房間，
+    大型實例匯出時記憶體用量維持平穩，事件迴圈也不會被單一次編碼卡住。
+
+    參數：
+    - room (str, 可重複): 只匯出這些房間（已封存的房間不會載回）
+    - created_after / created_before (float, optional): 只匯出建立時間在此區間內的房間
+    - since (float, optional): 只匯出此時間之後的留言與其投票
+    - format (str): ndjson（預設）或 msgpack（需安裝 msgpack）
 
     返回值：
-    - rooms (list): 所有房間的資訊列表
-    - topics (list): 所有主題的資訊列表
-    - votes (dict): 所有投票的資訊
+    - NDJSON 或 msgpack 串流，每筆紀錄以 kind 欄位區分 room、topic、comment、vote
     """
-    return {
-        "ROOMS": ROOMS, 
-        "topics": topics, 
-        "votes": votes
-    }
+    if format not in dump_formats():
+        raise HTTPException(status_code=400, detail=f"Unsupported format, use one of {dump_formats()}")
+    if room is not None:
+        codes = [code for code in room if room_store.has_room(code)]
+        if created_after is not None or created_before is not None:
+            in_range = set(room_store.directory.page(created_after=created_after, created_before=created_before)[0])
+            codes = [code for code in codes if code in in_range]
+    else:
+        codes = room_store.directory.page(created_after=created_after, created_before=created_before)[0]
+    return StreamingResponse(stream_rooms(room_store, codes, format, since), media_type=DUMP_MEDIA_TYPES[format])
 
 @router.post("/api/room_update_info")
+@serialized("data.room")
 def update_room_info(data: UpdateRoomInfoRequest):
     """
     修改房間資訊
@@ -1142,12 +1743,13 @@ def update_room_info(data: UpdateRoomInfoRequest):
     if new_summary is not None and len(new_summary) > 2000:
         raise HTTPException(status_code=400, detail="Summary is too long")
 
-    if room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(room):
         raise HTTPException(status_code=404, detail="Room not found")
     
     ROOMS[room]["title"] = new_title
     if new_summary is not None:
         ROOMS[room]["topic_summary"] = new_summary
+    _publish(room, "room_info", {"title": new_title, "topic_summary": ROOMS[room].get("topic_summary", "")})
         
     return {
         "success": True,
@@ -1157,6 +1759,7 @@ def update_room_info(data: UpdateRoomInfoRequest):
 
 # 設定房間是否允許新參與者加入
 @router.post("/api/room_allow_join")
+@serialized("data.room")
 def set_room_allow_join(data: AllowJoinRequest):
     """
     設定房間是否允許新參與者加入
@@ -1174,10 +1777,140 @@ def set_room_allow_join(data: AllowJoinRequest):
     - success (bool): 是否成功設定
     """
     room = data.room.strip()
-    if room not in ROOMS:
+    if not room_lifecycle.ensure_loaded(room):
         raise HTTPException(status_code=404, detail="Room not found")
     
     # 這裡我們假設有一個設定來控制，如果沒有，可以添加到 ROOMS 結構中
     ROOMS[room].setdefault("settings", {})["allowJoin"] = data.allow_join
+    _publish(room, "settings", ROOMS[room]["settings"])
     
     return {"success": True}
+
+# --- 即時推播 (WebSocket / SSE) ---
+async def _forward_room_events(websocket: WebSocket, room: str, queue: asyncio.Queue):
+    """先送出完整快照，之後轉送房間事件；閒置時送出 ping"""
+    snapshot = await _snapshot_event(room)
+    sent_id = snapshot["id"]
+    await websocket.send_json(snapshot)
+    while True:
+        try:
+            event = await asyncio.wait_for(queue.get(), timeout=WS_PING_INTERVAL)
+        except asyncio.TimeoutError:
+            await websocket.send_json({"id": sent_id, "type": "ping", "room": room, "data": None, "ts": get_current_timestamp()})
+            continue
+        if event["type"] == "closed":
+            # 房間已搬移或封存，關閉連線讓用戶端重新連線
+            await websocket.close(code=4410)
+            return
+        if event["id"] <= sent_id and event["type"] != "resync":
+            continue
+        if event["type"] == "resync":
+            event = await _snapshot_event(room)
+        sent_id = event["id"]
+        await websocket.send_json(event)
+
+@router.websocket("/ws/rooms/{room}")
+async def room_websocket(websocket: WebSocket, room: str):
+    """
+    討論室即時推播通道
+
+    [WS] /ws/rooms/{room}
+
+    描述：
+    連線後先收到一次完整快照 (snapshot)，之後只推送增量事件：
+    comment_added、comment_deleted、votes、status、settings、topics、
+    nickname、presence、room_info。用戶端可在同一連線送出
+    {"type": "heartbeat", "device_id": str} 取代 HTTP 心跳。
+    REST 端點仍保留作為無法使用 WebSocket 時的備援。
+    """
+    await websocket.accept()
+    if not await run_in_threadpool(room_lifecycle.ensure_loaded, room):
+        await websocket.send_json({"type": "error", "room": room, "data": {"detail": "Room not found"}, "ts": get_current_timestamp()})
+        await websocket.close(code=4404)
+        return
+
+    queue = room_events.subscribe(room)
+    sender = asyncio.create_task(_forward_room_events(websocket, room, queue))
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(message, dict) and message.get("type") == "heartbeat" and message.get("device_id"):
+                if room in ROOMS:
+                    _touch_participant(room, message["device_id"])
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        room_events.unsubscribe(room, queue)
+
+def _format_sse(event):
+    # 事件 ID 與版本號一樣帶上 worker 代號，重連到其他 worker 時改收完整快照
+    return f"id: {room_store.tag(event['id'])}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+@router.get("/api/rooms/{room}/events")
+async def stream_room_events(room: str, last_event_id: Optional[str] = Header(None)):
+    """
+    討論室事件串流 (Server-Sent Events)
+
+    [GET] /api/rooms/{room}/events
+
+    描述：
+    提供與 WebSocket 相同的事件內容，給無法升級 WebSocket 的代理環境使用。
+    首次連線會收到完整快照；瀏覽器重連時帶上 Last-Event-ID，
+    伺服器只補送環形緩衝區中遺漏的事件，緩衝區不足時改送完整快照。
+
+    參數：
+    - room (str): 房間代碼 (路徑參數)
+    - Last-Event-ID (header, 選填): 最後收到的事件 ID
+
+    回傳：
+    - text/event-stream，每筆事件的 data 為 JSON
+    """
+    if not await run_in_threadpool(room_lifecycle.ensure_loaded, room):
+        raise HTTPException(status_code=404, detail="Room not found")
+
+    resume_id = room_store.untag(last_event_id) if last_event_id else None
+
+    async def event_stream():
+        queue = room_events.subscribe(room)
+        try:
+            missed = room_events.events_since(room, resume_id) if resume_id is not None else None
+            if missed is None:
+                snapshot = await _snapshot_event(room)
+                sent_id = snapshot["id"]
+                yield _format_sse(snapshot)
+            else:
+                sent_id = resume_id
+                for event in missed:
+                    if event["type"] == "resync":
+                        event = await _snapshot_event(room)
+                    if event["id"] <= sent_id:
+                        continue
+                    sent_id = event["id"]
+                    yield _format_sse(event)
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event["type"] == "closed":
+                    return
+                if event["id"] <= sent_id and event["type"] != "resync":
+                    continue
+                if event["type"] == "resync":
+                    event = await _snapshot_event(room)
+                sent_id = event["id"]
+                yield _format_sse(event)
+        finally:
+            room_events.unsubscribe(room, queue)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # 關閉 nginx 緩衝，事件才能即時送達
+    })
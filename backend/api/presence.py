@@ -0,0 +1,247 @@
+"""
+參與者在線狀態模組
+以 device_id 索引每個房間的參與者，心跳只更新最後活動時間並把到期時間放進
+時間輪（timing wheel），不再掃描整個 participants_list。
+背景清掃執行緒每秒推進時間輪：超過 ONLINE_WINDOW 未活動的參與者轉為離線、
+超過 RETAIN_WINDOW 的從 participants_list 移除，並隨時維護在線人數計數，
+ROOMS[room]["participants"] 因此永遠是最新值。
+
+participants_list 仍保留在房間資料中（PDF 匯出、AI 提示詞與持久化會讀取），
+列表中的參與者 dict 與索引共用同一物件。
+"""
+
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .records import intern_text
+from .room_store import room_store
+
+ONLINE_WINDOW = 10   # 秒，心跳在此時間內視為在線
+RETAIN_WINDOW = 30   # 秒，超過此時間未活動即自參與者列表移除
+TICK = 1.0           # 時間輪每格的秒數
+WHEEL_SIZE = 64      # 格數需大於 RETAIN_WINDOW / TICK；更遠的到期時間會在繞回時重新排程
+
+
+class _Member:
+    __slots__ = ("participant", "tick", "online")
+
+    def __init__(self, participant: Dict[str, Any]):
+        self.participant = participant
+        self.tick = -1
+        self.online = False
+
+
+class _RoomPresence:
+    def __init__(self, participants: List[Dict[str, Any]]):
+        self.participants = participants
+        self.members: Dict[str, _Member] = {}
+        # device_id -> _Member，依上線順序
+        self.online: Dict[str, _Member] = {}
+
+
+class PresenceTracker:
+    """以時間輪管理到期的在線狀態追蹤器"""
+
+    def __init__(self, rooms: Dict[str, Dict[str, Any]], clock: Callable[[], float] = time.time,
+                 auto_sweep: bool = True):
+        """
+        Args:
+            clock: 目前時間（秒）；測試可傳入固定的時鐘
+            auto_sweep: 是否啟動每秒推進時間輪的背景執行緒；關閉時由呼叫端呼叫 advance
+        """
+        self._rooms = rooms
+        self._clock = clock
+        self._auto_sweep = auto_sweep
+        self._presence: Dict[str, _RoomPresence] = {}
+        self._wheel: List[Dict[Tuple[str, str], None]] = [{} for _ in range(WHEEL_SIZE)]
+        self._current_tick = self._tick_of(clock())
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[str], None]] = []
+        self._sweeper: Optional[threading.Thread] = None
+
+    def add_listener(self, callback: Callable[[str], None]):
+        """登記清掃時在線人數改變的通知，參數為房間代碼"""
+        self._listeners.append(callback)
+
+    # --- 對外操作 ---
+    def join(self, room: str, device_id: str, nickname: str, now: float) -> bool:
+        """加入或重新加入房間，回傳在線人數是否改變"""
+        device_id, nickname = intern_text(device_id), intern_text(nickname)
+        with self._lock:
+            presence = self._room(room)
+            member = presence.members.get(device_id)
+            if member is None:
+                participant = {"device_id": device_id, "nickname": nickname, "last_seen": now}
+                presence.participants.append(participant)
+                member = presence.members[device_id] = _Member(participant)
+            else:
+                member.participant["nickname"] = nickname
+            return self._touch(room, presence, member, now)
+
+    def touch(self, room: str, device_id: str, now: float) -> bool:
+        """心跳：O(1) 更新最後活動時間，回傳在線人數是否改變（未加入的裝置不處理）"""
+        with self._lock:
+            presence = self._room(room)
+            member = presence.members.get(device_id)
+            if member is None:
+                return False
+            return self._touch(room, presence, member, now)
+
+    def touch_many(self, pairs, now: float) -> Dict[str, bool]:
+        """
+        一次處理多個 (房間, 裝置) 心跳，整批只取一次鎖。
+
+        Returns:
+            {房間代碼: 在線人數是否改變}；不存在的房間不會出現在結果中
+        """
+        changed: Dict[str, bool] = {}
+        with self._lock:
+            for room, device_id in pairs:
+                if room not in self._rooms:
+                    continue
+                presence = self._room(room)
+                member = presence.members.get(device_id)
+                room_changed = member is not None and self._touch(room, presence, member, now)
+                changed[room] = changed.get(room, False) or room_changed
+        return changed
+
+    def rename(self, room: str, device_id: str, nickname: str) -> bool:
+        """更新參與者暱稱，找不到時回傳 False"""
+        with self._lock:
+            member = self._room(room).members.get(device_id)
+            if member is None:
+                return False
+            member.participant["nickname"] = intern_text(nickname)
+            return True
+
+    def online(self, room: str) -> List[Dict[str, str]]:
+        """在線參與者列表（只走訪在線者）"""
+        with self._lock:
+            if room not in self._rooms:
+                return []
+            return [
+                {"device_id": device_id, "nickname": member.participant["nickname"]}
+                for device_id, member in self._room(room).online.items()
+            ]
+
+    def drop_room(self, room: str):
+        with self._lock:
+            self._presence.pop(room, None)
+
+    # --- 內部 ---
+    @staticmethod
+    def _tick_of(timestamp: float) -> int:
+        return int(timestamp // TICK)
+
+    def _room(self, room: str) -> _RoomPresence:
+        """取得房間狀態；房間資料被整個替換（載入、同步）時重建索引"""
+        room_data = self._rooms[room]
+        participants = room_data.get("participants_list")
+        if participants is None:
+            participants = room_data["participants_list"] = []
+        presence = self._presence.get(room)
+        if presence is None or presence.participants is not participants:
+            self._ensure_sweeper()
+            presence = self._presence[room] = _RoomPresence(participants)
+            now = self._clock()
+            for participant in participants:
+                member = presence.members[participant["device_id"]] = _Member(participant)
+                if now - participant.get("last_seen", 0) <= ONLINE_WINDOW:
+                    member.online = True
+                    presence.online[participant["device_id"]] = member
+                self._schedule(room, member, participant.get("last_seen", 0))
+            room_data["participants"] = len(presence.online)
+        return presence
+
+    def _touch(self, room: str, presence: _RoomPresence, member: _Member, now: float) -> bool:
+        member.participant["last_seen"] = now
+        changed = False
+        if not member.online:
+            member.online = True
+            presence.online[member.participant["device_id"]] = member
+            changed = self._update_count(room, presence)
+        self._schedule(room, member, now)
+        return changed
+
+    def _schedule(self, room: str, member: _Member, last_seen: float):
+        """依目前狀態把成員放進下一次需要檢查的格子（重複放入時舊的格子會被略過）"""
+        window = ONLINE_WINDOW if member.online else RETAIN_WINDOW
+        tick = max(math.ceil((last_seen + window) / TICK), self._current_tick + 1)
+        tick = min(tick, self._current_tick + WHEEL_SIZE - 1)
+        if tick == member.tick:
+            return
+        member.tick = tick
+        self._wheel[tick % WHEEL_SIZE][(room, member.participant["device_id"])] = None
+
+    def _update_count(self, room: str, presence: _RoomPresence) -> bool:
+        room_data = self._rooms[room]
+        count = len(presence.online)
+        if room_data.get("participants") == count:
+            return False
+        room_data["participants"] = count
+        return True
+
+    # --- 背景清掃 ---
+    def _ensure_sweeper(self):
+        if self._sweeper is None and self._auto_sweep:
+            self._current_tick = self._tick_of(self._clock())
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="presence-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(TICK)
+            try:
+                changed_rooms = self.advance(self._clock())
+            except Exception as e:
+                print(f"❌ 在線狀態清掃時發生錯誤: {e}")
+                continue
+            for room in changed_rooms:
+                for callback in self._listeners:
+                    try:
+                        callback(room)
+                    except Exception as e:
+                        print(f"⚠️ 推播房間 {room} 在線狀態時發生錯誤: {e}")
+
+    def advance(self, now: float) -> List[str]:
+        """推進時間輪到 now，回傳在線人數有改變的房間"""
+        target = self._tick_of(now)
+        changed: Dict[str, None] = {}
+        with self._lock:
+            while self._current_tick < target:
+                self._current_tick += 1
+                slot = self._wheel[self._current_tick % WHEEL_SIZE]
+                if not slot:
+                    continue
+                due = list(slot)
+                slot.clear()
+                removed: Dict[str, set] = {}
+                for room, device_id in due:
+                    presence = self._presence.get(room)
+                    if presence is None or room not in self._rooms:
+                        continue
+                    member = presence.members.get(device_id)
+                    if member is None or member.tick != self._current_tick:
+                        continue  # 之後有新的心跳，已排入更晚的格子
+                    member.tick = -1
+                    idle = now - member.participant["last_seen"]
+                    if member.online and idle > ONLINE_WINDOW:
+                        member.online = False
+                        del presence.online[device_id]
+                        if self._update_count(room, presence):
+                            changed[room] = None
+                    elif not member.online and idle > RETAIN_WINDOW:
+                        del presence.members[device_id]
+                        removed.setdefault(room, set()).add(device_id)
+                        continue
+                    self._schedule(room, member, member.participant["last_seen"])
+                for room, device_ids in removed.items():
+                    presence = self._presence[room]
+                    presence.participants[:] = [p for p in presence.participants if p["device_id"] not in device_ids]
+        return list(changed)
+
+
+# 全局實例（與 room_store 共用同一份房間資料）
+presence_tracker = PresenceTracker(room_store.rooms)
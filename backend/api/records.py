@@ -0,0 +1,91 @@
+"""
+精簡資料紀錄模組
+留言以 __slots__ 類別保存，每筆不再帶一份 dict；暱稱與裝置 ID 以 sys.intern
+共用同一個字串物件（同一位參與者的上百則留言與投票只保留一份）。
+房間內的整數序號 seq 作為內部 ID，對外仍使用 UUID 字串。
+
+讀取端直接由紀錄組出回應內容（view），或直接序列化成 JSON 字串（to_json），
+持久化與除錯端點使用 to_dict。
+"""
+
+import sys
+from json.encoder import encode_basestring
+from typing import Any, Dict, Optional
+
+
+def intern_text(value: Optional[str]) -> Optional[str]:
+    """重複出現的短字串（暱稱、裝置 ID）只保留一份"""
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+def _json_text(value: Optional[str]) -> str:
+    return encode_basestring(value) if isinstance(value, str) else "null"
+
+
+def _json_number(value) -> str:
+    return float.__repr__(value) if isinstance(value, float) else str(int(value or 0))
+
+
+class CommentRecord:
+    """單則留言"""
+
+    __slots__ = ("id", "seq", "nickname", "content", "ts", "is_ai_summary", "device_id")
+
+    def __init__(self, comment_id: str, nickname: str, content: str, ts: float,
+                 is_ai_summary: bool = False, device_id: Optional[str] = None):
+        self.id = comment_id
+        # 房間內遞增的序號（即時間順序），加入房間時由 RoomStore 指定
+        self.seq = 0
+        self.nickname = intern_text(nickname)
+        self.content = content
+        self.ts = ts
+        self.is_ai_summary = bool(is_ai_summary)
+        self.device_id = intern_text(device_id)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CommentRecord":
+        """由舊格式的留言 dict（日誌、同步紀錄）建立"""
+        return cls(
+            data["id"],
+            data.get("nickname", ""),
+            data.get("content", ""),
+            data.get("ts", 0),
+            data.get("isAISummary", False),
+            data.get("device_id"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """輸出與舊版相同欄位的 dict"""
+        return {
+            "id": self.id,
+            "nickname": self.nickname,
+            "content": self.content,
+            "ts": self.ts,
+            "isAISummary": self.is_ai_summary,
+            "device_id": self.device_id,
+        }
+
+    def view(self, vote_good: int, vote_bad: int) -> Dict[str, Any]:
+        """API 回應與推播事件使用的內容（含票數）"""
+        return {
+            "id": self.id,
+            "nickname": self.nickname,
+            "content": self.content,
+            "ts": self.ts,
+            "isAISummary": self.is_ai_summary,
+            "device_id": self.device_id,
+            "vote_good": vote_good,
+            "vote_bad": vote_bad,
+            "votes": vote_good,
+        }
+
+    def to_json(self, vote_good: int, vote_bad: int) -> str:
+        """與 view 相同內容的 JSON 字串，不經過中間 dict"""
+        return (
+            f'{{"id":{_json_text(self.id)},"nickname":{_json_text(self.nickname)},'
+            f'"content":{_json_text(self.content)},"ts":{_json_number(self.ts)},'
+            f'"isAISummary":{"true" if self.is_ai_summary else "false"},"device_id":{_json_text(self.device_id)},'
+            f'"vote_good":{vote_good},"vote_bad":{vote_bad},"votes":{vote_good}}}'
+        )
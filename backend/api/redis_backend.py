@@ -0,0 +1,258 @@
+"""
+Redis 共用儲存模組
+讓多個 worker 行程（uvicorn --workers N 或多個 backend 容器）共用同一份討論室狀態。
+
+每個 worker 仍在記憶體中保留完整的 room_store 供讀取；本機的變更以 journal.py
+相同的紀錄格式批次寫入 Redis Stream，其他 worker 的讀取執行緒持續 XREAD
+新紀錄並套用到自己的 room_store，再透過 room_store.notify_remote_change
+讓本機的 WebSocket / SSE 連線收到完整快照、輪詢端的 ETag 也隨之失效。
+
+新 worker 啟動時載入 Redis 中的快照與其後的 Stream 紀錄；
+讀取到一定數量的紀錄後，由取得鎖的 worker 寫入新的快照並修剪 Stream。
+
+各 worker 的房間版本號與事件 ID 各自遞增，因此載入時設定 room_store.instance_id，
+對外的 ETag、增量同步游標與 SSE 事件 ID 都帶上 worker 代號，換到其他 worker 時改收完整內容。
+參與者加入與改暱稱也經由 Stream 複製（OP_PARTICIPANT），心跳、改暱稱與留言的
+裝置比對在任何一個 worker 上都找得到該參與者；心跳本身不複製，在線狀態由各 worker 自行判斷。
+
+寫入順序：本機變更先套用到自己的 room_store 再送出，其他 worker 依 Stream ID 順序套用，
+不依 Stream ID 重新排序本機已套用的變更。兩個 worker 對同一筆資料同時做出衝突的寫入
+（例如同時改名同一個議題、同一裝置同時改投不同票）時，各 worker 以最後套用的一筆為準，
+彼此的狀態可能分歧，直到該筆資料再次被改寫或重新載入快照。
+"""
+
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from .journal import (
+    OP_COMMENT, OP_DELETE_COMMENT, OP_DELETE_COMMENTS, OP_DELETE_ROOM, OP_DELETE_TOPIC, OP_DELETE_VOTE, OP_PARTICIPANT,
+    OP_RENAME_DEVICE, OP_RENAME_TOPIC, OP_ROOM, OP_TOPIC, OP_VOTE, apply_record, dump_store, encode_record,
+    iter_records,
+)
+from .records import CommentRecord
+from .room_actor import room_actors
+from .storage import StorageBackend
+
+try:
+    import redis
+except ImportError:  # 只有 SYNCAI_STORAGE=redis 時才需要
+    redis = None
+
+
+class RedisBackend(StorageBackend):
+    """以 Redis Stream 複製變更的共用後端"""
+
+    name = "redis"
+    shared = True
+
+    def __init__(self, url: str = "redis://localhost:6379/0", client=None, prefix: str = "syncai",
+                 flush_interval: float = 0.005, snapshot_every: int = 100000):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("SYNCAI_STORAGE=redis 需要安裝 redis 套件（pip install redis）")
+            client = redis.Redis.from_url(url)
+        self._redis = client
+        self.stream_key = f"{prefix}:journal"
+        self.snapshot_key = f"{prefix}:snapshot"
+        self.snapshot_lock_key = f"{prefix}:snapshot:lock"
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+        self.instance_id = uuid.uuid4().hex[:8]
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{self.instance_id}".encode()
+
+        self._store = None
+        self._pending: List[bytes] = []
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        # 套用其他 worker 的紀錄時不再寫回 Redis
+        self._local = threading.local()
+        self._last_id: bytes = b"0-0"
+        self._entries_since_snapshot = 0
+        self._threads: List[threading.Thread] = []
+
+    @contextmanager
+    def _applying_remote(self):
+        previous = getattr(self._local, "applying", False)
+        self._local.applying = True
+        try:
+            yield
+        finally:
+            self._local.applying = previous
+
+    # --- 載入 ---
+    def load(self, store) -> int:
+        started = time.perf_counter()
+        self._store = store
+        store.instance_id = self.instance_id
+        records = 0
+        with self._applying_remote():
+            snapshot = self._redis.hgetall(self.snapshot_key)
+            if snapshot:
+                for op, args in iter_records(snapshot[b"data"], "redis snapshot"):
+                    apply_record(store, op, args)
+                    records += 1
+                self._last_id = snapshot[b"last_id"]
+            while True:
+                response = self._redis.xread({self.stream_key: self._last_id}, count=1000)
+                if not response:
+                    break
+                for _, entries in response:
+                    records += self._apply_entries(entries, notify=False)
+        print(f"🔗 Redis 共用狀態：套用 {records} 筆紀錄，耗時 {(time.perf_counter() - started) * 1000:.1f} ms"
+              f"（worker {self.worker_id.decode()}）")
+
+        for target, name in ((self._flush_loop, "redis-flusher"), (self._read_loop, "redis-reader")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return len(store.rooms)
+
+    def _apply_entries(self, entries, notify: bool) -> int:
+        """套用 Stream 紀錄；notify 時略過本 worker 自己寫入的紀錄並通知變更的房間"""
+        applied = 0
+        changed_rooms: Dict[str, None] = {}
+        for entry_id, fields in entries:
+            self._last_id = entry_id
+            self._entries_since_snapshot += 1
+            if notify and fields.get(b"w") == self.worker_id:
+                continue
+            for op, args in iter_records(fields[b"r"], "redis stream"):
+                if op == OP_PARTICIPANT:
+                    # 在線狀態不屬於房間內容，不經過 actor，也不觸發完整快照
+                    self._store.notify_remote_participant(*args)
+                    applied += 1
+                    continue
+                # 與本機端點的寫入一樣經由房間的 actor 套用；套用的執行緒不一定是本執行緒
+                room_actors.run(args[0], lambda op=op, args=args: self._apply_remote(op, args))
+                changed_rooms[args[0]] = None
+                applied += 1
+        if notify:
+            for code in changed_rooms:
+                self._store.notify_remote_change(code)
+        return applied
+
+    def _apply_remote(self, op: int, args: List[Any]):
+        with self._applying_remote():
+            apply_record(self._store, op, args)
+
+    # --- 寫入（批次送出） ---
+    def _append(self, op: int, args: List[Any]):
+        if getattr(self._local, "applying", False):
+            return
+        record = encode_record(op, args)
+        with self._lock:
+            self._pending.append(record)
+        self._wake.set()
+
+    def save_room(self, code: str, room: Dict[str, Any]):
+        self._append(OP_ROOM, [code, room])
+
+    def delete_room(self, code: str):
+        self._append(OP_DELETE_ROOM, [code])
+
+    def save_topic(self, code: str, topic_name: str):
+        self._append(OP_TOPIC, [code, topic_name])
+
+    def delete_topic(self, code: str, topic_name: str):
+        self._append(OP_DELETE_TOPIC, [code, topic_name])
+
+    def rename_topic(self, code: str, old_name: str, new_name: str):
+        self._append(OP_RENAME_TOPIC, [code, old_name, new_name])
+
+    def save_comment(self, code: str, topic_name: str, seq: int, comment: CommentRecord):
+        self._append(OP_COMMENT, [code, topic_name, comment.to_dict(), seq])
+
+    def delete_comment(self, code: str, comment_id: str):
+        self._append(OP_DELETE_COMMENT, [code, comment_id])
+
+    def delete_comments(self, code: str, comment_ids: List[str]):
+        self._append(OP_DELETE_COMMENTS, [code, comment_ids])
+
+    def rename_device(self, code: str, device_id: str, nickname: str):
+        self._append(OP_RENAME_DEVICE, [code, device_id, nickname])
+
+    def save_vote(self, code: str, comment_id: str, device_id: str, vote_type: str):
+        self._append(OP_VOTE, [code, comment_id, device_id, vote_type])
+
+    def delete_vote(self, code: str, comment_id: str, device_id: str):
+        self._append(OP_DELETE_VOTE, [code, comment_id, device_id])
+
+    def save_participant(self, code: str, device_id: str, nickname: str, last_seen: float):
+        self._append(OP_PARTICIPANT, [code, device_id, nickname, last_seen])
+
+    def flush(self):
+        with self._io_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                # 一批紀錄合併為一個 Stream 項目，減少往返與 Stream 長度
+                self._redis.xadd(self.stream_key, {b"w": self.worker_id, b"r": b"".join(batch)})
+            except Exception:
+                with self._lock:
+                    self._pending[:0] = batch
+                raise
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(1.0)
+            self._wake.clear()
+            # 稍等片刻讓同一瞬間的變更合併成一批
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"❌ 寫入 Redis 失敗，稍後重試: {e}")
+                self._stop.wait(1.0)
+
+    # --- 讀取其他 worker 的變更 ---
+    def _read_loop(self):
+        while not self._stop.is_set():
+            try:
+                response = self._redis.xread({self.stream_key: self._last_id}, count=500, block=1000)
+            except Exception as e:
+                print(f"❌ 讀取 Redis Stream 失敗，稍後重試: {e}")
+                self._stop.wait(1.0)
+                continue
+            with self._applying_remote():
+                for _, entries in response or ():
+                    self._apply_entries(entries, notify=True)
+            if self._entries_since_snapshot >= self.snapshot_every:
+                self._snapshot()
+
+    def _snapshot(self):
+        """寫入目前狀態的快照，並修剪已被上一份快照涵蓋的 Stream 紀錄"""
+        self._entries_since_snapshot = 0
+        # 多個 worker 同時到達門檻時只由一個寫入
+        if not self._redis.set(self.snapshot_lock_key, self.worker_id, nx=True, ex=60):
+            return
+        try:
+            last_id = self._last_id
+            data = dump_store(self._store)
+            previous_id: Optional[bytes] = self._redis.hget(self.snapshot_key, "last_id")
+            self._redis.hset(self.snapshot_key, mapping={"data": data, "last_id": last_id})
+            # 保留一份快照週期的紀錄，讓稍微落後的 worker 仍能接續讀取
+            if previous_id:
+                self._redis.xtrim(self.stream_key, minid=previous_id)
+        except Exception as e:
+            print(f"❌ 寫入 Redis 快照失敗: {e}")
+        finally:
+            self._redis.delete(self.snapshot_lock_key)
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"❌ 關閉前寫入 Redis 失敗: {e}")
@@ -0,0 +1,143 @@
+"""
+房間回應快取模組
+同一房間的所有輪詢者在同一版本下拿到的回應內容相同，因此每個房間保留一份
+已序列化的回應 bytes，並在第一次有用戶端要求時產生 gzip / brotli 壓縮版本；
+序列化與壓縮在每次變更後只執行一次，而不是每個輪詢者各做一次。
+
+快取項目以呼叫端提供的 stamp（例如 (房間版本, 倒數秒數)）判斷是否仍有效，
+stamp 不同即重新產生。每個房間最多保留 MAX_VARIANTS 種回應，超過時淘汰最久未使用的一種。
+
+JSON 以 orjson 序列化、brotli 壓縮；未安裝時分別改用 json 與只提供 gzip。
+"""
+
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # 未安裝時改用標準庫 json
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # 未安裝時只提供 gzip
+    brotli = None
+
+COMPRESS_MIN_SIZE = 1024  # bytes，較小的回應壓縮後節省有限，直接送出
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+MAX_VARIANTS = 16  # 每個房間快取的回應種類（端點 + 查詢參數）上限
+
+
+def dumps(obj) -> bytes:
+    """序列化成 UTF-8 JSON bytes（非 ASCII 字元不跳脫）"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def negotiate(accept_encoding: Optional[str]) -> str:
+    """依 Accept-Encoding 選出 "br"、"gzip" 或 "identity" """
+    if not accept_encoding:
+        return "identity"
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q=") and params[2:] in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(coding.strip().lower())
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return "identity"
+
+
+class CachedBody:
+    """一份回應內容與其壓縮版本"""
+
+    __slots__ = ("identity", "_encoded", "_lock")
+
+    def __init__(self, identity: bytes):
+        self.identity = identity
+        self._encoded: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding: str) -> Tuple[bytes, str]:
+        """
+        取得指定編碼的內容，第一次要求時才壓縮。
+
+        Returns:
+            (內容, 實際使用的編碼)；內容太小時一律回傳未壓縮內容與 "identity"
+        """
+        if encoding == "identity" or len(self.identity) < COMPRESS_MIN_SIZE:
+            return self.identity, "identity"
+        body = self._encoded.get(encoding)
+        if body is None:
+            with self._lock:
+                body = self._encoded.get(encoding)
+                if body is None:
+                    if encoding == "br":
+                        body = brotli.compress(self.identity, quality=BROTLI_QUALITY)
+                    else:
+                        body = gzip.compress(self.identity, GZIP_LEVEL, mtime=0)
+                    self._encoded[encoding] = body
+        return body, encoding
+
+
+class ResponseCache:
+    """以房間分組的回應快取"""
+
+    def __init__(self):
+        # room -> {variant: (stamp, CachedBody)}，依最近使用順序排列（最久未使用的在前）
+        self._rooms: Dict[str, "OrderedDict[Hashable, Tuple[Hashable, CachedBody]]"] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, room: str, variant: Hashable, stamp: Hashable, build: Callable[[], bytes]) -> CachedBody:
+        """取得快取的回應；stamp 改變時呼叫 build 重新產生（同一時間只會產生一次）"""
+        variants = self._rooms.get(room)
+        entry = variants.get(variant) if variants is not None else None
+        if entry is not None and entry[0] == stamp:
+            self._touch(variants, variant)
+            return entry[1]
+        with self._room_lock(room):
+            variants = self._rooms.setdefault(room, OrderedDict())
+            entry = variants.get(variant)
+            if entry is not None and entry[0] == stamp:
+                self._touch(variants, variant)
+                return entry[1]
+            body = CachedBody(build())
+            variants[variant] = (stamp, body)
+            variants.move_to_end(variant)
+            while len(variants) > MAX_VARIANTS:
+                variants.popitem(last=False)
+            return body
+
+    def drop_room(self, room: str):
+        with self._lock:
+            self._rooms.pop(room, None)
+            self._locks.pop(room, None)
+
+    @staticmethod
+    def _touch(variants: OrderedDict, variant: Hashable):
+        # 命中時不取鎖；同時被其他執行緒淘汰時略過
+        try:
+            variants.move_to_end(variant)
+        except KeyError:
+            pass
+
+    def _room_lock(self, room: str) -> threading.Lock:
+        lock = self._locks.get(room)
+        if lock is None:
+            with self._lock:
+                lock = self._locks.setdefault(room, threading.Lock())
+        return lock
+
+
+# 全局實例
+response_cache = ResponseCache()
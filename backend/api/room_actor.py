@@ -0,0 +1,240 @@
+"""
+討論室寫入序列化模組（每個房間一個 actor）
+同步端點在 threadpool 中並行執行，修改同一房間的請求改由房間的 actor 依序套用：
+請求把命令放進房間的佇列後取得房間鎖，取得鎖的執行緒一次執行佇列中所有
+等待中的命令（包含其他執行緒放入的），因此同一房間同時間只有一個寫入者，
+不同房間互不阻塞，也不需要為每個房間常駐一條執行緒。
+
+同一批命令產生的變更只遞增一次房間版本、推播一次事件：
+- 單一事件照原樣推播；多個事件合併成一個 batch 事件 {"events": [{type, data}, ...]}
+- 同一則留言的多次票數更新只保留最後一次
+- 批次中出現完整快照時，之前的事件已被快照涵蓋而略過
+
+讀取留言、分數索引、分頁與變更紀錄的端點同樣在 actor 中執行：批次匯入 / 刪除、封存
+與其他 worker 的變更都在 threadpool 中修改這些結構，讀取端不經過 actor 會看到修改到
+一半的索引。只讀取 presence 的端點（心跳、在線列表）不經過 actor。
+
+端點裝飾器（serialized、fast_path）產生 async 端點：房間已在記憶體中時直接在事件迴圈
+上執行（都是微秒級的記憶體操作，不值得交給 threadpool 往返），房間需自封存載回、
+或 actor 正由其他執行緒持有時才交給 threadpool，事件迴圈不會等待鎖。
+"""
+
+import functools
+import threading
+import weakref
+from collections import deque
+from typing import Any, Callable, Deque, List, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from .room_events import room_events
+from .room_store import room_store
+
+# 每批最多執行的命令數，避免持續湧入的請求讓推播延遲過久
+MAX_BATCH = 256
+
+# (事件種類, 事件內容, 變更紀錄)
+PendingEvent = Tuple[str, Any, Tuple]
+
+
+class _Command:
+    __slots__ = ("fn", "done", "result", "error")
+
+    def __init__(self, fn: Callable[[], Any]):
+        self.fn = fn
+        self.done = False
+        self.result = None
+        self.error = None
+
+
+class _RoomActor:
+    __slots__ = ("lock", "pending", "__weakref__")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending: Deque[_Command] = deque()
+
+
+class RoomActors:
+    """所有房間的 actor；沒有命令在執行的房間不保留任何狀態"""
+
+    def __init__(self):
+        self._actors: "weakref.WeakValueDictionary[str, _RoomActor]" = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        # 目前執行緒正在執行哪個房間的命令，以及該批累積的事件
+        self._local = threading.local()
+
+    def run(self, room: str, fn: Callable[[], Any]) -> Any:
+        """在房間的 actor 中執行 fn 並回傳其結果（例外原樣拋出）"""
+        if getattr(self._local, "room", None) == room:
+            # 已在此房間的命令中（巢狀呼叫），直接執行
+            return fn()
+        actor = self._actor(room)
+        command = _Command(fn)
+        actor.pending.append(command)
+        with actor.lock:
+            if not command.done:
+                self._drain(room, actor)
+        if command.error is not None:
+            raise command.error
+        return command.result
+
+    def try_run(self, room: str, fn: Callable[[], Any]) -> Tuple[bool, Any]:
+        """
+        房間沒有其他寫入者時直接在呼叫端執行 fn，不等待鎖。
+
+        Returns:
+            (是否已執行, fn 的結果)；房間鎖正被其他執行緒持有時回傳 (False, None)
+        """
+        if getattr(self._local, "room", None) == room:
+            return True, fn()
+        actor = self._actor(room)
+        if not actor.lock.acquire(blocking=False):
+            return False, None
+        command = _Command(fn)
+        actor.pending.append(command)
+        try:
+            self._drain(room, actor)
+        finally:
+            actor.lock.release()
+        if command.error is not None:
+            raise command.error
+        return True, command.result
+
+    async def run_async(self, room: str, fn: Callable[[], Any], inline: bool = True) -> Any:
+        """
+        在事件迴圈上於房間的 actor 中執行 fn。
+
+        Args:
+            inline: 房間已載入且沒有其他寫入者時直接在事件迴圈上執行；
+                否則交給 threadpool 等待房間鎖，事件迴圈不會被阻塞
+        """
+        if inline and room_store.has_room(room):
+            done, result = self.try_run(room, fn)
+            if done:
+                return result
+        return await run_in_threadpool(self.run, room, fn)
+
+    def publish(self, room: str, event_type: str, data: Any, change: Tuple):
+        """記錄變更並推播；在房間的命令中呼叫時延到整批結束後一起送出"""
+        if getattr(self._local, "room", None) == room:
+            self._local.events.append((event_type, data, change))
+            return
+        self._commit(room, [(event_type, data, change)])
+
+    def _actor(self, room: str) -> _RoomActor:
+        with self._lock:
+            actor = self._actors.get(room)
+            if actor is None:
+                actor = self._actors[room] = _RoomActor()
+            return actor
+
+    def _drain(self, room: str, actor: _RoomActor):
+        """執行佇列中所有命令（呼叫端需持有 actor.lock）"""
+        local = self._local
+        # 命令中可能巢狀執行其他房間的命令，結束後還原外層房間的狀態
+        previous = (getattr(local, "room", None), getattr(local, "events", None))
+        while actor.pending:
+            events: List[PendingEvent] = []
+            local.room, local.events = room, events
+            try:
+                for _ in range(MAX_BATCH):
+                    if not actor.pending:
+                        break
+                    command = actor.pending.popleft()
+                    try:
+                        command.result = command.fn()
+                    except Exception as e:
+                        command.error = e
+                    command.done = True
+            finally:
+                local.room, local.events = previous
+                if events:
+                    self._commit(room, events)
+
+    @staticmethod
+    def _coalesce(events: List[PendingEvent]) -> List[PendingEvent]:
+        # 最後一個完整快照 / 重新同步標記之前的事件已被涵蓋
+        for i in range(len(events) - 1, -1, -1):
+            if events[i][0] == "resync":
+                # 重新同步時由連線端組出最新快照，之後的事件也一併涵蓋
+                return [events[i]]
+            if events[i][0] == "snapshot":
+                events = events[i:]
+                break
+        # 同一則留言的票數只保留最後一次
+        seen = set()
+        result = []
+        for event in reversed(events):
+            if event[0] == "votes":
+                comment_id = event[1]["comment_id"]
+                if comment_id in seen:
+                    continue
+                seen.add(comment_id)
+            result.append(event)
+        result.reverse()
+        return result
+
+    def _commit(self, room: str, events: List[PendingEvent]):
+        events = self._coalesce(events)
+        room_store.bump_version(room, *[change for _, _, change in events])
+        if len(events) == 1:
+            room_events.publish(room, events[0][0], events[0][1])
+        else:
+            room_events.publish(room, "batch", {"events": [{"type": t, "data": d} for t, d, _ in events]})
+
+
+# 全局實例
+room_actors = RoomActors()
+
+
+def _room_argument(room_param: str) -> Callable[[dict], str]:
+    """從端點參數取出房間代碼；room_param 可用 "data.room" 取參數的屬性"""
+    name, _, attribute = room_param.partition(".")
+
+    def room_of(kwargs: dict) -> str:
+        room = kwargs[name]
+        if attribute:
+            room = getattr(room, attribute)
+        return str(room).strip()
+
+    return room_of
+
+
+def serialized(room_param: str, inline: bool = True):
+    """
+    端點裝飾器：整個處理函式在房間的 actor 中執行（修改房間內容，或讀取留言、索引的端點）。
+
+    Args:
+        room_param: 房間代碼所在的參數名稱；可用 "data.room" 取參數的屬性
+        inline: 房間已載入且沒有其他寫入者時直接在事件迴圈上執行；
+            處理量與資料量成正比的端點（批次匯入、刪除）設為 False，一律交給 threadpool
+    """
+    room_of = _room_argument(room_param)
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await room_actors.run_async(room_of(kwargs), functools.partial(fn, *args, **kwargs), inline)
+        return wrapper
+
+    return decorate
+
+
+def fast_path(room_param: str):
+    """
+    端點裝飾器（只讀寫 presence 的端點：心跳、加入、在線列表）：房間已載入時直接在
+    事件迴圈上執行，需自封存載回時交給 threadpool。不經過 actor，不可讀取留言、
+    分數索引或變更紀錄，這些端點改用 serialized。
+    """
+    room_of = _room_argument(room_param)
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if room_store.has_room(room_of(kwargs)):
+                return fn(*args, **kwargs)
+            return await run_in_threadpool(fn, *args, **kwargs)
+        return wrapper
+
+    return decorate
@@ -0,0 +1,106 @@
+"""
+討論室目錄索引模組
+依建立時間排序的房間代碼列表，另外為每種房間狀態維護一份同樣排序的列表，
+房間列表依狀態或建立時間篩選、分頁時以二分搜尋定位範圍，不必逐一檢查所有房間。
+"""
+
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Optional, Tuple
+
+# (created_at, code)：依建立時間排序，同一時間依代碼
+DirectoryKey = Tuple[float, str]
+
+
+def _created_at(key: DirectoryKey) -> float:
+    return key[0]
+
+
+def make_cursor(created_at: float, code: str) -> str:
+    """分頁游標：(建立時間, 代碼) 為全域唯一的排序鍵，分片後各 shard 也能以同一個游標定位"""
+    return f"{float(created_at)!r}:{code}"
+
+
+class RoomDirectory:
+    """所有在記憶體中的房間的建立時間與狀態索引"""
+
+    def __init__(self):
+        self._all: List[DirectoryKey] = []
+        self._by_status: Dict[str, List[DirectoryKey]] = {}
+        self._entries: Dict[str, Tuple[DirectoryKey, str]] = {}  # code -> (key, status)
+        # 列表讀取與更新可能在不同執行緒，位置計算與切片需看到一致的列表
+        self._lock = threading.Lock()
+
+    def add(self, code: str, created_at: float, status: str):
+        """登記房間；已登記時更新建立時間與狀態"""
+        with self._lock:
+            self._remove(code)
+            key = (float(created_at), code)
+            insort(self._all, key)
+            insort(self._by_status.setdefault(status, []), key)
+            self._entries[code] = (key, status)
+
+    def remove(self, code: str):
+        with self._lock:
+            self._remove(code)
+
+    def set_status(self, code: str, status: str):
+        with self._lock:
+            entry = self._entries.get(code)
+            if entry is None or entry[1] == status:
+                return
+            key, old_status = entry
+            self._discard(self._by_status[old_status], key)
+            if not self._by_status[old_status]:
+                del self._by_status[old_status]
+            insort(self._by_status.setdefault(status, []), key)
+            self._entries[code] = (key, status)
+
+    def page(self, status: Optional[str] = None, created_after: Optional[float] = None,
+             created_before: Optional[float] = None, after: Optional[str] = None,
+             limit: Optional[int] = None) -> Tuple[List[str], int, Optional[str]]:
+        """
+        依建立時間先後分頁取得房間代碼。
+
+        Args:
+            status: 只取此狀態的房間
+            created_after / created_before: 只取建立時間在此區間內（不含端點）的房間
+            after: 上一頁回傳的游標
+            limit: 每頁筆數；None 表示全部
+
+        Returns:
+            (房間代碼列表, 符合篩選條件的房間總數, 下一頁游標；沒有下一頁時為 None)
+
+        Raises:
+            ValueError: 游標格式不正確
+        """
+        after_key = None
+        if after is not None:
+            created_at, _, code = after.partition(":")
+            after_key = (float(created_at), code)
+        with self._lock:
+            keys = self._by_status.get(status, []) if status is not None else self._all
+            low = 0 if created_after is None else bisect_right(keys, created_after, key=_created_at)
+            high = len(keys) if created_before is None else bisect_left(keys, created_before, key=_created_at)
+            start = low if after_key is None else max(low, bisect_right(keys, after_key))
+            end = high if limit is None else min(high, start + limit)
+            page = keys[start:end]
+        next_cursor = make_cursor(*page[-1]) if page and end < high else None
+        return [code for _, code in page], max(high - low, 0), next_cursor
+
+    # --- 內部（呼叫端需持有 _lock） ---
+    def _remove(self, code: str):
+        entry = self._entries.pop(code, None)
+        if entry is None:
+            return
+        key, status = entry
+        self._discard(self._all, key)
+        self._discard(self._by_status[status], key)
+        if not self._by_status[status]:
+            del self._by_status[status]
+
+    @staticmethod
+    def _discard(keys: List[DirectoryKey], key: DirectoryKey):
+        position = bisect_left(keys, key)
+        if position < len(keys) and keys[position] == key:
+            keys.pop(position)
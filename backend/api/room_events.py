@@ -0,0 +1,133 @@
+"""
+討論室事件廣播模組
+participants_api 的每個變更都會發布事件到對應房間，
+WebSocket / SSE 連線訂閱房間後即可收到增量更新，不必每 3 秒輪詢完整狀態。
+每個房間的事件帶有遞增 ID，並保留在有限長度的環形緩衝區，
+供 SSE 斷線重連時依 Last-Event-ID 補送漏掉的事件。
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set
+
+# 每個訂閱者最多暫存的事件數，超過代表用戶端太慢，改為要求重新同步
+SUBSCRIBER_QUEUE_SIZE = 256
+# 每個房間保留的歷史事件數（斷線重連補送用）
+EVENT_BUFFER_SIZE = 512
+
+
+class RoomBroadcaster:
+    """以房間為單位的事件廣播器"""
+
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._history: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._last_id: Dict[str, int] = {}
+        self._buffer_size = buffer_size
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, room: str) -> asyncio.Queue:
+        """訂閱房間事件（需在事件迴圈中呼叫）"""
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(room, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, room: str, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(room)
+            if subscribers is None:
+                return
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[room]
+
+    def subscriber_count(self, room: str) -> int:
+        return len(self._subscribers.get(room, ()))
+
+    def last_event_id(self, room: str) -> int:
+        return self._last_id.get(room, 0)
+
+    def events_since(self, room: str, last_id: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        取得 last_id 之後的事件。
+
+        Returns:
+            事件列表；若緩衝區已不包含所需事件則回傳 None（需重新取得完整快照）
+        """
+        with self._lock:
+            current = self._last_id.get(room, 0)
+            if last_id > current:
+                return None
+            if last_id == current:
+                return []
+            history = self._history.get(room)
+            if not history or history[0]["id"] > last_id + 1:
+                return None
+            return [event for event in history if event["id"] > last_id]
+
+    def publish(self, room: str, event_type: str, data: Any = None):
+        """
+        發布事件到房間的所有訂閱者並記錄到緩衝區。
+        同步端點在 threadpool 中執行，因此跨執行緒時交由事件迴圈投遞；
+        編號與排程在同一把鎖內完成，確保投遞順序與事件 ID 一致。
+        """
+        with self._lock:
+            event_id = self._last_id.get(room, 0) + 1
+            self._last_id[room] = event_id
+            event = {"id": event_id, "type": event_type, "room": room, "data": data, "ts": time.time()}
+
+            history = self._history.get(room)
+            if history is None:
+                history = self._history[room] = deque(maxlen=self._buffer_size)
+            history.append(event)
+
+            self._schedule(room, event)
+
+    def drop_room(self, room: str):
+        """清除房間的事件紀錄，並通知仍在線的訂閱者結束連線（closed 事件）"""
+        with self._lock:
+            event_id = self._last_id.get(room, 0) + 1
+            self._schedule(room, {"id": event_id, "type": "closed", "room": room, "data": None, "ts": time.time()})
+            self._history.pop(room, None)
+            self._last_id.pop(room, None)
+
+    def _schedule(self, room: str, event: Dict[str, Any]):
+        """把事件交給房間的訂閱者（呼叫端需持有 _lock）"""
+        subscribers = self._subscribers.get(room)
+        if not subscribers or self._loop is None:
+            return
+        subscribers = list(subscribers)
+        if self._in_loop_thread():
+            self._deliver(event, subscribers)
+        else:
+            try:
+                self._loop.call_soon_threadsafe(self._deliver, event, subscribers)
+            except RuntimeError:
+                # 事件迴圈已關閉
+                pass
+
+    def _in_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    @staticmethod
+    def _deliver(event: Dict[str, Any], subscribers: List[asyncio.Queue]):
+        for queue in subscribers:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # 用戶端跟不上，清空佇列並要求重新取得完整快照
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(dict(event, type="resync", data=None))
+
+
+# 全局實例
+room_events = RoomBroadcaster()
@@ -0,0 +1,202 @@
+"""
+討論室生命週期管理模組
+已結束（status 為 End）或閒置過久的房間會從記憶體移到磁碟上的壓縮封存檔，
+常駐記憶體的資料量只與仍在進行的房間數有關，長時間運作也不會持續成長。
+
+封存檔每個房間一個（<房間代碼>.room），內容是與日誌相同格式的紀錄
+（房間、主題、留言、投票，見 journal.dump_store），整份以 zstd 壓縮
+（未安裝 zstandard 時改用 zlib）。讀取時以 mmap 對應檔案後直接解壓縮。
+
+房間被存取時（export_pdf、房間狀態、AI 摘要等端點）透過 ensure_loaded
+自動載回記憶體並刪除封存檔，之後由目前的儲存後端接手保存。
+
+多個 worker 共用儲存後端（Redis）時不啟動背景清掃：閒置判斷只看得到本 worker 的
+在線參與者與推播連線，房間可能正在其他 worker 上使用，封存後才寫入的變更也會遺失。
+此時只負責載回既有的封存檔。
+
+以環境變數設定：
+- SYNCAI_ARCHIVE_DIR：封存目錄（預設 data/archive）
+- SYNCAI_ROOM_END_TTL：End 狀態的房間閒置多久後封存（秒，預設 600；0 表示停用）
+- SYNCAI_ROOM_IDLE_TTL：任何房間閒置多久後封存（秒，預設 21600；0 表示停用）
+"""
+
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from typing import List
+
+from .journal import apply_record, dump_store, iter_records
+from .presence import presence_tracker
+from .response_cache import response_cache
+from .room_actor import room_actors
+from .room_events import room_events
+from .room_store import room_store
+
+try:
+    import zstandard
+except ImportError:  # 未安裝時改用 zlib
+    zstandard = None
+
+# 檔頭：<magic 4s><壓縮方式 u8><封存時的房間版本 u64>
+ARCHIVE_HEADER = struct.Struct("<4sBQ")
+ARCHIVE_MAGIC = b"SYAR"
+CODEC_ZLIB = 0
+CODEC_ZSTD = 1
+ARCHIVE_SUFFIX = ".room"
+# 房間代碼只允許英數字、底線與連字號，避免組出目錄外的路徑
+ROOM_CODE_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+SWEEP_INTERVAL = 60  # 秒
+
+
+class RoomLifecycle:
+    """閒置房間的封存與載回"""
+
+    def __init__(self, directory: str, end_ttl: float, idle_ttl: float):
+        self.directory = directory
+        self.end_ttl = end_ttl
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+    @classmethod
+    def from_env(cls) -> "RoomLifecycle":
+        return cls(
+            os.getenv("SYNCAI_ARCHIVE_DIR", "data/archive"),
+            end_ttl=float(os.getenv("SYNCAI_ROOM_END_TTL", "600")),
+            idle_ttl=float(os.getenv("SYNCAI_ROOM_IDLE_TTL", str(6 * 3600))),
+        )
+
+    def start(self):
+        """啟動背景清掃執行緒（每 SWEEP_INTERVAL 秒檢查一次）；共用儲存後端時不啟動"""
+        if room_store.backend.shared:
+            print(f"🗄️ 儲存後端 {room_store.backend.name} 由多個 worker 共用，停用閒置房間封存")
+            return
+        if self._sweeper is None and (self.end_ttl > 0 or self.idle_ttl > 0):
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="room-lifecycle", daemon=True)
+            self._sweeper.start()
+
+    # --- 查詢 ---
+    def _path(self, code: str) -> str:
+        return os.path.join(self.directory, code + ARCHIVE_SUFFIX)
+
+    def is_archived(self, code: str) -> bool:
+        return bool(ROOM_CODE_PATTERN.match(code)) and os.path.exists(self._path(code))
+
+    def archived_codes(self) -> List[str]:
+        """列出所有已封存的房間代碼"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return [name[:-len(ARCHIVE_SUFFIX)] for name in names if name.endswith(ARCHIVE_SUFFIX)]
+
+    def is_expired(self, code: str, now: float) -> bool:
+        """房間沒有在線參與者與推播連線，且閒置超過對應的期限"""
+        room = room_store.get_room(code)
+        if room is None or room.get("participants", 0) > 0 or room_events.subscriber_count(code):
+            return False
+        idle = now - room_store.last_modified(code)
+        if room.get("status") == "End" and self.end_ttl > 0 and idle > self.end_ttl:
+            return True
+        return self.idle_ttl > 0 and idle > self.idle_ttl
+
+    # --- 封存 ---
+    def archive(self, code: str) -> bool:
+        """把房間寫入封存檔後自記憶體與儲存後端移除，找不到房間時回傳 False"""
+        with self._lock:
+            if not room_store.has_room(code) or not ROOM_CODE_PATTERN.match(code):
+                return False
+            header = ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, CODEC_ZSTD if zstandard else CODEC_ZLIB,
+                                         room_store.room_version(code))
+            data = dump_store(room_store, [code])
+            if zstandard is not None:
+                payload = zstandard.ZstdCompressor(level=6).compress(data)
+            else:
+                payload = zlib.compress(data, 6)
+
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(code)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(header)
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+
+            room_store.drop_room(code)
+            room_events.drop_room(code)
+            presence_tracker.drop_room(code)
+            response_cache.drop_room(code)
+            print(f"🗄️ 房間 {code} 已封存（{len(data)} → {len(header) + len(payload)} bytes）")
+            return True
+
+    def ensure_loaded(self, code: str) -> bool:
+        """
+        確保房間在記憶體中；已封存時載回。
+
+        Returns:
+            房間是否存在（在記憶體中或已成功載回）
+        """
+        if room_store.has_room(code):
+            return True
+        if not self.is_archived(code):
+            return False
+        with self._lock:
+            if room_store.has_room(code):
+                return True
+            path = self._path(code)
+            try:
+                with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    magic, codec, version = ARCHIVE_HEADER.unpack_from(mapped, 0)
+                    if magic != ARCHIVE_MAGIC:
+                        raise ValueError("封存檔格式不正確")
+                    payload = memoryview(mapped)[ARCHIVE_HEADER.size:]
+                    try:
+                        if codec == CODEC_ZSTD:
+                            if zstandard is None:
+                                raise ValueError("此封存檔以 zstd 壓縮，需要安裝 zstandard")
+                            data = zstandard.ZstdDecompressor().decompress(payload)
+                        else:
+                            data = zlib.decompress(payload)
+                    finally:
+                        payload.release()
+            except FileNotFoundError:
+                # 其他 worker 剛載回並刪除了封存檔
+                return room_store.has_room(code)
+            except (OSError, ValueError, zlib.error) as e:
+                print(f"❌ 載回封存房間 {code} 失敗: {e}")
+                return False
+
+            for op, args in iter_records(data, os.path.basename(path)):
+                apply_record(room_store, op, args)
+            room_store.restore_version(code, version)
+            os.remove(path)
+            print(f"📤 房間 {code} 已自封存載回")
+            return room_store.has_room(code)
+
+    # --- 背景清掃 ---
+    def sweep(self, now: float) -> List[str]:
+        """封存所有到期的房間，回傳被封存的房間代碼"""
+        archived = []
+        for code in list(room_store.rooms.keys()):
+            try:
+                # 在房間的 actor 中判斷與封存，不會與正在進行的寫入交錯
+                if room_actors.run(code, lambda code=code: self.is_expired(code, now) and self.archive(code)):
+                    archived.append(code)
+            except Exception as e:
+                print(f"❌ 封存房間 {code} 時發生錯誤: {e}")
+        return archived
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(SWEEP_INTERVAL)
+            self.sweep(time.time())
+
+
+# 全局實例
+room_lifecycle = RoomLifecycle.from_env()
@@ -0,0 +1,642 @@
+"""
+討論室狀態儲存模組
+每個討論室擁有自己的主題、留言索引與裝置索引，
+所有端點都透過 room_store 存取資料，查詢成本只與單一房間有關，
+不會因為同時進行的其他房間而變慢。
+"""
+
+import copy
+import time
+from bisect import bisect_right
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+from .records import CommentRecord, intern_text
+from .room_directory import RoomDirectory
+from .score_index import ScoreIndex
+from .search_index import SearchIndex
+from .storage import MemoryBackend, StorageBackend
+from .topic_view import TopicView
+from .vote_ledger import VoteLedger
+
+# 每個房間保留的變更紀錄筆數，游標早於此範圍時改回傳完整快照
+CHANGE_LOG_SIZE = 1000
+
+
+def make_topic_id(room: str, topic_name: str) -> str:
+    """組合全域 topics 字典使用的主題 ID"""
+    return f"{room}_{topic_name}"
+
+
+class RoomState:
+    """單一討論室的主題與索引"""
+
+    def __init__(self, code: str):
+        self.code = code
+        # topic_name -> topic dict（與全域 topics 共用同一物件，保持插入順序）
+        self.topics: Dict[str, Dict[str, Any]] = {}
+        # comment_id -> (topic_name, 在該主題 comments 列表中的位置)
+        self.comment_index: Dict[str, Tuple[str, int]] = {}
+        # device_id -> {comment_id: None}（以 dict 當作有序集合）
+        self.device_index: Dict[str, Dict[str, None]] = {}
+        # 下一則留言的序號（留言依序附加，序號即時間順序，存於 CommentRecord.seq）
+        self.next_seq = 1
+        # topic_name -> 依分數排序的留言索引
+        self.score_index: Dict[str, ScoreIndex] = {}
+        # topic_name -> 已序列化的留言讀取視圖
+        self.views: Dict[str, TopicView] = {}
+        # 全房間留言的全文檢索索引（第一次查詢時建立）
+        self.search = SearchIndex()
+        # 每次變更遞增的版本號，供 ETag / 增量同步判斷是否有更新
+        self.version = 0
+        # 最後一次變更的時間，供生命週期管理判斷閒置
+        self.updated_at = time.time()
+        # (version, changes)，changes 為該版本的 (種類, ...) tuple 列表，見 RoomStore.bump_version
+        self.changes: Deque[Tuple[int, Tuple[Tuple, ...]]] = deque(maxlen=CHANGE_LOG_SIZE)
+
+
+class RoomSnapshot:
+    """
+    房間在某一時刻的唯讀複本（由 RoomStore.snapshot 在房間的 actor 中建立）。
+    提供與 RoomStore 相同的 vote_counts / top_comments，給 PDF 匯出等耗時的讀取
+    在 actor 外使用，期間房間照常寫入也不影響內容。
+    """
+
+    __slots__ = ("room", "topics", "_counts", "_rankings")
+
+    def __init__(self, room: Dict[str, Any], topics: List[Dict[str, Any]],
+                 counts: Dict[str, Tuple[int, int]], rankings: Dict[str, List[CommentRecord]]):
+        self.room = room
+        self.topics = topics
+        self._counts = counts
+        self._rankings = rankings
+
+    def vote_counts(self, comment_id: str) -> Tuple[int, int]:
+        return self._counts.get(comment_id, (0, 0))
+
+    def top_comments(self, code: str, topic_name: str, k: Optional[int] = None) -> List[CommentRecord]:
+        ranking = self._rankings.get(topic_name, [])
+        return ranking if k is None else ranking[:k]
+
+
+class RoomStore:
+    """討論室狀態儲存器"""
+
+    def __init__(self):
+        # 與舊版全域變數相同的結構，供 participants_api 匯出相容名稱
+        self.rooms: Dict[str, Dict[str, Any]] = {}
+        self.topics: Dict[str, Dict[str, Any]] = {}
+        self.votes = VoteLedger()
+        # 依建立時間與狀態排序的房間索引，供房間列表篩選、分頁
+        self.directory = RoomDirectory()
+        self._states: Dict[str, RoomState] = {}
+        # 持久化後端；記憶體中的資料永遠是讀取來源
+        self.backend: StorageBackend = MemoryBackend()
+        # 共用後端把其他 worker 的變更套用到本機後呼叫，參數為房間代碼
+        self._remote_listeners: List[Callable[[str], None]] = []
+        # 共用後端收到其他 worker 的參與者加入紀錄時呼叫，參數為 (房間代碼, 裝置ID, 暱稱, 時間)
+        self._participant_listeners: List[Callable[[str, str, str, float], None]] = []
+        # 多個 worker 共用狀態時由共用後端設定的 worker 代號。版本號與事件 ID 是各 worker
+        # 各自遞增的，對外的 ETag、增量同步游標與 SSE 事件 ID 需帶上代號才不會跨 worker 誤判
+        self.instance_id: Optional[str] = None
+
+    def attach_backend(self, backend: StorageBackend) -> int:
+        """切換儲存後端並載入其中保存的資料，回傳載入的房間數"""
+        # 載入期間不回寫到後端
+        self.backend = MemoryBackend()
+        try:
+            loaded = backend.load(self)
+        finally:
+            self.backend = backend
+        return loaded
+
+    def add_remote_listener(self, callback: Callable[[str], None]):
+        """登記「其他 worker 修改了房間」的通知"""
+        self._remote_listeners.append(callback)
+
+    def notify_remote_change(self, code: str):
+        for callback in self._remote_listeners:
+            try:
+                callback(code)
+            except Exception as e:
+                print(f"⚠️ 處理房間 {code} 的遠端變更通知時發生錯誤: {e}")
+
+    def add_participant_listener(self, callback: Callable[[str, str, str, float], None]):
+        """登記「其他 worker 有參與者加入或改暱稱」的通知"""
+        self._participant_listeners.append(callback)
+
+    def notify_remote_participant(self, code: str, device_id: str, nickname: str, last_seen: float):
+        for callback in self._participant_listeners:
+            try:
+                callback(code, device_id, nickname, last_seen)
+            except Exception as e:
+                print(f"⚠️ 處理房間 {code} 的遠端參與者通知時發生錯誤: {e}")
+
+    def save_participant(self, code: str, device_id: str, nickname: str, last_seen: float):
+        """參與者加入或改暱稱；在線狀態由 presence_tracker 維護，這裡只交給共用後端複製到其他 worker"""
+        self.backend.save_participant(code, device_id, nickname, last_seen)
+
+    # --- 對外的版本號 / 事件 ID ---
+    def tag(self, number: int) -> Union[int, str]:
+        """單一 worker 時原樣回傳；多個 worker 共用狀態時加上本 worker 的代號（"代號.號碼"）"""
+        return f"{self.instance_id}.{number}" if self.instance_id else number
+
+    def untag(self, value: Any) -> Optional[int]:
+        """
+        tag 的反向：取回本機的號碼。
+
+        Returns:
+            號碼；格式不正確或由其他 worker 發出時回傳 None（呼叫端改回傳完整內容）
+        """
+        text = str(value).strip()
+        prefix, dot, number = text.rpartition(".")
+        if dot and prefix != (self.instance_id or ""):
+            return None
+        if not dot and self.instance_id:
+            return None
+        try:
+            return int(number)
+        except ValueError:
+            return None
+
+    def version_tag(self, code: str) -> Union[int, str]:
+        """對外的房間版本（ETag、state / changes 回應的 version）"""
+        return self.tag(self.room_version(code))
+
+    # --- 房間 ---
+    def create_room(self, code: str, room_data: Dict[str, Any]) -> Dict[str, Any]:
+        """登記新的討論室"""
+        self.rooms[code] = room_data
+        self._states[code] = RoomState(code)
+        self._index_room(code, room_data)
+        self.backend.save_room(code, room_data)
+        return room_data
+
+    def replace_room(self, code: str, room_data: Dict[str, Any]):
+        """以保存的內容取代既有房間的房間層級欄位（重播日誌、其他 worker 的變更）"""
+        self.rooms[code] = room_data
+        self._index_room(code, room_data)
+
+    def update_room(self, code: str, fields: Dict[str, Any]):
+        """
+        更新不需推播、也不遞增版本的房間欄位（例如 AI workspace），並寫入儲存後端；
+        其他房間欄位隨推播事件的版本遞增一併保存（見 bump_version）
+        """
+        room = self.rooms.get(code)
+        if room is None:
+            return
+        room.update(fields)
+        self.backend.save_room(code, room)
+
+    def set_status(self, code: str, status: str):
+        """更新房間狀態（Stop、Discussion、End）與狀態索引"""
+        self.rooms[code]["status"] = status
+        self.directory.set_status(code, status)
+
+    def _index_room(self, code: str, room_data: Dict[str, Any]):
+        self.directory.add(code, room_data.get("created_at", 0), room_data.get("status", ""))
+
+    def drop_room(self, code: str) -> bool:
+        """自本機移除整個討論室（主題、留言、投票與索引），找不到時回傳 False"""
+        if code not in self.rooms:
+            return False
+        state = self._states.pop(code, None)
+        if state is not None:
+            for topic_name, topic in state.topics.items():
+                self.topics.pop(make_topic_id(code, topic_name), None)
+                for comment in topic["comments"]:
+                    self.votes.drop_comment(code, comment.id)
+        del self.rooms[code]
+        self.directory.remove(code)
+        self.backend.delete_room(code)
+        return True
+
+    def has_room(self, code: str) -> bool:
+        return code in self.rooms
+
+    def get_room(self, code: str) -> Optional[Dict[str, Any]]:
+        return self.rooms.get(code)
+
+    def bump_version(self, code: str, *changes: Tuple) -> int:
+        """
+        記錄房間有變更，回傳新版本號；一次傳入多筆變更時共用同一個版本。
+
+        Args:
+            changes: 寫入變更紀錄的內容，例如
+                ("added", comment_id)、("removed", comment_id)、("votes", comment_id)、
+                ("nickname", device_id, nickname)、("reset",) 表示需重新取得完整快照、
+                ("state",) 表示只有狀態欄位（狀態、設定等）改變；未指定時為 ("state",)
+        """
+        changes = changes or (("state",),)
+        state = self._state(code)
+        state.version += 1
+        state.updated_at = time.time()
+        state.changes.append((state.version, changes))
+        if any(change[0] in ("state", "reset") for change in changes) and code in self.rooms:
+            # 房間層級欄位（狀態、設定、當前主題等）直接修改 ROOMS，於此一併保存
+            self.backend.save_room(code, self.rooms[code])
+        return state.version
+
+    def changes_since(self, code: str, since: int) -> Optional[List[Tuple]]:
+        """
+        取得版本 since 之後的變更。
+
+        Returns:
+            依序排列的變更列表；游標超出保留範圍時回傳 None
+        """
+        state = self._states.get(code)
+        if state is None or since > state.version:
+            return None
+        if since == state.version:
+            return []
+        if not state.changes or state.changes[0][0] > since + 1:
+            return None
+        return [change for version, changes in state.changes if version > since for change in changes]
+
+    def room_version(self, code: str) -> int:
+        state = self._states.get(code)
+        return state.version if state is not None else 0
+
+    def last_modified(self, code: str) -> float:
+        """房間最後一次變更的時間（time.time()）"""
+        return self._state(code).updated_at
+
+    def restore_version(self, code: str, version: int):
+        """
+        自封存載回後接續原本的版本號，舊的 ETag 與增量同步游標不會誤判為最新；
+        變更紀錄清空，持舊游標的用戶端會改收完整快照。
+        """
+        state = self._state(code)
+        state.version = max(state.version, version) + 1
+        state.changes.clear()
+
+    def _state(self, code: str) -> RoomState:
+        state = self._states.get(code)
+        if state is None:
+            state = self._states[code] = RoomState(code)
+        return state
+
+    # --- 主題 ---
+    def list_topics(self, code: str) -> List[Dict[str, Any]]:
+        """依建立順序回傳房間的所有主題"""
+        return list(self._state(code).topics.values())
+
+    def topic_names(self, code: str) -> List[str]:
+        return list(self._state(code).topics.keys())
+
+    def get_topic(self, code: str, topic_name: str) -> Optional[Dict[str, Any]]:
+        state = self._states.get(code)
+        if state is None:
+            return None
+        return state.topics.get(topic_name)
+
+    def has_topic(self, code: str, topic_name: str) -> bool:
+        return self.get_topic(code, topic_name) is not None
+
+    def ensure_topic(self, code: str, topic_name: str) -> Dict[str, Any]:
+        """取得主題，不存在時建立"""
+        state = self._state(code)
+        topic = state.topics.get(topic_name)
+        if topic is None:
+            topic = {
+                "room_id": code,
+                "topic_name": topic_name,
+                "comments": [],
+            }
+            state.topics[topic_name] = topic
+            state.score_index[topic_name] = ScoreIndex()
+            state.views[topic_name] = TopicView()
+            self.topics[make_topic_id(code, topic_name)] = topic
+            self.backend.save_topic(code, topic_name)
+        return topic
+
+    def delete_topic(self, code: str, topic_name: str) -> List[str]:
+        """刪除主題及其留言與投票，回傳被刪除的留言 ID"""
+        state = self._state(code)
+        topic = state.topics.pop(topic_name, None)
+        if topic is None:
+            return []
+        self.topics.pop(make_topic_id(code, topic_name), None)
+        state.score_index.pop(topic_name, None)
+        state.views.pop(topic_name, None)
+        self.backend.delete_topic(code, topic_name)
+
+        removed_ids = []
+        for comment in topic["comments"]:
+            comment_id = comment.id
+            removed_ids.append(comment_id)
+            state.comment_index.pop(comment_id, None)
+            self._unindex_device(state, comment)
+            state.search.remove(comment)
+            self.votes.drop_comment(code, comment_id)
+        return removed_ids
+
+    def rename_topic(self, code: str, old_name: str, new_name: str) -> Dict[str, Any]:
+        """重新命名主題並更新留言索引（沿用舊行為：改名後的主題移到列表末端）"""
+        state = self._state(code)
+        topic = state.topics.pop(old_name)
+        self.topics.pop(make_topic_id(code, old_name), None)
+
+        topic["topic_name"] = new_name
+        state.topics[new_name] = topic
+        state.score_index[new_name] = state.score_index.pop(old_name)
+        state.views[new_name] = state.views.pop(old_name)
+        self.topics[make_topic_id(code, new_name)] = topic
+
+        for position, comment in enumerate(topic["comments"]):
+            state.comment_index[comment.id] = (new_name, position)
+        self.backend.rename_topic(code, old_name, new_name)
+        return topic
+
+    # --- 留言 ---
+    def add_comment(self, code: str, topic_name: str, comment: CommentRecord,
+                    seq: Optional[int] = None) -> CommentRecord:
+        """
+        新增留言到指定主題並建立索引。
+
+        Args:
+            seq: 自儲存後端載入時沿用保存的序號；未指定或不大於房間內既有的序號時指定下一個序號
+        """
+        state = self._state(code)
+        topic = self.ensure_topic(code, topic_name)
+        view = state.views[topic_name]
+        with view.lock:
+            topic["comments"].append(comment)
+            state.comment_index[comment.id] = (topic_name, len(topic["comments"]) - 1)
+            view.append(comment, self.votes.counts)
+        if seq is None or seq < state.next_seq:
+            seq = state.next_seq
+        comment.seq = seq
+        state.next_seq = seq + 1
+        good, bad = self.votes.counts(comment.id)
+        state.score_index[topic_name].add(comment.id, seq, good - bad)
+        state.search.add(comment)
+        self.backend.save_comment(code, topic_name, seq, comment)
+        if comment.device_id:
+            state.device_index.setdefault(comment.device_id, {})[comment.id] = None
+        return comment
+
+    def has_comment(self, code: str, comment_id: str) -> bool:
+        state = self._states.get(code)
+        return state is not None and comment_id in state.comment_index
+
+    def find_comment(self, code: str, comment_id: str) -> Optional[Tuple[str, CommentRecord]]:
+        """以留言 ID 找出 (主題名稱, 留言)"""
+        state = self._states.get(code)
+        if state is None or comment_id not in state.comment_index:
+            return None
+        topic_name, position = state.comment_index[comment_id]
+        return topic_name, state.topics[topic_name]["comments"][position]
+
+    def delete_comment(self, code: str, comment_id: str) -> Optional[str]:
+        """刪除留言與其投票紀錄，回傳所屬主題名稱；找不到時回傳 None"""
+        state = self._state(code)
+        entry = state.comment_index.pop(comment_id, None)
+        if entry is None:
+            return None
+        topic_name, position = entry
+        comments = state.topics[topic_name]["comments"]
+        view = state.views[topic_name]
+        with view.lock:
+            comment = comments.pop(position)
+            view.pop(position)
+            # 後方留言的位置往前移一格
+            for i in range(position, len(comments)):
+                state.comment_index[comments[i].id] = (topic_name, i)
+        state.score_index[topic_name].remove(comment_id)
+        self._unindex_device(state, comment)
+        state.search.remove(comment)
+        self.votes.drop_comment(code, comment_id)
+        self.backend.delete_comment(code, comment_id)
+        return topic_name
+
+    def delete_comments(self, code: str, comment_ids) -> Dict[str, List[str]]:
+        """
+        批次刪除留言與其投票紀錄；每個受影響的主題只走訪一次並重建位置索引，
+        不會像逐筆 delete_comment 一樣每刪一則就搬移一次後方留言。
+
+        Returns:
+            {主題名稱: [被刪除的留言ID]}；找不到的 ID 略過
+        """
+        state = self._state(code)
+        removed: Dict[str, List[str]] = {}
+        for comment_id in comment_ids:
+            entry = state.comment_index.pop(comment_id, None)
+            if entry is not None:
+                removed.setdefault(entry[0], []).append(comment_id)
+        if not removed:
+            return removed
+
+        deleted_ids = []
+        for topic_name, ids in removed.items():
+            targets = set(ids)
+            comments = state.topics[topic_name]["comments"]
+            view = state.views[topic_name]
+            with view.lock:
+                kept = []
+                keep = []
+                for comment in comments:
+                    if comment.id in targets:
+                        self._unindex_device(state, comment)
+                        state.search.remove(comment)
+                        self.votes.drop_comment(code, comment.id)
+                        keep.append(False)
+                    else:
+                        state.comment_index[comment.id] = (topic_name, len(kept))
+                        kept.append(comment)
+                        keep.append(True)
+                comments[:] = kept
+                view.retain(keep)
+            state.score_index[topic_name].remove_many(ids)
+            deleted_ids.extend(ids)
+        self.backend.delete_comments(code, deleted_ids)
+        return removed
+
+    def comments_by_device(self, code: str, device_id: str) -> List[CommentRecord]:
+        """取得某裝置在房間內的所有留言"""
+        state = self._states.get(code)
+        if state is None:
+            return []
+        result = []
+        for comment_id in state.device_index.get(device_id, ()):
+            found = self.find_comment(code, comment_id)
+            if found:
+                result.append(found[1])
+        return result
+
+    def rename_device_comments(self, code: str, device_id: str, nickname: str) -> int:
+        """更新某裝置所有留言的暱稱，回傳更新筆數"""
+        comments = self.comments_by_device(code, device_id)
+        nickname = intern_text(nickname)
+        search = self._state(code).search
+        for comment in comments:
+            old_nickname, comment.nickname = comment.nickname, nickname
+            search.update(comment, old_nickname)
+            self._refresh_view(code, comment.id)
+        if comments:
+            self.backend.rename_device(code, device_id, nickname)
+        return len(comments)
+
+    def _unindex_device(self, state: RoomState, comment: CommentRecord):
+        device_id = comment.device_id
+        if not device_id:
+            return
+        owned = state.device_index.get(device_id)
+        if owned is not None:
+            owned.pop(comment.id, None)
+            if not owned:
+                del state.device_index[device_id]
+
+    def comment_page(self, code: str, topic_name: str, order: str = "time",
+                     after: Optional[str] = None, limit: int = 50) -> Tuple[List[CommentRecord], Optional[str]]:
+        """
+        分頁取得主題留言。
+
+        Args:
+            order: "time" 依留言先後；"score" 依 (好評 - 差評) 由高到低
+            after: 上一頁回傳的游標
+            limit: 每頁筆數
+
+        Returns:
+            (留言列表, 下一頁游標；沒有下一頁時為 None)
+
+        Raises:
+            ValueError: 排序方式或游標格式不正確
+        """
+        state = self._states.get(code)
+        topic = self.get_topic(code, topic_name)
+        if state is None or topic is None:
+            return [], None
+        comments = topic["comments"]
+
+        if order == "time":
+            # 留言依序附加，直接以序號二分搜尋起點，不需重新排序
+            start = 0
+            if after is not None:
+                start = bisect_right(comments, int(after), key=lambda c: c.seq)
+            page = comments[start:start + limit]
+            has_more = start + limit < len(comments)
+            next_cursor = str(page[-1].seq) if page and has_more else None
+            return page, next_cursor
+
+        if order == "score":
+            after_key = None
+            if after is not None:
+                score, seq = after.split(":")
+                after_key = (-int(score), int(seq))
+            comment_ids, next_key = state.score_index[topic_name].page(after_key, limit)
+            page = [comments[state.comment_index[comment_id][1]] for comment_id in comment_ids]
+            next_cursor = f"{-next_key[0]}:{next_key[1]}" if next_key else None
+            return page, next_cursor
+
+        raise ValueError(f"Unknown order: {order}")
+
+    def top_comments(self, code: str, topic_name: str, k: Optional[int] = None) -> List[CommentRecord]:
+        """
+        依 (好評 - 差評) 由高到低、同分依留言先後取出前 k 則留言；
+        k 為 None 時回傳整個主題的排名。直接讀取分數索引，不需排序。
+        """
+        state = self._states.get(code)
+        topic = self.get_topic(code, topic_name)
+        if state is None or topic is None:
+            return []
+        comments = topic["comments"]
+        return [comments[state.comment_index[comment_id][1]]
+                for comment_id in state.score_index[topic_name].top(k)]
+
+    def snapshot(self, code: str) -> Optional[RoomSnapshot]:
+        """複製房間欄位、主題留言、票數與排名（呼叫端需在房間的 actor 中執行）"""
+        room = self.rooms.get(code)
+        state = self._states.get(code)
+        if room is None or state is None:
+            return None
+        topics = []
+        counts = {}
+        rankings = {}
+        for topic_name, topic in state.topics.items():
+            comments = [copy.copy(comment) for comment in topic["comments"]]
+            for comment in comments:
+                counts[comment.id] = self.votes.counts(comment.id)
+            topics.append({**topic, "comments": comments})
+            by_id = {comment.id: comment for comment in comments}
+            rankings[topic_name] = [by_id[comment_id] for comment_id in state.score_index[topic_name].top(None)]
+        return RoomSnapshot(copy.deepcopy(room), topics, counts, rankings)
+
+    # --- 投票 ---
+    def vote_counts(self, comment_id: str) -> Tuple[int, int]:
+        """回傳留言的 (好評數, 差評數)"""
+        return self.votes.counts(comment_id)
+
+    def cast_vote(self, code: str, comment_id: str, device_id: str, vote_type: str) -> bool:
+        """投票並更新分數索引；已投過相同類型時回傳 False"""
+        found = self.find_comment(code, comment_id)
+        if found is not None:
+            # 帳本改用留言紀錄上的同一個 ID 字串物件，不為每張票各存一份
+            comment_id = found[1].id
+        if not self.votes.cast(code, comment_id, device_id, vote_type):
+            return False
+        self._rescore(code, comment_id)
+        self.backend.save_vote(code, comment_id, device_id, vote_type)
+        return True
+
+    def retract_vote(self, code: str, comment_id: str, device_id: str, vote_type: str) -> bool:
+        """取消投票並更新分數索引；找不到投票時回傳 False"""
+        if not self.votes.retract(code, comment_id, device_id, vote_type):
+            return False
+        self._rescore(code, comment_id)
+        self.backend.delete_vote(code, comment_id, device_id)
+        return True
+
+    def _rescore(self, code: str, comment_id: str):
+        state = self._states.get(code)
+        if state is None or comment_id not in state.comment_index:
+            return
+        topic_name = state.comment_index[comment_id][0]
+        good, bad = self.votes.counts(comment_id)
+        state.score_index[topic_name].update(comment_id, good - bad)
+        self._refresh_view(code, comment_id)
+
+    # --- 讀取視圖 ---
+    def search_comments(self, code: str, query: str,
+                        limit: int = 20) -> Tuple[List[Tuple[str, CommentRecord, float]], int]:
+        """
+        全文檢索房間內所有主題的留言（呼叫端需在房間的 actor 中執行）。
+
+        Returns:
+            ([(主題名稱, 留言, 分數)] 依分數由高到低, 符合的留言總數)
+        """
+        state = self._state(code)
+        if not state.search.built:
+            state.search.build(comment for topic in state.topics.values() for comment in topic["comments"])
+        hits, total = state.search.search(query, limit)
+        results = []
+        for comment_id, score in hits:
+            topic_name, position = state.comment_index[comment_id]
+            results.append((topic_name, state.topics[topic_name]["comments"][position], score))
+        return results, total
+
+    def topic_json(self, code: str, topic_name: str) -> str:
+        """主題所有留言（含票數、依時間順序）的 JSON 陣列，由讀取視圖直接取得"""
+        state = self._states.get(code)
+        topic = self.get_topic(code, topic_name)
+        if state is None or topic is None:
+            return "[]"
+        return state.views[topic_name].render(topic["comments"], self.votes.counts)
+
+    def _refresh_view(self, code: str, comment_id: str):
+        """留言內容或票數改變後重新序列化其片段"""
+        state = self._states[code]
+        entry = state.comment_index.get(comment_id)
+        if entry is None:
+            return
+        view = state.views[entry[0]]
+        with view.lock:
+            entry = state.comment_index.get(comment_id)
+            if entry is None:
+                return
+            topic_name, position = entry
+            view.replace(position, state.topics[topic_name]["comments"][position], self.votes.counts)
+
+
+# 全局實例
+room_store = RoomStore()
@@ -0,0 +1,77 @@
+"""
+留言分數索引模組
+每個主題維護一份依 (分數遞減, 留言序號遞增) 排序的鍵值列表，
+投票時以二分搜尋就地更新，依分數分頁或取前幾名時不必每次重新排序。
+"""
+
+from bisect import bisect_right, insort
+from typing import Dict, List, Optional, Tuple
+
+# (-score, seq)：分數高者在前，同分依留言先後
+ScoreKey = Tuple[int, int]
+
+
+class ScoreIndex:
+    """單一主題的留言分數索引"""
+
+    def __init__(self):
+        self._keys: List[ScoreKey] = []
+        self._comment_of: Dict[int, str] = {}   # seq -> comment_id
+        self._key_of: Dict[str, ScoreKey] = {}  # comment_id -> key
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, comment_id: str, seq: int, score: int = 0):
+        key = (-score, seq)
+        insort(self._keys, key)
+        self._comment_of[seq] = comment_id
+        self._key_of[comment_id] = key
+
+    def remove(self, comment_id: str):
+        key = self._key_of.pop(comment_id, None)
+        if key is None:
+            return
+        self._keys.pop(self._position(key))
+        del self._comment_of[key[1]]
+
+    def remove_many(self, comment_ids):
+        """一次移除多則留言，只重建一次鍵值列表"""
+        removed = set()
+        for comment_id in comment_ids:
+            key = self._key_of.pop(comment_id, None)
+            if key is not None:
+                del self._comment_of[key[1]]
+                removed.add(key)
+        if removed:
+            self._keys = [key for key in self._keys if key not in removed]
+
+    def update(self, comment_id: str, score: int):
+        """更新留言分數並移動到新位置"""
+        key = self._key_of.get(comment_id)
+        if key is None or key[0] == -score:
+            return
+        self._keys.pop(self._position(key))
+        new_key = (-score, key[1])
+        insort(self._keys, new_key)
+        self._key_of[comment_id] = new_key
+
+    def top(self, k: Optional[int] = None) -> List[str]:
+        """分數最高的 k 則留言 ID（k 為 None 時依序回傳全部），不需排序"""
+        keys = self._keys if k is None else self._keys[:k]
+        return [self._comment_of[seq] for _, seq in keys]
+
+    def page(self, after: Optional[ScoreKey], limit: int) -> Tuple[List[str], Optional[ScoreKey]]:
+        """
+        依分數順序取出 after 之後的 limit 筆留言。
+
+        Returns:
+            (留言 ID 列表, 下一頁游標；沒有下一頁時為 None)
+        """
+        start = 0 if after is None else bisect_right(self._keys, after)
+        keys = self._keys[start:start + limit]
+        next_key = keys[-1] if keys and start + limit < len(self._keys) else None
+        return [self._comment_of[seq] for _, seq in keys], next_key
+
+    def _position(self, key: ScoreKey) -> int:
+        return bisect_right(self._keys, key) - 1
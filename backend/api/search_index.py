@@ -0,0 +1,236 @@
+"""
+留言全文檢索模組
+每個房間一份倒排索引（詞 -> {留言ID: 出現次數}），新增、刪除留言與修改暱稱時就地更新，
+查詢只需取出查詢詞的倒排列表取交集並計分，不必逐則掃描留言內容。
+
+斷詞：
+- 中日韓文字：連續字元切成兩字一組（「預算規劃」-> 預算、算規、規劃），另外收錄單字，
+  單字查詢也能命中；查詢兩字以上時只使用兩字詞
+- 其他文字：以非文字字元分隔的單字（不分大小寫）
+內容與暱稱都收錄，查詢暱稱也能找到該參與者的留言。
+
+排序使用 BM25；索引在第一次查詢時才建立，沒有人查詢的房間不額外佔用記憶體。
+"""
+
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .records import CommentRecord
+
+# 平假名、片假名、注音、CJK 擴充 A、CJK 統一漢字、相容漢字、韓文音節
+_CJK = r"\u3040-\u30ff\u3100-\u312f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+TOKEN_PATTERN = re.compile(rf"[{_CJK}]+|[^\W_{_CJK}]+")
+_CJK_RUN = re.compile(rf"[{_CJK}]+")
+
+# BM25 參數
+BM25_K1 = 1.2
+BM25_B = 0.75
+# 平均詞數偏離計算長度正規化時的值超過此比例才全部重算（避免每次新增留言都重算）
+NORM_REFRESH_RATIO = 0.1
+
+
+def normalize(text: str) -> str:
+    """全形轉半形並忽略大小寫"""
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def tokenize(text: str, query: bool = False) -> List[str]:
+    """
+    切出索引詞。
+
+    Args:
+        query: 查詢時中日韓文字只在單一字元時使用單字，其餘使用兩字詞
+    """
+    tokens = []
+    for run in TOKEN_PATTERN.findall(normalize(text)):
+        if not _CJK_RUN.match(run):
+            tokens.append(run)
+            continue
+        if len(run) == 1:
+            tokens.append(run)
+            continue
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        if not query:
+            tokens.extend(run)
+    return tokens
+
+
+def _normalize_with_offsets(text: str) -> Tuple[str, List[int], List[int]]:
+    """
+    以 normalize 轉換 text，並記錄轉換後每個字元來自原文的哪一段。
+
+    NFKC 與 casefold 會改變長度（「ß」-> 「ss」、「㎏」-> 「kg」），因此逐個字元（連同其後的
+    組合字元）轉換，轉換結果的每個字元都對應回原文的 [起, 迄)。
+
+    Returns:
+        (轉換後的文字, 每個字元在原文的起點, 每個字元在原文的迄點)
+    """
+    parts: List[str] = []
+    starts: List[int] = []
+    ends: List[int] = []
+    cluster_start = 0
+    for i in range(1, len(text) + 1):
+        if i < len(text) and unicodedata.combining(text[i]):
+            continue
+        converted = normalize(text[cluster_start:i])
+        parts.append(converted)
+        starts.extend([cluster_start] * len(converted))
+        ends.extend([i] * len(converted))
+        cluster_start = i
+    return "".join(parts), starts, ends
+
+
+def highlight_spans(text: str, terms: Iterable[str]) -> List[Tuple[int, int]]:
+    """
+    找出 text 中所有查詢詞出現的位置，合併重疊的區間，回傳原文中的 [(起, 迄)]。
+
+    比對在與斷詞相同的正規化文字上進行；非中日韓的詞需是完整的單字（「art」不會命中「start」）。
+    """
+    terms = sorted({normalize(term) for term in terms} - {""}, key=len, reverse=True)
+    if not terms or not text:
+        return []
+    normalized, starts, ends = _normalize_with_offsets(text)
+    pattern = re.compile("|".join(
+        re.escape(term) if _CJK_RUN.match(term) else rf"(?<![^\W_{_CJK}]){re.escape(term)}(?![^\W_{_CJK}])"
+        for term in terms
+    ))
+    spans: List[Tuple[int, int]] = []
+    # 以重疊方式逐字比對，兩字詞「預算」「算規」相鄰時合併成一段
+    position = 0
+    while True:
+        match = pattern.search(normalized, position)
+        if match is None:
+            break
+        start, end = starts[match.start()], ends[match.end() - 1]
+        if spans and start <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+        else:
+            spans.append((start, end))
+        position = match.start() + 1
+    return spans
+
+
+class SearchIndex:
+    """單一房間的留言倒排索引（呼叫端需在房間的 actor 中使用）"""
+
+    __slots__ = ("built", "_postings", "_lengths", "_total_length", "_norms", "_norm_average")
+
+    def __init__(self):
+        self.built = False
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}  # comment_id -> 詞數
+        self._total_length = 0
+        # comment_id -> BM25 長度正規化項 k1 * (1 - b + b * 詞數 / 平均詞數)，查詢時直接取用
+        self._norms: Dict[str, float] = {}
+        self._norm_average = 1.0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def build(self, comments: Iterable[CommentRecord]):
+        for comment in comments:
+            self._add(comment)
+        self.built = True
+
+    # --- 更新（尚未建立時略過，建立時會一次收錄） ---
+    def add(self, comment: CommentRecord):
+        if self.built:
+            self._add(comment)
+
+    def remove(self, comment: CommentRecord):
+        if self.built:
+            self._remove(comment)
+
+    def update(self, comment: CommentRecord, old_nickname: str):
+        """暱稱變更後重新收錄"""
+        if self.built:
+            self._remove(comment, old_nickname)
+            self._add(comment)
+
+    def _tokens(self, comment: CommentRecord, nickname: Optional[str] = None) -> Counter:
+        return Counter(tokenize(comment.content) + tokenize(comment.nickname if nickname is None else nickname))
+
+    def _add(self, comment: CommentRecord):
+        if comment.id in self._lengths:
+            return
+        counts = self._tokens(comment)
+        for token, count in counts.items():
+            self._postings.setdefault(token, {})[comment.id] = count
+        length = sum(counts.values())
+        self._lengths[comment.id] = length
+        self._total_length += length
+        self._norms[comment.id] = self._norm(length)
+
+    def _remove(self, comment: CommentRecord, nickname: Optional[str] = None):
+        length = self._lengths.pop(comment.id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        del self._norms[comment.id]
+        for token in self._tokens(comment, nickname):
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(comment.id, None)
+            if not posting:
+                del self._postings[token]
+
+    def _norm(self, length: int) -> float:
+        return BM25_K1 * (1 - BM25_B + BM25_B * length / self._norm_average)
+
+    def _refresh_norms(self):
+        average = self._total_length / len(self._lengths) if self._lengths else 1.0
+        if abs(average - self._norm_average) <= self._norm_average * NORM_REFRESH_RATIO:
+            return
+        self._norm_average = average or 1.0
+        self._norms = {comment_id: self._norm(length) for comment_id, length in self._lengths.items()}
+
+    # --- 查詢 ---
+    def search(self, query: str, limit: int = 20) -> Tuple[List[Tuple[str, float]], int]:
+        """
+        查詢包含所有查詢詞的留言。
+
+        Returns:
+            ([(留言ID, 分數)] 依分數由高到低, 符合的留言總數)
+        """
+        tokens = list(dict.fromkeys(tokenize(query, query=True)))
+        if not tokens:
+            return [], 0
+        postings = []
+        for token in tokens:
+            posting = self._postings.get(token)
+            if not posting:
+                return [], 0
+            postings.append(posting)
+        postings.sort(key=len)
+        self._refresh_norms()
+
+        total_docs = len(self._lengths)
+        norms = self._norms
+        k1_plus_1 = BM25_K1 + 1
+        first, rest = postings[0], postings[1:]
+        weight = math.log(1 + (total_docs - len(first) + 0.5) / (len(first) + 0.5)) * k1_plus_1
+        if not rest:
+            scored = [(weight * tf / (tf + norms[comment_id]), comment_id) for comment_id, tf in first.items()]
+        else:
+            # 先取交集，只為同時包含所有查詢詞的留言計分
+            weights = [math.log(1 + (total_docs - len(posting) + 0.5) / (len(posting) + 0.5)) * k1_plus_1
+                       for posting in rest]
+            matched = first.keys() & rest[0].keys()
+            for posting in rest[1:]:
+                matched &= posting.keys()
+            scored = []
+            for comment_id in matched:
+                tf = first[comment_id]
+                norm = norms[comment_id]
+                score = weight * tf / (tf + norm)
+                for posting, posting_weight in zip(rest, weights):
+                    other_tf = posting[comment_id]
+                    score += posting_weight * other_tf / (other_tf + norm)
+                scored.append((score, comment_id))
+        top = heapq.nlargest(limit, scored)
+        return [(comment_id, score) for score, comment_id in top], len(scored)
@@ -0,0 +1,103 @@
+"""
+討論室分片模組
+分片模式下每個討論室只由一個後端行程（shard）負責，房間常駐在該行程的記憶體中，
+輪詢與推播都不需要存取共用儲存。
+
+房間歸屬以一致性雜湊決定：每個 shard 在雜湊環上放置多個虛擬節點，
+房間代碼落在環上順時針遇到的第一個節點即為擁有者。shard 加入或離開時
+只有約 1/N 的房間需要搬移（見 backend/dispatcher.py 的重新平衡）。
+
+以環境變數啟用：
+- SYNCAI_SHARDS：所有 shard 的位址，以逗號分隔（例如 http://backend-0:8000,http://backend-1:8000）
+- SYNCAI_SHARD_ID：本行程在 SYNCAI_SHARDS 中的位址
+- SYNCAI_SHARD_SECRET：分派器與各 shard 共用的密鑰；分派器呼叫 /internal/shard 端點時
+  以 X-SyncAI-Shard-Secret 標頭帶上，未設定時 shard 拒絕所有內部請求
+"""
+
+import hashlib
+import hmac
+import os
+import random
+import string
+from bisect import bisect_right
+from typing import Container, List, Optional
+
+ROOM_CODE_CHARS = string.ascii_uppercase + string.digits
+ROOM_CODE_LENGTH = 6
+VIRTUAL_NODES = 128
+SHARD_SECRET_HEADER = "X-SyncAI-Shard-Secret"
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """一致性雜湊環"""
+
+    def __init__(self, shards: List[str], virtual_nodes: int = VIRTUAL_NODES):
+        self.shards = list(dict.fromkeys(shards))
+        self.virtual_nodes = virtual_nodes
+        points = sorted(
+            (_hash(f"{shard}#{i}"), shard)
+            for shard in self.shards
+            for i in range(virtual_nodes)
+        )
+        self._keys = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def owner(self, room_code: str) -> Optional[str]:
+        """回傳負責該房間的 shard；環為空時回傳 None"""
+        if not self._keys:
+            return None
+        index = bisect_right(self._keys, _hash(room_code)) % len(self._keys)
+        return self._owners[index]
+
+
+class ShardConfig:
+    """本行程的分片設定"""
+
+    def __init__(self, shard_id: Optional[str] = None, shards: Optional[List[str]] = None,
+                 secret: Optional[str] = None):
+        self.shard_id = shard_id
+        self.ring = HashRing(shards or [])
+        self.secret = secret
+
+    @classmethod
+    def from_env(cls) -> "ShardConfig":
+        shards = [s.strip() for s in os.getenv("SYNCAI_SHARDS", "").split(",") if s.strip()]
+        return cls(os.getenv("SYNCAI_SHARD_ID") or None, shards, os.getenv("SYNCAI_SHARD_SECRET") or None)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.shard_id) and len(self.ring) > 0
+
+    def authorized(self, secret: Optional[str]) -> bool:
+        """內部端點的請求是否帶著正確的共用密鑰；未設定密鑰時一律拒絕"""
+        if not self.secret or not secret:
+            return False
+        return hmac.compare_digest(secret.encode("utf-8"), self.secret.encode("utf-8"))
+
+    def set_shards(self, shards: List[str]):
+        """套用新的 shard 列表（由分派器在重新平衡時通知）"""
+        self.ring = HashRing(shards)
+
+    def owns(self, room_code: str) -> bool:
+        """未啟用分片時所有房間都屬於本行程"""
+        if not self.enabled:
+            return True
+        return self.ring.owner(room_code) == self.shard_id
+
+    def new_room_code(self, taken: Container[str]) -> str:
+        """產生未被使用、且由本 shard 負責的房間代碼（平均嘗試 N 次）"""
+        while True:
+            code = ''.join(random.choices(ROOM_CODE_CHARS, k=ROOM_CODE_LENGTH))
+            if code not in taken and self.owns(code):
+                return code
+
+
+# 全局實例
+shard_config = ShardConfig.from_env()
@@ -0,0 +1,86 @@
+# backend/api/sharding_api.py
+"""
+分片內部 API
+供 backend/dispatcher.py 在 shard 加入或離開時搬移討論室；
+只在啟用分片時掛載（見 main.py），每個請求都需帶上 SYNCAI_SHARD_SECRET 共用密鑰。
+路徑不在 /api/ 之下，不會經由 nginx 對外公開，分派器也不轉送這些路徑。
+
+匯出、匯入與移除房間都在房間的 actor 中執行，與端點的讀寫互不交錯。
+"""
+
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from typing import Dict, List, Optional, Tuple
+
+from .journal import apply_record, iter_records, room_dump
+from .presence import presence_tracker
+from .response_cache import response_cache
+from .room_actor import room_actors
+from .room_events import room_events
+from .room_lifecycle import room_lifecycle
+from .room_store import room_store
+from .sharding import SHARD_SECRET_HEADER, shard_config
+
+
+def require_shard_secret(secret: Optional[str] = Header(None, alias=SHARD_SECRET_HEADER)):
+    """拒絕沒有帶正確共用密鑰的內部請求"""
+    if not shard_config.authorized(secret):
+        raise HTTPException(status_code=403, detail="Invalid shard secret")
+
+
+router = APIRouter(tags=["Sharding"], dependencies=[Depends(require_shard_secret)])
+
+@router.get("/internal/shard")
+def get_shard_info():
+    """回傳本 shard 的設定與負責的房間（包含已封存的房間）"""
+    return {
+        "shard_id": shard_config.shard_id,
+        "shards": shard_config.ring.shards,
+        "rooms": list(room_store.rooms.keys()) + room_lifecycle.archived_codes(),
+    }
+
+@router.put("/internal/shard/ring")
+def set_shard_ring(shards: List[str] = Body(..., embed=True)):
+    """更新 shard 列表，之後建立的房間依新的雜湊環產生代碼"""
+    shard_config.set_shards(shards)
+    return {"shards": shard_config.ring.shards}
+
+@router.get("/internal/shard/rooms/{code}/export")
+def export_shard_room(code: str):
+    """以日誌紀錄格式匯出單一房間的完整狀態"""
+    if not room_lifecycle.ensure_loaded(code):
+        raise HTTPException(status_code=404, detail="Room not found")
+    data = room_actors.run(code, lambda: room_dump(room_store, code))
+    return Response(data, media_type="application/octet-stream")
+
+def _import_records(data: bytes) -> List[str]:
+    """依房間分組後在各房間的 actor 中套用紀錄"""
+    rooms: Dict[str, List[Tuple[int, list]]] = {}
+    for op, args in iter_records(data, "shard import"):
+        rooms.setdefault(args[0], []).append((op, args))
+
+    def apply_room(records: List[Tuple[int, list]]):
+        for op, args in records:
+            apply_record(room_store, op, args)
+
+    for code, records in rooms.items():
+        room_actors.run(code, lambda records=records: apply_room(records))
+        room_store.notify_remote_change(code)
+    return list(rooms)
+
+@router.post("/internal/shard/rooms/import")
+async def import_shard_rooms(request: Request):
+    """匯入其他 shard 匯出的房間紀錄"""
+    data = await request.body()
+    return {"rooms": await run_in_threadpool(_import_records, data)}
+
+@router.delete("/internal/shard/rooms/{code}")
+def drop_shard_room(code: str):
+    """房間已搬到其他 shard 後自本機移除"""
+    if not room_actors.run(code, lambda: room_store.drop_room(code)):
+        raise HTTPException(status_code=404, detail="Room not found")
+    room_events.drop_room(code)
+    presence_tracker.drop_room(code)
+    response_cache.drop_room(code)
+    return {"success": True}
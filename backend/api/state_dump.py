@@ -0,0 +1,86 @@
+"""
+討論室狀態串流匯出模組（診斷用）
+逐筆輸出房間、主題、留言與投票紀錄，取代一次組出整份 ROOMS / topics / votes 字典的作法：
+一次只序列化一個房間，記憶體用量與最大的單一房間有關，而非整個實例。
+
+每個房間的紀錄在該房間的 actor 中取得，同一房間的紀錄彼此一致；
+不同房間之間不需同時凍結，匯出期間其他房間照常寫入。
+
+格式：
+- ndjson：每行一個 JSON 物件
+- msgpack：連續的 msgpack 物件（需安裝 msgpack）
+
+紀錄（kind 欄位區分）：
+- {"kind": "room", "room": 代碼, "data": {房間欄位}}
+- {"kind": "topic", "room": 代碼, "topic": 主題名稱, "comment_count": int}
+- {"kind": "comment", "room": 代碼, "topic": 主題名稱, "comment": {留言欄位}, "vote_good": int, "vote_bad": int}
+- {"kind": "vote", "room": 代碼, "comment_id": str, "device_id": str, "vote_type": str}
+"""
+
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from .response_cache import dumps
+from .room_actor import room_actors
+from .room_store import RoomStore
+
+try:
+    import msgpack
+except ImportError:  # 未安裝時只提供 NDJSON
+    msgpack = None
+
+DUMP_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "msgpack": "application/x-msgpack"}
+
+
+def dump_formats() -> List[str]:
+    return [name for name in DUMP_MEDIA_TYPES if name != "msgpack" or msgpack is not None]
+
+
+def _encoder(format: str) -> Callable[[Dict[str, Any]], bytes]:
+    if format == "msgpack":
+        return msgpack.packb
+    return lambda record: dumps(record) + b"\n"
+
+
+def room_records(store: RoomStore, code: str, since: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    單一房間的所有紀錄（呼叫端需在房間的 actor 中執行，取得一致的內容）。
+
+    Args:
+        since: 只輸出此時間（Unix 秒）之後的留言與其投票；房間與主題紀錄一律輸出
+    """
+    room = store.get_room(code)
+    if room is None:
+        return []
+    records = [{"kind": "room", "room": code, "data": room}]
+    for topic in store.list_topics(code):
+        topic_name = topic["topic_name"]
+        comments = topic["comments"]
+        records.append({"kind": "topic", "room": code, "topic": topic_name, "comment_count": len(comments)})
+        for comment in comments:
+            if since is not None and comment.ts <= since:
+                continue
+            vote_good, vote_bad = store.vote_counts(comment.id)
+            records.append({"kind": "comment", "room": code, "topic": topic_name, "comment": comment.to_dict(),
+                            "vote_good": vote_good, "vote_bad": vote_bad})
+            for device_id, vote_type in store.votes.voters(comment.id):
+                records.append({"kind": "vote", "room": code, "comment_id": comment.id,
+                                "device_id": device_id, "vote_type": vote_type})
+    return records
+
+
+def stream_rooms(store: RoomStore, codes: Iterable[str], format: str = "ndjson",
+                 since: Optional[float] = None) -> Iterator[bytes]:
+    """
+    依序產生每個房間已編碼的紀錄（一個房間一段）。
+    為同步產生器：交給 StreamingResponse 時在 threadpool 中迭代，不佔用事件迴圈。
+    """
+    encode = _encoder(format)
+
+    def encode_room(code: str) -> bytes:
+        # 在 actor 中一併編碼，房間欄位 dict 不會在序列化途中被修改
+        return b"".join(encode(record) for record in room_records(store, code, since))
+
+    for code in codes:
+        chunk = room_actors.run(code, lambda code=code: encode_room(code))
+        if chunk:
+            yield chunk
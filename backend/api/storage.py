@@ -0,0 +1,408 @@
+"""
+討論室持久化儲存模組
+room_store 在記憶體中保留完整狀態作為讀取快取，變更同時交給儲存後端：
+- MemoryBackend：預設，只存在記憶體（與過去行為相同）
+- SQLiteBackend：寫入 WAL 模式的 SQLite，由背景執行緒批次提交，
+  請求執行緒只把語句放進佇列，輪詢讀取完全不經過資料庫
+- JournalBackend（journal.py）：附加式二進位日誌 + 定期快照
+- RedisBackend（redis_backend.py）：多個 worker 行程共用並互相同步
+
+以環境變數 SYNCAI_STORAGE=memory|sqlite|journal|redis、SYNCAI_SQLITE_PATH、
+SYNCAI_JOURNAL_DIR、SYNCAI_REDIS_URL、SYNCAI_REDIS_PREFIX 選擇後端。
+未指定 SYNCAI_STORAGE 時，WEB_CONCURRENCY 大於 1 才使用 redis；單一 worker 在
+設定了 SYNCAI_SQLITE_PATH 時使用 sqlite，否則使用 memory。
+"""
+
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .records import CommentRecord
+
+logger = logging.getLogger(__name__)
+
+# SQLite 暫時無法寫入（資料庫被鎖定、磁碟已滿）時，保留整批並以指數退避重試
+COMMIT_RETRY_DELAY = 0.05  # 秒
+COMMIT_RETRY_MAX_DELAY = 5.0
+# 關閉時仍寫不進去的批次最多再重試幾次，避免關閉流程無限等待
+CLOSE_COMMIT_RETRIES = 3
+
+
+class StorageBackend:
+    """儲存後端介面；預設實作不做任何事"""
+
+    name = "base"
+    # 是否由多個 worker 行程共用同一份房間狀態（各 worker 只看得到自己的連線與在線狀態）
+    shared = False
+    # 最近一次寫入是否成功；背景寫入失敗時設為 False 並記錄錯誤，恢復後改回 True
+    healthy = True
+    last_error: Optional[str] = None
+
+    def load(self, store) -> int:
+        """把已保存的資料載入 store，回傳載入的房間數"""
+        return 0
+
+    def save_room(self, code: str, room: Dict[str, Any]):
+        pass
+
+    def delete_room(self, code: str):
+        pass
+
+    def save_topic(self, code: str, topic_name: str):
+        pass
+
+    def delete_topic(self, code: str, topic_name: str):
+        pass
+
+    def rename_topic(self, code: str, old_name: str, new_name: str):
+        pass
+
+    def save_comment(self, code: str, topic_name: str, seq: int, comment: CommentRecord):
+        pass
+
+    def delete_comment(self, code: str, comment_id: str):
+        pass
+
+    def delete_comments(self, code: str, comment_ids: List[str]):
+        """批次刪除留言；預設逐筆呼叫 delete_comment"""
+        for comment_id in comment_ids:
+            self.delete_comment(code, comment_id)
+
+    def rename_device(self, code: str, device_id: str, nickname: str):
+        pass
+
+    def save_vote(self, code: str, comment_id: str, device_id: str, vote_type: str):
+        pass
+
+    def delete_vote(self, code: str, comment_id: str, device_id: str):
+        pass
+
+    def save_participant(self, code: str, device_id: str, nickname: str, last_seen: float):
+        """參與者加入或改暱稱；只有多個 worker 共用狀態的後端需要複製，不持久化"""
+        pass
+
+    def flush(self):
+        """等待所有已排入的寫入完成"""
+        pass
+
+    def close(self):
+        pass
+
+
+class MemoryBackend(StorageBackend):
+    """只保存在記憶體的後端"""
+
+    name = "memory"
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rooms (
+    code        TEXT PRIMARY KEY,
+    data        TEXT NOT NULL,
+    created_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS topics (
+    ord         INTEGER PRIMARY KEY AUTOINCREMENT,
+    room        TEXT NOT NULL,
+    name        TEXT NOT NULL,
+    UNIQUE (room, name)
+);
+CREATE TABLE IF NOT EXISTS comments (
+    id            TEXT PRIMARY KEY,
+    room          TEXT NOT NULL,
+    topic         TEXT NOT NULL,
+    seq           INTEGER NOT NULL,
+    device_id     TEXT,
+    nickname      TEXT NOT NULL,
+    content       TEXT NOT NULL,
+    ts            REAL NOT NULL,
+    is_ai_summary INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_comments_room_topic ON comments (room, topic, seq);
+CREATE INDEX IF NOT EXISTS idx_comments_room_device ON comments (room, device_id);
+CREATE TABLE IF NOT EXISTS votes (
+    comment_id  TEXT NOT NULL,
+    device_id   TEXT NOT NULL,
+    room        TEXT NOT NULL,
+    vote_type   TEXT NOT NULL,
+    PRIMARY KEY (comment_id, device_id)
+);
+CREATE INDEX IF NOT EXISTS idx_votes_room_device ON votes (room, device_id);
+"""
+
+# 固定的 SQL 字串：sqlite3 會在連線上快取其預備語句，重複執行時不需重新編譯
+SQL_UPSERT_ROOM = "INSERT INTO rooms (code, data, created_at) VALUES (?, ?, ?) ON CONFLICT(code) DO UPDATE SET data = excluded.data"
+SQL_DELETE_ROOM = "DELETE FROM rooms WHERE code = ?"
+SQL_DELETE_ROOM_TOPICS = "DELETE FROM topics WHERE room = ?"
+SQL_DELETE_ROOM_COMMENTS = "DELETE FROM comments WHERE room = ?"
+SQL_DELETE_ROOM_VOTES = "DELETE FROM votes WHERE room = ?"
+SQL_INSERT_TOPIC = "INSERT OR IGNORE INTO topics (room, name) VALUES (?, ?)"
+SQL_DELETE_TOPIC = "DELETE FROM topics WHERE room = ? AND name = ?"
+SQL_DELETE_TOPIC_VOTES = "DELETE FROM votes WHERE comment_id IN (SELECT id FROM comments WHERE room = ? AND topic = ?)"
+SQL_DELETE_TOPIC_COMMENTS = "DELETE FROM comments WHERE room = ? AND topic = ?"
+SQL_RENAME_TOPIC_COMMENTS = "UPDATE comments SET topic = ? WHERE room = ? AND topic = ?"
+SQL_INSERT_COMMENT = ("INSERT OR REPLACE INTO comments (id, room, topic, seq, device_id, nickname, content, ts, is_ai_summary) "
+                      "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+SQL_UPDATE_COMMENT_SEQ = "UPDATE comments SET seq = ? WHERE id = ?"
+SQL_DELETE_COMMENT_VOTES = "DELETE FROM votes WHERE comment_id = ?"
+SQL_DELETE_COMMENT = "DELETE FROM comments WHERE id = ?"
+SQL_RENAME_DEVICE = "UPDATE comments SET nickname = ? WHERE room = ? AND device_id = ?"
+SQL_UPSERT_VOTE = ("INSERT INTO votes (comment_id, device_id, room, vote_type) VALUES (?, ?, ?, ?) "
+                   "ON CONFLICT(comment_id, device_id) DO UPDATE SET vote_type = excluded.vote_type")
+SQL_DELETE_VOTE = "DELETE FROM votes WHERE comment_id = ? AND device_id = ?"
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    SQLite (WAL) 後端
+
+    請求執行緒只把 (SQL, 參數) 放入佇列；背景寫入執行緒一次取出多筆，
+    在同一個交易中執行後提交（group commit），連續相同的語句合併為 executemany。
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, batch_size: int = 512, flush_interval: float = 0.02):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._queue: "queue.Queue[Optional[Tuple[str, tuple]]]" = queue.Queue()
+        self._closing = threading.Event()
+        # 因語句本身有誤而略過的寫入筆數（重試也不會成功的寫入）
+        self.dropped_writes = 0
+        self._conn = self._connect()
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._writer = threading.Thread(target=self._write_loop, name="sqlite-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=64)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # --- 載入 ---
+    def load(self, store) -> int:
+        conn = self._conn
+        rooms = conn.execute("SELECT code, data FROM rooms ORDER BY created_at").fetchall()
+        for code, data in rooms:
+            store.create_room(code, json.loads(data))
+        for room, name in conn.execute("SELECT room, name FROM topics ORDER BY ord"):
+            if store.has_room(room):
+                store.ensure_topic(room, name)
+        comment_rows = conn.execute(
+            "SELECT id, room, topic, seq, device_id, nickname, content, ts, is_ai_summary FROM comments "
+            "ORDER BY room, seq, rowid"
+        )
+        # 沿用保存的序號，之後新增的留言接在最大序號之後，重新啟動後的順序與 seq 欄位一致
+        last_seq: Dict[str, int] = {}
+        for comment_id, room, topic, seq, device_id, nickname, content, ts, is_ai_summary in comment_rows:
+            if not store.has_room(room):
+                continue
+            comment = CommentRecord(comment_id, nickname, content, ts, bool(is_ai_summary), device_id)
+            if seq > last_seq.get(room, 0):
+                store.add_comment(room, topic, comment, seq)
+            else:
+                # 舊版載入時重新編號留下的重複序號：改用下一個序號並寫回
+                store.add_comment(room, topic, comment)
+                self._enqueue(SQL_UPDATE_COMMENT_SEQ, (comment.seq, comment_id))
+            last_seq[room] = comment.seq
+        for comment_id, device_id, room, vote_type in conn.execute("SELECT comment_id, device_id, room, vote_type FROM votes"):
+            if store.has_comment(room, comment_id):
+                store.cast_vote(room, comment_id, device_id, vote_type)
+        return len(rooms)
+
+    # --- 寫入（排入佇列） ---
+    def _enqueue(self, sql: str, params: tuple):
+        self._queue.put((sql, params))
+
+    def save_room(self, code: str, room: Dict[str, Any]):
+        self._enqueue(SQL_UPSERT_ROOM, (code, json.dumps(room, ensure_ascii=False), room.get("created_at", time.time())))
+
+    def delete_room(self, code: str):
+        self._enqueue(SQL_DELETE_ROOM_VOTES, (code,))
+        self._enqueue(SQL_DELETE_ROOM_COMMENTS, (code,))
+        self._enqueue(SQL_DELETE_ROOM_TOPICS, (code,))
+        self._enqueue(SQL_DELETE_ROOM, (code,))
+
+    def save_topic(self, code: str, topic_name: str):
+        self._enqueue(SQL_INSERT_TOPIC, (code, topic_name))
+
+    def delete_topic(self, code: str, topic_name: str):
+        self._enqueue(SQL_DELETE_TOPIC_VOTES, (code, topic_name))
+        self._enqueue(SQL_DELETE_TOPIC_COMMENTS, (code, topic_name))
+        self._enqueue(SQL_DELETE_TOPIC, (code, topic_name))
+
+    def rename_topic(self, code: str, old_name: str, new_name: str):
+        # 刪除後重新插入，讓主題移到列表末端（與記憶體中的行為一致）
+        self._enqueue(SQL_DELETE_TOPIC, (code, old_name))
+        self._enqueue(SQL_INSERT_TOPIC, (code, new_name))
+        self._enqueue(SQL_RENAME_TOPIC_COMMENTS, (new_name, code, old_name))
+
+    def save_comment(self, code: str, topic_name: str, seq: int, comment: CommentRecord):
+        self._enqueue(SQL_INSERT_COMMENT, (
+            comment.id, code, topic_name, seq, comment.device_id,
+            comment.nickname, comment.content, comment.ts,
+            1 if comment.is_ai_summary else 0,
+        ))
+
+    def delete_comment(self, code: str, comment_id: str):
+        self._enqueue(SQL_DELETE_COMMENT_VOTES, (comment_id,))
+        self._enqueue(SQL_DELETE_COMMENT, (comment_id,))
+
+    def delete_comments(self, code: str, comment_ids: List[str]):
+        # 相同語句連續排入，提交時合併成兩次 executemany
+        for comment_id in comment_ids:
+            self._enqueue(SQL_DELETE_COMMENT_VOTES, (comment_id,))
+        for comment_id in comment_ids:
+            self._enqueue(SQL_DELETE_COMMENT, (comment_id,))
+
+    def rename_device(self, code: str, device_id: str, nickname: str):
+        self._enqueue(SQL_RENAME_DEVICE, (nickname, code, device_id))
+
+    def save_vote(self, code: str, comment_id: str, device_id: str, vote_type: str):
+        self._enqueue(SQL_UPSERT_VOTE, (comment_id, device_id, code, vote_type))
+
+    def delete_vote(self, code: str, comment_id: str, device_id: str):
+        self._enqueue(SQL_DELETE_VOTE, (comment_id, device_id))
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        # 結束標記排在所有寫入之後，寫入執行緒處理完佇列才結束
+        self._closing.set()
+        self._queue.put(None)
+        self._writer.join()
+        self._conn.close()
+
+    # --- 背景寫入 ---
+    def _write_loop(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                self._queue.task_done()
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+            self._commit(batch)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _commit(self, batch: List[Tuple[str, tuple]]):
+        """
+        在同一個交易中提交整批寫入。
+        資料庫被鎖定、磁碟已滿等暫時性錯誤（OperationalError）時保留整批，退避後重試；
+        其他錯誤（語句違反限制等）重試也不會成功，改為逐筆提交，只略過失敗的語句。
+        """
+        delay = COMMIT_RETRY_DELAY
+        failures = 0
+        while True:
+            try:
+                self._execute(batch)
+            except sqlite3.OperationalError as e:
+                failures += 1
+                self._set_error(e)
+                if failures == 1 or failures % 20 == 0:
+                    logger.error("SQLite 批次寫入失敗（%d 筆，第 %d 次），%.2f 秒後重試: %s", len(batch), failures, delay, e)
+                if self._closing.is_set() and failures > CLOSE_COMMIT_RETRIES:
+                    logger.critical("關閉時 SQLite 仍無法寫入，放棄 %d 筆寫入: %s", len(batch), e)
+                    self.dropped_writes += len(batch)
+                    return
+                time.sleep(delay)
+                delay = min(delay * 2, COMMIT_RETRY_MAX_DELAY)
+                continue
+            except sqlite3.Error as e:
+                logger.error("SQLite 批次寫入失敗（%d 筆），改為逐筆寫入: %s", len(batch), e)
+                self._commit_each(batch)
+                return
+            if failures:
+                logger.warning("SQLite 寫入已恢復（重試 %d 次）", failures)
+            self.healthy, self.last_error = True, None
+            return
+
+    def _commit_each(self, batch: List[Tuple[str, tuple]]):
+        failed = False
+        for position, item in enumerate(batch):
+            try:
+                self._execute([item])
+            except sqlite3.OperationalError:
+                # 逐筆途中又遇到暫時性錯誤：剩下的語句交回一般的重試流程
+                self._commit(batch[position:])
+                return
+            except sqlite3.Error as e:
+                failed = True
+                self.dropped_writes += 1
+                self._set_error(e)
+                logger.error("略過無法寫入的語句 %s %r: %s", item[0], item[1], e)
+        if not failed:
+            self.healthy, self.last_error = True, None
+
+    def _set_error(self, error: Exception):
+        self.healthy, self.last_error = False, str(error)
+
+    def _execute(self, batch: List[Tuple[str, tuple]]):
+        with self._conn:
+            # 連續相同的語句合併為一次 executemany
+            i = 0
+            while i < len(batch):
+                sql = batch[i][0]
+                j = i
+                while j < len(batch) and batch[j][0] == sql:
+                    j += 1
+                if j - i == 1:
+                    self._conn.execute(sql, batch[i][1])
+                else:
+                    self._conn.executemany(sql, [params for _, params in batch[i:j]])
+                i = j
+
+
+def default_storage_kind() -> str:
+    """未指定 SYNCAI_STORAGE 時的後端：多個 worker 才需要 Redis 共用狀態"""
+    try:
+        workers = int(os.getenv("WEB_CONCURRENCY") or 1)
+    except ValueError:
+        workers = 1
+    if workers > 1:
+        return "redis"
+    return "sqlite" if os.getenv("SYNCAI_SQLITE_PATH") else "memory"
+
+
+def create_backend_from_env() -> StorageBackend:
+    """依環境變數建立儲存後端"""
+    kind = (os.getenv("SYNCAI_STORAGE") or default_storage_kind()).lower()
+    if kind == "sqlite":
+        return SQLiteBackend(os.getenv("SYNCAI_SQLITE_PATH", "data/syncai.db"))
+    if kind == "journal":
+        from .journal import JournalBackend
+        return JournalBackend(os.getenv("SYNCAI_JOURNAL_DIR", "data/journal"))
+    if kind == "redis":
+        from .redis_backend import RedisBackend
+        return RedisBackend(os.getenv("SYNCAI_REDIS_URL", "redis://localhost:6379/0"),
+                            prefix=os.getenv("SYNCAI_REDIS_PREFIX", "syncai"))
+    return MemoryBackend()
@@ -0,0 +1,65 @@
+"""
+主題讀取視圖模組
+每個主題保留一份已序列化（含票數）的留言 JSON 片段列表，與 topic["comments"]
+的位置一一對應；新增、刪除、投票與改暱稱時由 RoomStore 就地更新對應的片段，
+輪詢讀取時只需串接（並快取）整個陣列，不再逐則查票數、重新序列化。
+
+片段在第一次被讀取時才建立，沒有人讀取的主題（例如剛自封存載回）不額外佔用記憶體。
+修改留言列表與更新片段需在同一個 lock 內完成，確保建立片段時看到一致的列表。
+"""
+
+import threading
+from typing import Callable, List, Optional, Tuple
+
+from .records import CommentRecord
+
+VoteCounts = Callable[[str], Tuple[int, int]]
+
+
+class TopicView:
+    """單一主題的留言 JSON 片段"""
+
+    __slots__ = ("lock", "_fragments", "_generation", "_array")
+
+    def __init__(self):
+        # 保護留言列表與片段的一致性；RoomStore 修改 topic["comments"] 時需持有
+        self.lock = threading.Lock()
+        self._fragments: Optional[List[str]] = None
+        # 每次片段改變時遞增；快取的陣列記錄建立時的世代，世代不同即失效
+        self._generation = 0
+        self._array: Optional[Tuple[int, str]] = None
+
+    def render(self, comments: List[CommentRecord], counts: VoteCounts) -> str:
+        """整個主題的留言 JSON 陣列；未變更時回傳同一個字串物件"""
+        cached = self._array
+        if cached is not None and cached[0] == self._generation:
+            return cached[1]
+        with self.lock:
+            if self._fragments is None:
+                self._fragments = [comment.to_json(*counts(comment.id)) for comment in comments]
+            generation = self._generation
+            array = "[" + ",".join(self._fragments) + "]"
+            self._array = (generation, array)
+            return array
+
+    # --- 更新（呼叫端需持有 lock） ---
+    def append(self, comment: CommentRecord, counts: VoteCounts):
+        if self._fragments is not None:
+            self._fragments.append(comment.to_json(*counts(comment.id)))
+        self._generation += 1
+
+    def replace(self, position: int, comment: CommentRecord, counts: VoteCounts):
+        if self._fragments is not None:
+            self._fragments[position] = comment.to_json(*counts(comment.id))
+        self._generation += 1
+
+    def pop(self, position: int):
+        if self._fragments is not None:
+            self._fragments.pop(position)
+        self._generation += 1
+
+    def retain(self, keep: List[bool]):
+        """批次刪除後只保留 keep 為 True 的位置"""
+        if self._fragments is not None:
+            self._fragments = [fragment for fragment, kept in zip(self._fragments, keep) if kept]
+        self._generation += 1
@@ -1,7 +1,9 @@
 # backend/api/utility.py
 import io
+import os
 import time
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import quote
 from fastapi.responses import StreamingResponse
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
@@ -9,7 +11,11 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_LEFT, TA_CENTER
 from reportlab.lib.colors import navy, gray
 
-def export_room_pdf(room, room_data, room_topics, votes, FONT_NAME):
+# PDF 排版是秒級的 CPU 工作，使用專屬的執行緒，不佔用處理一般請求的 threadpool
+# （SYNCAI_PDF_WORKERS 設定同時產生的 PDF 數量，預設 2）
+pdf_executor = ThreadPoolExecutor(max_workers=int(os.getenv("SYNCAI_PDF_WORKERS", "2")), thread_name_prefix="pdf")
+
+def export_room_pdf(room, room_data, room_topics, store, FONT_NAME):
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(
         buffer, 
@@ -108,10 +114,9 @@ def export_room_pdf(room, room_data, room_topics, votes, FONT_NAME):
         good_votes = 0
         bad_votes = 0
         for comment in comments:
-            comment_id = comment.get('id', '')
-            if comment_id in votes:
-                good_votes += len(votes[comment_id].get('good', []))
-                bad_votes += len(votes[comment_id].get('bad', []))
+            g_vote, b_vote = store.vote_counts(comment.id)
+            good_votes += g_vote
+            bad_votes += b_vote
         topic_vote_counts.append(good_votes + bad_votes)
         if good_votes + bad_votes > 0:
             positive_percent = (good_votes / (good_votes + bad_votes)) * 100
@@ -201,30 +206,26 @@ def export_room_pdf(room, room_data, room_topics, votes, FONT_NAME):
             story.append(Paragraph(f"留言數量: {len(comments)}", styles['SubHeaderStyle']))
             good_votes_total = 0
             bad_votes_total = 0
-            comment_votes = []
-            for comment in comments:
-                comment_id = comment.get('id', '')
-                good_votes = 0
-                bad_votes = 0
-                if comment_id in votes:
-                    good_votes = len(votes[comment_id].get('good', []))
-                    bad_votes = len(votes[comment_id].get('bad', []))
-                    good_votes_total += good_votes
-                    bad_votes_total += bad_votes
-                comment_votes.append((comment, good_votes, bad_votes))
+            # 分數索引已依 (好評 - 差評) 排好名次，不需排序
+            ranked_comments = []
+            for comment in store.top_comments(room, topic["topic_name"]):
+                good_votes, bad_votes = store.vote_counts(comment.id)
+                good_votes_total += good_votes
+                bad_votes_total += bad_votes
+                ranked_comments.append((comment, good_votes, bad_votes))
             story.append(Paragraph(f"正面評價: {good_votes_total} | 負面評價: {bad_votes_total}", styles['SubHeaderStyle']))
             story.append(Spacer(1, 10))
             # 最受歡迎留言圖（如留言數>3）
             if len(comments) > 3:
-                sorted_comments = sorted(comment_votes, key=lambda x: x[1] - x[2], reverse=True)[:5]
-                if sorted_comments:
+                top_comments = ranked_comments[:5]
+                if top_comments:
                     story.append(Paragraph("本主題最受歡迎留言", styles['ChartTitleStyle']))
                     labels = []
                     good_votes = []
                     bad_votes = []
-                    for comment, g_vote, b_vote in sorted_comments:
-                        nickname = comment.get('nickname', '匿名')
-                        content = comment.get('content', '')
+                    for comment, g_vote, b_vote in top_comments:
+                        nickname = comment.nickname or '匿名'
+                        content = comment.content
                         short_content = content[:15] + '...' if len(content) > 15 else content
                         labels.append(f"{nickname}: {short_content}")
                         good_votes.append(g_vote)
@@ -257,16 +258,10 @@ def export_room_pdf(room, room_data, room_topics, votes, FONT_NAME):
             # 留言列表
             story.append(Paragraph("留言列表:", styles['SubHeaderStyle']))
             story.append(Spacer(1, 5))
-            sorted_comments = sorted(comments, key=lambda c: 
-                len(votes.get(c.get('id', ''), {}).get('good', [])) - 
-                len(votes.get(c.get('id', ''), {}).get('bad', [])), 
-                reverse=True)
-            for j, comment in enumerate(sorted_comments, 1):
-                nickname = comment.get('nickname', '匿名')
-                content = comment.get('content', '').replace('\n', '<br/>')
-                timestamp = datetime.datetime.fromtimestamp(comment.get('ts', time.time())).strftime('%H:%M:%S')
-                good_votes = len(votes.get(comment.get('id', ''), {}).get('good', []))
-                bad_votes = len(votes.get(comment.get('id', ''), {}).get('bad', []))
+            for j, (comment, good_votes, bad_votes) in enumerate(ranked_comments, 1):
+                nickname = comment.nickname or '匿名'
+                content = comment.content.replace('\n', '<br/>')
+                timestamp = datetime.datetime.fromtimestamp(comment.ts).strftime('%H:%M:%S')
                 vote_score = good_votes - bad_votes
                 bg_color = "#FAFAFA"
                 if vote_score > 2:
@@ -0,0 +1,120 @@
+"""
+投票帳本模組
+以 {裝置ID: 投票類型} 記錄每則留言的投票者，並維護好評/差評計數與
+(房間, 裝置) -> {留言ID: 投票類型} 的反向索引，
+讓投票、取消投票、讀取票數與查詢個人投票紀錄都是 O(1)。
+裝置 ID 經過 intern，同一裝置的所有投票共用同一個字串物件。
+"""
+
+from typing import Dict, Iterator, Optional, Tuple
+
+from .records import intern_text
+
+VOTE_TYPES = ("good", "bad")
+
+
+class VoteLedger:
+    """投票帳本"""
+
+    def __init__(self):
+        # comment_id -> {device_id: vote_type}（每則留言一個 dict，取代兩個集合）
+        self._voters: Dict[str, Dict[str, str]] = {}
+        # comment_id -> (好評數, 差評數)，供輪詢直接讀取
+        self._counts: Dict[str, Tuple[int, int]] = {}
+        # (room, device_id) -> {comment_id: vote_type}
+        self._by_device: Dict[Tuple[str, str], Dict[str, str]] = {}
+
+    def cast(self, room: str, comment_id: str, device_id: str, vote_type: str) -> bool:
+        """
+        投票；若已投過相反類型則自動改票。
+
+        Returns:
+            False 表示已投過相同類型的票
+        """
+        entry = self._voters.get(comment_id)
+        if entry is None:
+            entry = self._voters[comment_id] = {}
+        previous = entry.get(device_id)
+        if previous == vote_type:
+            return False
+
+        device_id = intern_text(device_id)
+        vote_type = intern_text(vote_type)
+        entry[device_id] = vote_type
+        self._adjust_count(comment_id, previous, -1)
+        self._adjust_count(comment_id, vote_type, 1)
+        self._by_device.setdefault((room, device_id), {})[comment_id] = vote_type
+        return True
+
+    def retract(self, room: str, comment_id: str, device_id: str, vote_type: str) -> bool:
+        """
+        取消投票。
+
+        Returns:
+            False 表示找不到對應的投票
+        """
+        entry = self._voters.get(comment_id)
+        if entry is None or entry.get(device_id) != vote_type:
+            return False
+
+        del entry[device_id]
+        if entry:
+            self._adjust_count(comment_id, vote_type, -1)
+        else:
+            del self._voters[comment_id]
+            self._counts.pop(comment_id, None)
+        device_votes = self._by_device.get((room, device_id))
+        if device_votes is not None:
+            device_votes.pop(comment_id, None)
+            if not device_votes:
+                del self._by_device[(room, device_id)]
+        return True
+
+    def counts(self, comment_id: str) -> Tuple[int, int]:
+        """回傳留言的 (好評數, 差評數)"""
+        return self._counts.get(comment_id, (0, 0))
+
+    def device_votes(self, room: str, device_id: str) -> Dict[str, str]:
+        """回傳某裝置在房間內的投票紀錄 {comment_id: vote_type}（複本，讀取端不受並行寫入影響）"""
+        return dict(self._by_device.get((room, device_id), {}))
+
+    def drop_comment(self, room: str, comment_id: str):
+        """刪除留言的所有投票紀錄"""
+        entry = self._voters.pop(comment_id, None)
+        self._counts.pop(comment_id, None)
+        if entry is None:
+            return
+        for device_id in entry:
+            device_votes = self._by_device.get((room, device_id))
+            if device_votes is None:
+                continue
+            device_votes.pop(comment_id, None)
+            if not device_votes:
+                del self._by_device[(room, device_id)]
+
+    def voters(self, comment_id: str) -> Iterator[Tuple[str, str]]:
+        """逐筆列出留言的 (裝置ID, 投票類型)，供持久化快照與封存使用"""
+        entry = self._voters.get(comment_id)
+        if entry is None:
+            return
+        yield from list(entry.items())
+
+    def as_dict(self) -> Dict[str, Dict[str, list]]:
+        """輸出與舊版 votes 字典相同的結構（調試用）"""
+        return {
+            comment_id: {
+                vote_type: [device_id for device_id, voted in entry.items() if voted == vote_type]
+                for vote_type in VOTE_TYPES
+            }
+            for comment_id, entry in self._voters.items()
+        }
+
+    def _adjust_count(self, comment_id: str, vote_type: Optional[str], delta: int):
+        if vote_type is None:
+            return
+        good, bad = self._counts.get(comment_id, (0, 0))
+        if vote_type == "good":
+            good += delta
+        else:
+            bad += delta
+        self._counts[comment_id] = (good, bad)
@@ -0,0 +1,172 @@
+"""
+混合負載延遲基準測試
+
+啟動單一 uvicorn worker，同時送出大量心跳、輪詢、投票與 PDF 匯出請求，
+統計各類請求的 p50 / p99 延遲，觀察微秒級的記憶體操作是否被
+threadpool 排隊或 PDF 排版拖慢。
+
+SYNCAI_BENCH_APP 可指定其他 ASGI 應用（預設 backend.main:app）。
+
+執行方式（於專案根目錄）：
+    python -m backend.benchmarks.bench_latency [秒數，預設 10]
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from .bench_workers import free_port
+
+CLIENT_PROCESSES = int(os.getenv("SYNCAI_BENCH_CLIENTS", "2"))
+# 每個用戶端行程的並行數
+HEARTBEAT_TASKS = 32
+POLL_TASKS = 8
+VOTE_TASKS = 8
+PDF_TASKS = int(os.getenv("SYNCAI_BENCH_PDF", "1"))
+SEED_COMMENTS = 300
+
+
+def start_server():
+    port = free_port()
+    python_path = os.pathsep.join(filter(None, [os.getcwd(), os.getenv("PYTHONPATH")]))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", os.getenv("SYNCAI_BENCH_APP", "backend.main:app"), "--port", str(port),
+         "--log-level", "warning"],
+        env=dict(os.environ, PYTHONPATH=python_path), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            httpx.get(f"{base_url}/api/rooms", timeout=1)
+            return process, base_url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("uvicorn 未能啟動")
+
+
+class Connection:
+    """極簡的 HTTP/1.1 keep-alive 連線：用戶端與伺服器共用 CPU 時，httpx 本身的開銷會蓋過伺服器延遲"""
+
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, body=None) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+        )
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        length = 0
+        for line in head.split(b"\r\n"):
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":", 1)[1])
+        await self.reader.readexactly(length)
+        return status
+
+
+async def timed_loop(deadline, samples, request):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        await request()
+        samples.append(time.perf_counter() - started)
+
+
+async def client_main(base_url, code, comment_ids, index, duration):
+    samples = {"heartbeat": [], "state": [], "vote": [], "pdf": []}
+    host, port = base_url.rsplit("//", 1)[1].split(":")
+    deadline = time.perf_counter() + duration
+
+    def heartbeat(n):
+        connection, body = Connection(host, port), {"room": code, "device_id": f"p{index}-{n}"}
+        return lambda: connection.request("POST", "/api/participants/heartbeat", body)
+
+    def poll():
+        connection = Connection(host, port)
+        return lambda: connection.request("GET", f"/api/rooms/{code}/state")
+
+    def vote(n):
+        connection, body, state = Connection(host, port), {"device_id": f"v{index}-{n}", "vote_type": "good"}, {"i": 0}
+
+        async def request():
+            # 同一則留言先投票再撤回，票數維持在固定範圍
+            comment_id = comment_ids[(n + state["i"] // 2) % len(comment_ids)]
+            method = "POST" if state["i"] % 2 == 0 else "DELETE"
+            state["i"] += 1
+            await connection.request(method, f"/api/rooms/{code}/comments/{comment_id}/vote", body)
+        return request
+
+    async def export_pdf(client):
+        await client.get("/api/export_pdf", params={"room": code})
+
+    tasks = [timed_loop(deadline, samples["heartbeat"], heartbeat(n)) for n in range(HEARTBEAT_TASKS)]
+    tasks += [timed_loop(deadline, samples["state"], poll()) for _ in range(POLL_TASKS)]
+    tasks += [timed_loop(deadline, samples["vote"], vote(n)) for n in range(VOTE_TASKS)]
+    # PDF 回應為 chunked 串流，改用 httpx
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        if index == 0:
+            tasks += [timed_loop(deadline, samples["pdf"], lambda: export_pdf(client)) for _ in range(PDF_TASKS)]
+        await asyncio.gather(*tasks)
+    return samples
+
+
+def client_process(base_url, code, comment_ids, index, duration, results):
+    results.put(asyncio.run(client_main(base_url, code, comment_ids, index, duration)))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    process, base_url = start_server()
+    try:
+        with httpx.Client(base_url=base_url, timeout=30) as client:
+            code = client.post("/api/create_room", json={
+                "title": "bench", "topics": ["主題"], "topic_count": 1,
+            }).json()["code"]
+            for i in range(SEED_COMMENTS):
+                client.post(f"/api/rooms/{code}/comments", json={"nickname": f"user{i % 20}", "content": f"留言 {i}"})
+            comment_ids = [c["id"] for c in client.get(f"/api/rooms/{code}/comments").json()["comments"]]
+
+        results = multiprocessing.Queue()
+        clients = [multiprocessing.Process(target=client_process,
+                                           args=(base_url, code, comment_ids, i, duration, results))
+                   for i in range(CLIENT_PROCESSES)]
+        for c in clients:
+            c.start()
+        merged = {}
+        for _ in clients:
+            for kind, values in results.get().items():
+                merged.setdefault(kind, []).extend(values)
+        for c in clients:
+            c.join()
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+    print(f"{CLIENT_PROCESSES} 個用戶端行程，每個 {HEARTBEAT_TASKS} 心跳 / {POLL_TASKS} 輪詢 / {VOTE_TASKS} 投票並行，"
+          f"{PDF_TASKS} 個 PDF 匯出，{duration:.0f} 秒")
+    for kind, values in merged.items():
+        if not values:
+            continue
+        print(f"  {kind:<9} {len(values) / duration:8,.0f} 請求/秒  "
+              f"p50 {statistics.median(values) * 1000:7.2f} ms  p99 {percentile(values, 0.99):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
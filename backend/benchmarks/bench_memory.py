@@ -0,0 +1,114 @@
+"""
+討論室記憶體用量基準測試
+
+以 tracemalloc 量測一個房間寫入大量留言與投票後常駐的記憶體，
+換算成每 10k 則留言的用量；再量測輪詢時把整個主題序列化成 JSON 的配置量與耗時，
+並與主題讀取視圖（寫入時更新的 JSON 片段）比較。
+暱稱、裝置 ID 與留言 ID 每次都是新的字串物件，模擬由 JSON 請求解析出的資料。
+
+執行方式（於專案根目錄）：
+    python -m backend.benchmarks.bench_memory [留言數]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+
+from backend.api.records import CommentRecord
+from backend.api.room_store import RoomStore
+
+TOPICS = 5
+PARTICIPANTS = 200
+VOTES_PER_COMMENT = 3
+POLLS = 20
+
+
+def fresh(text: str) -> str:
+    """產生內容相同、但為新物件的字串"""
+    return text.encode("utf-8").decode("utf-8")
+
+
+def populate(store: RoomStore, code: str, comments: int):
+    store.create_room(code, {"code": code, "title": "bench", "status": "Discussion", "created_at": time.time()})
+    for i in range(TOPICS):
+        store.ensure_topic(code, f"主題{i}")
+    rng = random.Random(1)
+    ids = []
+    for i in range(comments):
+        author = rng.randrange(PARTICIPANTS)
+        comment_id = str(uuid.uuid4())
+        store.add_comment(code, f"主題{i % TOPICS}", CommentRecord(
+            comment_id,
+            fresh(f"參與者{author}"),
+            f"第 {i} 則意見：這是一段長度接近實際使用情況的留言內容",
+            time.time(),
+            False,
+            fresh(f"device-{author:04d}-{'x' * 24}"),
+        ))
+        ids.append(comment_id)
+        for voter in rng.sample(range(PARTICIPANTS), VOTES_PER_COMMENT):
+            store.cast_vote(code, fresh(comment_id), fresh(f"device-{voter:04d}-{'x' * 24}"),
+                            "good" if voter % 3 else "bad")
+    return ids
+
+
+def poll(store: RoomStore, code: str) -> str:
+    """與 GET /api/rooms/{room}/state 相同的留言序列化路徑（主題讀取視圖）"""
+    return store.topic_json(code, "主題0")
+
+
+def serialize(store: RoomStore, code: str) -> str:
+    """不經讀取視圖、逐則序列化的路徑，作為對照"""
+    comments = store.get_topic(code, "主題0")["comments"]
+    return "[" + ",".join([comment.to_json(*store.vote_counts(comment.id)) for comment in comments]) + "]"
+
+
+def main():
+    comments = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    store = RoomStore()
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    populate(store, "BENCH1", comments)
+    resident = tracemalloc.get_traced_memory()[0] - base
+    print(f"{comments} 則留言、{comments * VOTES_PER_COMMENT} 筆投票：常駐 {resident / 1e6:.2f} MB，"
+          f"每 10k 則留言 {resident / comments * 10000 / 1e6:.2f} MB（{resident / comments:.0f} bytes/則）")
+
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    response = serialize(store, "BENCH1")
+    peak = tracemalloc.get_traced_memory()[1] - before
+    del response
+    poll(store, "BENCH1")
+    view_size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    per_topic = comments // TOPICS
+    elapsed = timed(lambda: serialize(store, "BENCH1"))
+    print(f"逐則序列化一個主題（{per_topic} 則）：配置峰值 {peak / 1e6:.2f} MB，耗時 {elapsed * 1000:.2f} ms")
+    print(f"讀取視圖常駐 {view_size / 1e6:.2f} MB")
+    print(f"讀取視圖（未變更）：{timed(lambda: poll(store, 'BENCH1')) * 1e6:.1f} us")
+
+    # 每次輪詢之間有一票：只重新序列化該則留言的片段，再串接陣列
+    comment_ids = [comment.id for comment in store.get_topic("BENCH1", "主題0")["comments"]]
+    votes = iter(range(POLLS * 10))
+
+    def vote_then_poll():
+        i = next(votes)
+        store.cast_vote("BENCH1", comment_ids[i % len(comment_ids)], f"bench-voter-{i}", "good")
+        return poll(store, "BENCH1")
+
+    print(f"讀取視圖（每次輪詢前一票）：{timed(vote_then_poll) * 1000:.2f} ms")
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    for _ in range(POLLS):
+        fn()
+    return (time.perf_counter() - start) / POLLS
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+房間分片吞吐量基準測試
+
+啟動 N 個 shard（各自以 SYNCAI_SHARD_ID 執行 backend.main）與 backend.dispatcher，
+建立大量房間後由多個用戶端隨機輪詢各房間狀態，比較不同 shard 數的每秒請求數：
+- direct：用戶端自行以雜湊環找出 shard（相當於在 nginx 層分流），只測 shard 本身
+- dispatcher：經由 Python 分派器轉送
+
+最後再加入一個 shard 觸發重新平衡，確認所有房間仍可透過分派器讀到完整留言。
+
+SYNCAI_BENCH_APP 可指定 shard 使用的 ASGI 應用（預設 backend.main:app）。
+
+執行方式（於專案根目錄）：
+    python -m backend.benchmarks.bench_shards [shard 數列表，預設 1,2,4] [秒數]
+"""
+
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from backend.api.sharding import HashRing
+
+ROOMS = 64
+COMMENTS_PER_ROOM = 50
+CLIENTS = 16
+# 分派器與 shard 共用的內部端點密鑰
+SHARD_SECRET = "bench-shard-secret"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn(app: str, port: int, env: dict) -> subprocess.Popen:
+    python_path = os.pathsep.join(filter(None, [os.getcwd(), os.getenv("PYTHONPATH")]))
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        env=dict(os.environ, PYTHONPATH=python_path, SYNCAI_STORAGE="memory",
+                 SYNCAI_SHARD_SECRET=SHARD_SECRET, **env),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_ready(url: str):
+    for _ in range(300):
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} 未能啟動")
+
+
+def start_shards(count: int):
+    """啟動 count 個 shard，回傳 (行程列表, 位址列表)"""
+    ports = [free_port() for _ in range(count)]
+    urls = [f"http://127.0.0.1:{port}" for port in ports]
+    app = os.getenv("SYNCAI_BENCH_APP", "backend.main:app")
+    processes = [spawn(app, port, {"SYNCAI_SHARDS": ",".join(urls), "SYNCAI_SHARD_ID": url})
+                 for port, url in zip(ports, urls)]
+    for url in urls:
+        wait_ready(f"{url}/internal/shard")
+    return processes, urls
+
+
+def client_loop(targets, duration: float, results):
+    """targets: [(base_url, room_code)]；每個用戶端對每個 shard 保持一條連線"""
+    clients = {}
+    count = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        base_url, code = random.choice(targets)
+        client = clients.get(base_url)
+        if client is None:
+            client = clients[base_url] = httpx.Client(base_url=base_url, timeout=10)
+        client.get(f"/api/rooms/{code}/state")
+        count += 1
+    for client in clients.values():
+        client.close()
+    results.put(count)
+
+
+def measure(targets, duration: float) -> float:
+    results = multiprocessing.Queue()
+    clients = [multiprocessing.Process(target=client_loop, args=(targets, duration, results)) for _ in range(CLIENTS)]
+    for c in clients:
+        c.start()
+    total = sum(results.get() for _ in clients)
+    for c in clients:
+        c.join()
+    return total / duration
+
+
+def comment_counts(base_url: str, codes):
+    with httpx.Client(base_url=base_url, timeout=10) as client:
+        return {code: len(client.get(f"/api/rooms/{code}/state").json().get("comments", [])) for code in codes}
+
+
+def run(shard_count: int, duration: float, check_rebalance: bool):
+    processes, urls = start_shards(shard_count)
+    dispatcher_port = free_port()
+    dispatcher_url = f"http://127.0.0.1:{dispatcher_port}"
+    processes.append(spawn("backend.dispatcher:app", dispatcher_port, {"SYNCAI_SHARDS": ",".join(urls)}))
+    wait_ready(f"{dispatcher_url}/_dispatcher/shards")
+    try:
+        codes = []
+        with httpx.Client(base_url=dispatcher_url, timeout=30) as client:
+            for i in range(ROOMS):
+                codes.append(client.post("/api/create_room", json={
+                    "title": f"bench {i}", "topics": ["主題"], "topic_count": 1,
+                }).json()["code"])
+            for code in codes:
+                for j in range(COMMENTS_PER_ROOM):
+                    client.post(f"/api/rooms/{code}/comments", json={"nickname": f"user{j}", "content": f"留言 {j}"})
+            rooms_listed = len(client.get("/api/rooms").json()["rooms"])
+
+        ring = HashRing(urls)
+        direct = measure([(ring.owner(code), code) for code in codes], duration)
+        dispatched = measure([(dispatcher_url, code) for code in codes], duration)
+        print(f"shards={shard_count}: direct {direct:,.0f} 請求/秒，dispatcher {dispatched:,.0f} 請求/秒，"
+              f"房間列表合併 {rooms_listed}/{ROOMS}")
+
+        if check_rebalance:
+            extra, extra_urls = start_shards(1)
+            processes += extra
+            new_urls = urls + extra_urls
+            # 分派器會把新的雜湊環通知所有 shard
+            moved = httpx.put(f"{dispatcher_url}/_dispatcher/shards", json={"shards": new_urls}, timeout=60).json()["moved"]
+            counts = comment_counts(dispatcher_url, codes)
+            intact = all(count == COMMENTS_PER_ROOM for count in counts.values())
+            print(f"  加入第 {len(new_urls)} 個 shard：搬移 {sum(moved.values())} 個房間"
+                  f"（理想約 {ROOMS // len(new_urls)}），所有房間留言完整: {intact}")
+        return direct, dispatched
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+
+def main():
+    shard_counts = [int(n) for n in sys.argv[1].split(",")] if len(sys.argv) > 1 else [1, 2, 4]
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(f"{ROOMS} 個房間 × {COMMENTS_PER_ROOM} 則留言，{CLIENTS} 個用戶端，CPU 核心數 {os.cpu_count()}")
+    baseline = None
+    for index, shard_count in enumerate(shard_counts):
+        direct, _ = run(shard_count, duration, check_rebalance=index == len(shard_counts) - 1)
+        baseline = baseline or direct
+        print(f"  direct 相對 {shard_counts[0]} shard: {direct / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
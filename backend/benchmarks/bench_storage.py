@@ -0,0 +1,105 @@
+"""
+討論室儲存後端寫入吞吐量基準測試
+
+比較 MemoryBackend、SQLiteBackend（WAL + 批次提交）與 JournalBackend
+（附加式日誌）在大量留言與投票下請求執行緒的耗時、背景寫入全部落盤
+所需的時間，以及重新啟動時的載入時間。
+
+執行方式（於專案根目錄）：
+    python -m backend.benchmarks.bench_storage [留言數]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+from backend.api.journal import JournalBackend
+from backend.api.records import CommentRecord
+from backend.api.room_store import RoomStore
+from backend.api.storage import MemoryBackend, SQLiteBackend
+
+TOPICS = 5
+VOTERS = 3
+
+
+def run(store: RoomStore, comments: int) -> float:
+    """寫入 comments 筆留言與 comments * VOTERS 筆投票，回傳請求端耗時（秒）"""
+    code = "BENCH1"
+    store.create_room(code, {"code": code, "title": "bench", "status": "Discussion", "created_at": time.time()})
+    for i in range(TOPICS):
+        store.ensure_topic(code, f"主題{i}")
+
+    start = time.perf_counter()
+    for i in range(comments):
+        comment_id = str(uuid.uuid4())
+        store.add_comment(code, f"主題{i % TOPICS}", CommentRecord(
+            comment_id, f"user{i % 50}", f"留言內容 {i}", time.time(), False, f"device{i % 50}",
+        ))
+        for voter in range(VOTERS):
+            store.cast_vote(code, comment_id, f"voter{voter}", "good" if voter % 2 == 0 else "bad")
+    return time.perf_counter() - start
+
+
+def main():
+    comments = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    writes = comments * (1 + VOTERS)
+    print(f"寫入 {comments} 筆留言、{comments * VOTERS} 筆投票（共 {writes} 次變更）")
+
+    store = RoomStore()
+    store.attach_backend(MemoryBackend())
+    elapsed = run(store, comments)
+    print(f"memory : {elapsed:.3f}s  {writes / elapsed:,.0f} 次/秒")
+
+    with tempfile.TemporaryDirectory() as directory:
+        backend = SQLiteBackend(os.path.join(directory, "bench.db"))
+        store = RoomStore()
+        store.attach_backend(backend)
+        elapsed = run(store, comments)
+        start = time.perf_counter()
+        backend.flush()
+        drained = time.perf_counter() - start
+        print(f"sqlite : {elapsed:.3f}s  {writes / elapsed:,.0f} 次/秒（請求端）")
+        print(f"         落盤完成另需 {drained:.3f}s，總計 {writes / (elapsed + drained):,.0f} 次/秒")
+
+        start = time.perf_counter()
+        reloaded = RoomStore()
+        reloaded.attach_backend(SQLiteBackend(backend.path))
+        print(f"         重新載入: {time.perf_counter() - start:.3f}s")
+        backend.close()
+        reloaded.backend.close()
+
+    with tempfile.TemporaryDirectory() as directory:
+        backend = JournalBackend(directory)
+        store = RoomStore()
+        store.attach_backend(backend)
+        elapsed = run(store, comments)
+        start = time.perf_counter()
+        backend.flush()
+        drained = time.perf_counter() - start
+        print(f"journal: {elapsed:.3f}s  {writes / elapsed:,.0f} 次/秒（請求端）")
+        print(f"         落盤完成另需 {drained:.3f}s，總計 {writes / (elapsed + drained):,.0f} 次/秒")
+
+        # 未壓縮：在複本上重播完整日誌
+        replay_directory = os.path.join(directory, "replay")
+        shutil.copytree(directory, replay_directory, ignore=shutil.ignore_patterns("replay"))
+        start = time.perf_counter()
+        replayed = RoomStore()
+        replayed.attach_backend(JournalBackend(replay_directory))
+        print(f"         重播日誌載入: {time.perf_counter() - start:.3f}s")
+        replayed.backend.close()
+        shutil.rmtree(replay_directory)
+
+        # close() 會寫入快照，之後只需載入快照
+        backend.close()
+        start = time.perf_counter()
+        reloaded = RoomStore()
+        reloaded.attach_backend(JournalBackend(directory))
+        print(f"         快照載入: {time.perf_counter() - start:.3f}s")
+        reloaded.backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+多 worker 請求吞吐量基準測試
+
+以 SYNCAI_STORAGE=redis 啟動 uvicorn --workers N，對同一個討論室送出
+輪詢（GET /api/rooms/{code}/state）請求，比較不同 worker 數的每秒請求數，
+並確認在某個 worker 新增的留言能被其他 worker 讀到。
+
+未設定 SYNCAI_REDIS_URL 時會啟動 fakeredis 的 TCP 模擬伺服器（需 pip install fakeredis）；
+SYNCAI_BENCH_APP 可指定其他 ASGI 應用（預設 backend.main:app）。
+
+執行方式（於專案根目錄）：
+    python -m backend.benchmarks.bench_workers [worker 數列表，預設 1,2,4] [秒數]
+"""
+
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+CLIENTS = 16
+SEED_COMMENTS = 300
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_fake_redis() -> str:
+    from fakeredis import TcpFakeServer
+    port = free_port()
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"redis://127.0.0.1:{port}/0"
+
+
+def start_server(workers: int, redis_url: str, prefix: str):
+    port = free_port()
+    python_path = os.pathsep.join(filter(None, [os.getcwd(), os.getenv("PYTHONPATH")]))
+    env = dict(os.environ, SYNCAI_STORAGE="redis", SYNCAI_REDIS_URL=redis_url, PYTHONPATH=python_path)
+    # 每輪使用獨立的 Redis 資料，避免上一輪的房間影響結果
+    env["SYNCAI_REDIS_PREFIX"] = prefix
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", os.getenv("SYNCAI_BENCH_APP", "backend.main:app"), "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            httpx.get(f"{base_url}/api/rooms", timeout=1)
+            return process, base_url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("uvicorn 未能啟動")
+
+
+def client_loop(base_url: str, code: str, duration: float, results):
+    count = 0
+    with httpx.Client(base_url=base_url, timeout=10) as client:
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            client.get(f"/api/rooms/{code}/state")
+            count += 1
+    results.put(count)
+
+
+def run(workers: int, redis_url: str, duration: float) -> float:
+    process, base_url = start_server(workers, redis_url, f"bench{workers}:{time.time_ns()}")
+    try:
+        with httpx.Client(base_url=base_url, timeout=30) as client:
+            code = client.post("/api/create_room", json={
+                "title": "bench", "topics": ["主題"], "topic_count": 1,
+            }).json()["code"]
+            # 等待其他 worker 收到新房間
+            time.sleep(0.5)
+            for i in range(SEED_COMMENTS):
+                client.post(f"/api/rooms/{code}/comments", json={"nickname": f"user{i % 20}", "content": f"留言 {i}"})
+            time.sleep(0.5)
+            # 每個連線各自落在某個 worker，確認都讀得到完整留言
+            counts = set()
+            for _ in range(workers * 4):
+                with httpx.Client(base_url=base_url, timeout=10) as probe:
+                    counts.add(len(probe.get(f"/api/rooms/{code}/state").json()["comments"]))
+            consistent = counts == {SEED_COMMENTS}
+
+        results = multiprocessing.Queue()
+        clients = [multiprocessing.Process(target=client_loop, args=(base_url, code, duration, results))
+                   for _ in range(CLIENTS)]
+        for c in clients:
+            c.start()
+        total = sum(results.get() for _ in clients)
+        for c in clients:
+            c.join()
+        throughput = total / duration
+        print(f"workers={workers}: {throughput:,.0f} 請求/秒，各 worker 留言數一致: {consistent}")
+        return throughput
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def main():
+    worker_counts = [int(n) for n in sys.argv[1].split(",")] if len(sys.argv) > 1 else [1, 2, 4]
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    redis_url = os.getenv("SYNCAI_REDIS_URL") or start_fake_redis()
+    print(f"Redis: {redis_url}，{CLIENTS} 個用戶端，每輪 {duration:.0f} 秒，CPU 核心數 {os.cpu_count()}")
+    baseline = None
+    for workers in worker_counts:
+        throughput = run(workers, redis_url, duration)
+        baseline = baseline or throughput
+        print(f"  相對 {worker_counts[0]} worker: {throughput / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+重播討論室事件日誌
+
+把 JournalBackend 目錄中的快照與日誌段落依序套用到全新的 RoomStore，
+可用來重現實際流量做壓力測試，或確認日誌能否完整復原。
+
+執行方式（於專案根目錄）：
+    python -m backend.benchmarks.replay_journal data/journal [重播次數]
+"""
+
+import os
+import sys
+import time
+from collections import Counter
+
+from backend.api.journal import (
+    SEGMENT_PATTERN, SNAPSHOT_PATTERN, apply_record, read_records,
+)
+from backend.api.room_store import RoomStore
+
+
+def journal_files(directory: str):
+    """依復原順序列出最新快照與其後的日誌段落"""
+    snapshots, segments = [], []
+    for filename in os.listdir(directory):
+        if SNAPSHOT_PATTERN.match(filename):
+            snapshots.append(filename)
+        elif SEGMENT_PATTERN.match(filename):
+            segments.append(filename)
+    files = []
+    start = 0
+    if snapshots:
+        latest = max(snapshots)
+        start = int(SNAPSHOT_PATTERN.match(latest).group(1))
+        files.append(latest)
+    files += [f for f in sorted(segments) if int(SEGMENT_PATTERN.match(f).group(1)) >= start]
+    return [os.path.join(directory, f) for f in files]
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    directory = sys.argv[1]
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+    # 先讀入記憶體，只計算套用到 store 的時間
+    records = [record for path in journal_files(directory) for record in read_records(path)]
+    ops = Counter(op for op, _ in records)
+    print(f"共 {len(records)} 筆紀錄，依操作碼: {dict(sorted(ops.items()))}")
+
+    for i in range(rounds):
+        store = RoomStore()
+        start = time.perf_counter()
+        for op, args in records:
+            apply_record(store, op, args)
+        elapsed = time.perf_counter() - start
+        print(f"第 {i + 1} 次: {elapsed:.3f}s  {len(records) / elapsed:,.0f} 筆/秒，"
+              f"{len(store.rooms)} 個討論室")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+# backend/dispatcher.py
+"""
+討論室分片分派器
+
+放在多個 shard（各自以 SYNCAI_SHARD_ID 啟動的 backend.main）前面的輕量 ASGI 反向代理：
+- 從路徑（/api/rooms/{code}/...、/ws/rooms/{code}）、查詢參數（room、room_code）
+  或 JSON 內容（room、room_code、code）取出房間代碼，以一致性雜湊轉送到負責的 shard
+- GET /api/rooms 帶著原查詢參數向所有 shard 查詢，依建立時間合併排序後取前 limit 筆；
+  游標是 (建立時間, 代碼)，下一頁把同一個游標送給每個 shard 即可接續
+- /api/all_rooms（串流匯出）依序串接各 shard 的串流
+- 跨房間的批次請求（例如批次心跳）依房間拆開送到各 shard 後合併結果
+- 其他請求（包含 create_room）輪流分配；shard 只會產生自己負責的房間代碼
+- WebSocket 與 SSE 以串流方式雙向轉送
+
+shard 加入或離開時呼叫 PUT /_dispatcher/shards {"shards": [...]}，
+分派器先把歸屬改變的房間從舊 shard 匯出並匯入新 shard；全部匯入成功後才通知所有
+shard 新的雜湊環、切換轉送目標，再自舊 shard 移除已搬走的房間。任何一個房間匯出或
+匯入失敗時，已匯入的複本自新 shard 移除，雜湊環維持不變。離開的 shard 在搬移完成前需保持運作。
+
+呼叫 shard 的 /internal/shard 端點時帶上 SYNCAI_SHARD_SECRET 共用密鑰；
+用戶端送來的 /internal/ 請求一律拒絕，不轉送到 shard。
+
+執行方式：
+    SYNCAI_SHARDS=http://127.0.0.1:8001,http://127.0.0.1:8002 SYNCAI_SHARD_SECRET=... \\
+        uvicorn backend.dispatcher:app --port 8000
+nginx 只需把 /api/ 與 /ws/ 代理到分派器。
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+import httpx
+import websockets
+
+from backend.api.room_directory import make_cursor
+from backend.api.sharding import SHARD_SECRET_HEADER, HashRing
+
+ROOM_PATH = re.compile(r"^/(?:api|ws)/rooms/([^/]+)")
+ROOM_QUERY_FIELDS = ("room", "room_code")
+ROOM_BODY_FIELDS = ("room", "room_code", "code")
+# 未指定房間時依序串接所有 shard 回應內容的串流端點
+STREAM_FANOUT_PATHS = ("/api/all_rooms",)
+# 路徑 -> 內容中依房間拆分的列表欄位
+SPLIT_PATHS = {"/api/participants/heartbeat:batch": "heartbeats"}
+ADMIN_PATH = "/_dispatcher/shards"
+# 只供分派器呼叫的 shard 內部端點
+INTERNAL_PREFIX = "/internal/"
+# 不轉送的逐跳標頭
+HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "host", "content-length",
+}
+
+
+def room_for_request(path: str, query_string: bytes, body: bytes) -> Optional[str]:
+    """找出請求所屬的房間代碼；找不到時回傳 None"""
+    match = ROOM_PATH.match(path)
+    if match:
+        return match.group(1)
+    if query_string:
+        query = parse_qs(query_string.decode("latin-1"))
+        for field in ROOM_QUERY_FIELDS:
+            if query.get(field):
+                return query[field][0]
+    if body[:1] == b"{":
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return None
+        for field in ROOM_BODY_FIELDS:
+            value = payload.get(field)
+            if isinstance(value, str) and value:
+                return value
+    return None
+
+
+def merge_responses(payloads: List[dict]) -> dict:
+    """合併多個 shard 的回應：列表串接、字典合併、數值相加、布林取且"""
+    merged: dict = {}
+    for payload in payloads:
+        for key, value in payload.items():
+            if isinstance(value, list):
+                merged.setdefault(key, []).extend(value)
+            elif isinstance(value, dict):
+                merged.setdefault(key, {}).update(value)
+            elif isinstance(value, bool):
+                merged[key] = merged.get(key, True) and value
+            elif isinstance(value, (int, float)):
+                merged[key] = merged.get(key, 0) + value
+            else:
+                merged.setdefault(key, value)
+    return merged
+
+
+def merge_room_pages(payloads: List[dict], limit: Optional[int]) -> dict:
+    """
+    合併各 shard 的 GET /api/rooms 回應。
+
+    每個 shard 回傳的是自己從游標之後的前 limit 筆，合併後依 (建立時間, 代碼) 排序
+    再取前 limit 筆即為全域的下一頁；房間只屬於一個 shard，總數直接相加。
+    """
+    rooms = sorted((room for payload in payloads for room in payload.get("rooms", [])),
+                   key=lambda room: (float(room["created_at"]), room["code"]))
+    merged = {"rooms": rooms, "total": sum(payload.get("total", 0) for payload in payloads)}
+    if limit is None:
+        return merged
+    # 被截掉的房間或任一 shard 還有下一頁時，以本頁最後一筆作為游標
+    has_more = len(rooms) > limit or any(payload.get("next_cursor") for payload in payloads)
+    merged["rooms"] = page = rooms[:limit]
+    merged["next_cursor"] = make_cursor(page[-1]["created_at"], page[-1]["code"]) if page and has_more else None
+    return merged
+
+
+def _limit_of(query_string: bytes) -> Optional[int]:
+    values = parse_qs(query_string.decode("latin-1")).get("limit")
+    try:
+        return int(values[0]) if values else None
+    except ValueError:
+        return None
+
+
+# 路徑 -> 合併各 shard 回應的函式（參數：回應列表、查詢字串）
+FANOUT_PATHS = {
+    "/api/rooms": lambda payloads, query_string: merge_room_pages(payloads, _limit_of(query_string)),
+}
+
+
+class RebalanceError(Exception):
+    """搬移房間失敗，雜湊環維持不變"""
+
+
+class Dispatcher:
+    """依房間代碼轉送請求的 ASGI 應用"""
+
+    def __init__(self, shards: List[str], secret: Optional[str] = None):
+        self._set_ring(shards)
+        self._internal_headers = {SHARD_SECRET_HEADER: secret} if secret else {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._rebalance_lock: Optional[asyncio.Lock] = None
+
+    def _set_ring(self, shards: List[str]):
+        self.ring = HashRing(shards)
+        self._round_robin = itertools.cycle(self.ring.shards)
+
+    def shard_for(self, room: Optional[str]) -> str:
+        if room is None:
+            return next(self._round_robin)
+        return self.ring.owner(room)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await self._websocket(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                limits = httpx.Limits(max_connections=1000, max_keepalive_connections=200)
+                self._client = httpx.AsyncClient(timeout=None, limits=limits)
+                self._rebalance_lock = asyncio.Lock()
+                print(f"🔀 分派器已啟動，shards: {self.ring.shards}")
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self._client.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # --- HTTP ---
+    async def _read_body(self, receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+    async def _http(self, scope, receive, send):
+        body = await self._read_body(receive)
+        path = scope["path"]
+        method = scope["method"]
+
+        if path == ADMIN_PATH:
+            await self._admin(method, body, send)
+            return
+        if path.startswith(INTERNAL_PREFIX):
+            await self._send_json(send, 404, {"detail": "Not Found"})
+            return
+        if method == "GET" and path in FANOUT_PATHS:
+            await self._fanout(scope, send)
+            return
+        if method == "GET" and path in STREAM_FANOUT_PATHS and room_for_request(path, scope["query_string"], b"") is None:
+            await self._fanout_stream(scope, send)
+            return
+        if method == "POST" and path in SPLIT_PATHS and len(self.ring) > 1:
+            await self._split(scope, body, SPLIT_PATHS[path], send)
+            return
+
+        shard = self.shard_for(room_for_request(path, scope["query_string"], body))
+        headers = [(k, v) for k, v in scope["headers"] if k.decode("latin-1").lower() not in HOP_BY_HOP]
+        request = self._client.build_request(
+            method, shard + scope["raw_path"].decode("latin-1"),
+            params=scope["query_string"].decode("latin-1") or None,
+            headers=headers, content=body,
+        )
+        try:
+            response = await self._client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            await self._send_json(send, 502, {"detail": f"Shard unavailable: {shard} ({e})"})
+            return
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [(k, v) for k, v in response.headers.raw if k.decode("latin-1").lower() not in HOP_BY_HOP],
+            })
+            # 逐段轉送，SSE 事件不會被緩衝
+            async for chunk in response.aiter_raw():
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            await response.aclose()
+
+    async def _fanout(self, scope, send):
+        url_path = scope["raw_path"].decode("latin-1")
+        params = scope["query_string"].decode("latin-1") or None
+        responses = await asyncio.gather(
+            *(self._client.get(shard + url_path, params=params) for shard in self.ring.shards),
+            return_exceptions=True,
+        )
+        for response in responses:
+            # 查詢參數不正確（例如游標格式）時每個 shard 都會拒絕，原樣回傳
+            if isinstance(response, httpx.Response) and 400 <= response.status_code < 500:
+                await self._send_json(send, response.status_code, response.json())
+                return
+        payloads = [r.json() for r in responses if isinstance(r, httpx.Response) and r.status_code == 200]
+        await self._send_json(send, 200, FANOUT_PATHS[scope["path"]](payloads, scope["query_string"]))
+
+    async def _fanout_stream(self, scope, send):
+        """依序轉送每個 shard 的串流內容（NDJSON / msgpack 紀錄可直接串接）"""
+        url_path = scope["raw_path"].decode("latin-1")
+        params = scope["query_string"].decode("latin-1") or None
+        started = False
+        for shard in self.ring.shards:
+            request = self._client.build_request("GET", shard + url_path, params=params)
+            response = await self._client.send(request, stream=True)
+            try:
+                if not started:
+                    if response.status_code != 200:
+                        await send({"type": "http.response.start", "status": response.status_code,
+                                    "headers": [(b"content-type", response.headers.get("content-type", "").encode())]})
+                        await send({"type": "http.response.body", "body": await response.aread()})
+                        return
+                    await send({"type": "http.response.start", "status": 200,
+                                "headers": [(b"content-type", response.headers.get("content-type", "").encode())]})
+                    started = True
+                async for chunk in response.aiter_bytes():
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            finally:
+                await response.aclose()
+        if not started:
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def _split(self, scope, body: bytes, field: str, send):
+        """把批次內容依房間分到各 shard，並行送出後合併回應"""
+        try:
+            payload = json.loads(body)
+            items = payload[field]
+        except (ValueError, KeyError, TypeError):
+            await self._send_json(send, 400, {"detail": f"Body must contain a {field} list"})
+            return
+        groups: Dict[str, list] = {}
+        for item in items:
+            room = item.get("room") if isinstance(item, dict) else None
+            groups.setdefault(self.shard_for(room), []).append(item)
+        url_path = scope["raw_path"].decode("latin-1")
+        responses = await asyncio.gather(
+            *(self._client.post(shard + url_path, json=dict(payload, **{field: group}))
+              for shard, group in groups.items()),
+            return_exceptions=True,
+        )
+        payloads = [r.json() for r in responses if isinstance(r, httpx.Response) and r.status_code == 200]
+        if len(payloads) != len(groups):
+            await self._send_json(send, 502, {"detail": "Some shards failed", **merge_responses(payloads)})
+            return
+        await self._send_json(send, 200, merge_responses(payloads))
+
+    @staticmethod
+    async def _send_json(send, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    # --- WebSocket ---
+    async def _websocket(self, scope, receive, send):
+        message = await receive()
+        if message["type"] != "websocket.connect":
+            return
+        shard = self.shard_for(room_for_request(scope["path"], scope["query_string"], b""))
+        url = re.sub(r"^http", "ws", shard) + scope["raw_path"].decode("latin-1")
+        if scope["query_string"]:
+            url += "?" + scope["query_string"].decode("latin-1")
+        try:
+            upstream = await websockets.connect(url)
+        except Exception:
+            await send({"type": "websocket.close", "code": 1011})
+            return
+        await send({"type": "websocket.accept"})
+
+        async def client_to_shard():
+            while True:
+                message = await receive()
+                if message["type"] == "websocket.disconnect":
+                    await upstream.close()
+                    return
+                await upstream.send(message["text"] if message.get("text") is not None else message["bytes"])
+
+        async def shard_to_client():
+            try:
+                async for data in upstream:
+                    if isinstance(data, str):
+                        await send({"type": "websocket.send", "text": data})
+                    else:
+                        await send({"type": "websocket.send", "bytes": data})
+            finally:
+                # shard 關閉連線時（例如房間已搬移）一併關閉用戶端，讓它重新連線
+                code = upstream.close_code or 1000
+                await send({"type": "websocket.close", "code": code})
+
+        tasks = [asyncio.create_task(client_to_shard()), asyncio.create_task(shard_to_client())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await upstream.close()
+
+    # --- 重新平衡 ---
+    async def _admin(self, method: str, body: bytes, send):
+        if method == "GET":
+            await self._send_json(send, 200, {"shards": self.ring.shards})
+            return
+        if method != "PUT":
+            await self._send_json(send, 405, {"detail": "Method not allowed"})
+            return
+        try:
+            shards = json.loads(body)["shards"]
+        except (ValueError, KeyError, TypeError):
+            await self._send_json(send, 400, {"detail": "Body must be {\"shards\": [...]}"})
+            return
+        async with self._rebalance_lock:
+            try:
+                moved = await self.rebalance(shards)
+            except (RebalanceError, httpx.HTTPError) as e:
+                await self._send_json(send, 502, {"detail": f"Rebalance failed: {e}", "shards": self.ring.shards})
+                return
+        await self._send_json(send, 200, {"shards": self.ring.shards, "moved": moved})
+
+    async def _internal(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """呼叫 shard 的內部端點（帶上共用密鑰）"""
+        return await self._client.request(method, url, headers=self._internal_headers, **kwargs)
+
+    async def rebalance(self, shards: List[str]) -> Dict[str, int]:
+        """
+        套用新的 shard 列表並搬移歸屬改變的房間。
+
+        Returns:
+            {目標 shard: 搬入的房間數}
+
+        Raises:
+            RebalanceError: 有房間匯出或匯入失敗；已匯入的複本已移除，雜湊環不變
+        """
+        old_shards = self.ring.shards
+        new_ring = HashRing(shards)
+        moves: List[Tuple[str, str, str]] = []
+        for shard in old_shards:
+            response = await self._internal("GET", f"{shard}/internal/shard")
+            if response.status_code != 200:
+                raise RebalanceError(f"無法取得 {shard} 的房間列表（HTTP {response.status_code}）")
+            for code in response.json()["rooms"]:
+                target = new_ring.owner(code)
+                if target != shard:
+                    moves.append((code, shard, target))
+
+        # 先把房間複製到新 shard；此時仍由舊 shard 負責這些房間
+        copied: List[Tuple[str, str, str]] = []
+        try:
+            for code, source, target in moves:
+                exported = await self._internal("GET", f"{source}/internal/shard/rooms/{code}/export")
+                if exported.status_code == 404:
+                    # 列出之後才被刪除的房間
+                    continue
+                if exported.status_code != 200:
+                    raise RebalanceError(f"自 {source} 匯出房間 {code} 失敗（HTTP {exported.status_code}）")
+                imported = await self._internal("POST", f"{target}/internal/shard/rooms/import",
+                                                content=exported.content)
+                if not 200 <= imported.status_code < 300:
+                    raise RebalanceError(f"匯入房間 {code} 到 {target} 失敗（HTTP {imported.status_code}）")
+                copied.append((code, source, target))
+        except (RebalanceError, httpx.HTTPError):
+            for code, _, target in copied:
+                try:
+                    await self._internal("DELETE", f"{target}/internal/shard/rooms/{code}")
+                except httpx.HTTPError as e:
+                    print(f"⚠️ 無法自 {target} 移除房間 {code} 的複本: {e}")
+            raise
+
+        # 所有房間都已複製，通知各 shard 並切換轉送目標
+        for shard in dict.fromkeys(new_ring.shards + old_shards):
+            await self._internal("PUT", f"{shard}/internal/shard/ring", json={"shards": new_ring.shards})
+        self._set_ring(new_ring.shards)
+
+        moved: Dict[str, int] = {}
+        for code, source, target in copied:
+            try:
+                await self._internal("DELETE", f"{source}/internal/shard/rooms/{code}")
+            except httpx.HTTPError as e:
+                print(f"⚠️ 無法自 {source} 移除已搬移的房間 {code}: {e}")
+            moved[target] = moved.get(target, 0) + 1
+        print(f"🔀 重新平衡完成，shards: {new_ring.shards}，搬移: {moved}")
+        return moved
+
+
+app = Dispatcher([s.strip() for s in os.getenv("SYNCAI_SHARDS", "").split(",") if s.strip()],
+                 os.getenv("SYNCAI_SHARD_SECRET") or None)
@@ -7,8 +7,10 @@ from backend.api import network_api
 from backend.api import mindmap_api as mindmap_api
 import asyncio
 import logging
+import time
 from backend.api import mindmap_api
 from backend.api import hostStyle_api
+from backend.api import sharding_api
 
 app = FastAPI(title="MBBuddy API")
 
@@ -22,6 +24,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],  # 讓前端讀取輪詢端點的 ETag
 )
 
 app.include_router(participants_api.router)
@@ -29,11 +32,34 @@ app.include_router(ai_api.router)
 app.include_router(network_api.router)
 app.include_router(mindmap_api.router)
 app.include_router(hostStyle_api.router)
+# 搬移房間的內部端點只在分片模式下掛載（並需要共用密鑰，見 sharding_api）
+if sharding_api.shard_config.enabled:
+    app.include_router(sharding_api.router)
 
 @app.on_event("startup")
 async def startup_event():
-    """應用啟動時預載入AI模型"""
+    """應用啟動時載入討論室資料並預載入AI模型"""
     logger.info("🚀 SyncAI 後端服務啟動中...")
+
+    # 依 SYNCAI_STORAGE 選擇討論室儲存後端並載入已保存的資料
+    try:
+        from backend.api.room_store import room_store
+        from backend.api.storage import create_backend_from_env
+        backend = create_backend_from_env()
+        started = time.perf_counter()
+        loaded = room_store.attach_backend(backend)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"💾 討論室儲存後端: {backend.name}，已載入 {loaded} 個討論室（耗時 {elapsed_ms:.1f} ms）")
+    except Exception as e:
+        logger.error(f"❌ 載入討論室資料時發生錯誤: {e}")
+
+    # 已結束或閒置過久的房間定期移到壓縮封存檔
+    try:
+        from backend.api.room_lifecycle import room_lifecycle
+        room_lifecycle.start()
+        logger.info(f"🗄️ 房間封存目錄: {room_lifecycle.directory}")
+    except Exception as e:
+        logger.error(f"❌ 啟動房間生命週期管理時發生錯誤: {e}")
     
     # 預載入 CPU LLM 模型
     try:
@@ -83,6 +109,13 @@ async def startup_event():
 async def shutdown_event():
     """應用關閉時清理資源"""
     logger.info("🛑 SyncAI 後端服務正在關閉...")
+
+    # 確保尚未寫入的討論室變更都已保存
+    try:
+        from backend.api.room_store import room_store
+        room_store.backend.close()
+    except Exception as e:
+        logger.error(f"❌ 關閉討論室儲存後端時發生錯誤: {e}")
     
     try:
         from backend.api.local_llm_client import local_llm_client
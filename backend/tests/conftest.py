@@ -0,0 +1,48 @@
+"""
+後端測試共用的 fixture
+API 測試直接掛載 participants_api 的 router（不經過 main.py 的 AI / 背景服務啟動流程），
+所有測試共用模組層級的 room_store，因此每個測試都建立自己的房間。
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api import participants_api
+from backend.api.ai_client import ai_client
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def no_workspace(*args, **kwargs):
+        raise RuntimeError("測試環境不連線 AnythingLLM")
+
+    monkeypatch.setattr(ai_client, "ensure_workspace_exists", no_workspace)
+    app = FastAPI()
+    app.include_router(participants_api.router)
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def make_room(client):
+    """建立房間並回傳房間代碼；topics 為主題名稱列表，第一個為當前主題"""
+
+    def make(topics=("主題一",)):
+        response = client.post("/api/create_room", json={"title": "測試", "topics": list(topics), "topic_count": len(topics)})
+        assert response.status_code == 200
+        return response.json()["code"]
+
+    return make
+
+
+@pytest.fixture
+def post_comment(client):
+    """在房間的當前主題新增留言並回傳留言 ID"""
+
+    def post(room, content, nickname="測試者"):
+        response = client.post(f"/api/rooms/{room}/comments", json={"nickname": nickname, "content": content})
+        assert response.status_code == 200
+        return response.json()["comment_id"]
+
+    return post
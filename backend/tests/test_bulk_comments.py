@@ -0,0 +1,94 @@
+"""批次匯入與批次刪除留言"""
+
+import sqlite3
+
+from backend.api.room_store import room_store
+from backend.api.storage import SQLiteBackend
+
+
+def test_import_from_another_room_does_not_share_state(client, make_room, post_comment, monkeypatch, tmp_path):
+    path = tmp_path / "syncai.db"
+    backend = SQLiteBackend(str(path), flush_interval=0)
+    monkeypatch.setattr(room_store, "backend", backend)
+
+    source = make_room()
+    target = make_room()
+    source_id = post_comment(source, "來源留言")
+    client.post(f"/api/rooms/{source}/comments/{source_id}/vote", json={"device_id": "d1", "vote_type": "good"})
+    exported = client.get(f"/api/rooms/{source}/comments").json()["comments"]
+
+    response = client.post(f"/api/rooms/{target}/comments:import", json={"comments": exported + exported})
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["imported"]) == 1 and body["skipped"] == [source_id]
+    copy_id = body["imported"][0]
+    assert copy_id != source_id
+    copy = client.get(f"/api/rooms/{target}/comments").json()["comments"][0]
+    assert (copy["content"], copy["vote_good"]) == ("來源留言", 0)
+
+    deleted = client.post(f"/api/rooms/{target}/comments:delete", json={"comment_ids": [copy_id]}).json()
+    assert deleted["deleted"] == [copy_id] and deleted["votes_deleted"] == 0
+
+    # 來源房間的留言、票數與資料列都不受影響
+    comment = client.get(f"/api/rooms/{source}/comments").json()["comments"][0]
+    assert (comment["id"], comment["vote_good"]) == (source_id, 1)
+    backend.flush()
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute("SELECT room FROM comments WHERE id = ?", (source_id,)).fetchall()
+        votes = conn.execute("SELECT room FROM votes WHERE comment_id = ?", (source_id,)).fetchall()
+    assert rows == [(source,)] and votes == [(source,)]
+    backend.close()
+
+
+def test_import_skips_ids_already_in_room(client, make_room, post_comment):
+    room = make_room()
+    existing = post_comment(room, "已存在")
+    response = client.post(f"/api/rooms/{room}/comments:import", json={"comments": [
+        {"id": existing, "nickname": "n", "content": "已存在"},
+        {"nickname": "n", "content": "新留言"},
+    ]})
+    body = response.json()
+    assert body["skipped"] == [existing] and len(body["imported"]) == 1
+
+
+def test_importing_the_same_export_twice_adds_nothing(client, make_room, post_comment):
+    source = make_room()
+    target = make_room()
+    post_comment(source, "一")
+    post_comment(source, "二")
+    exported = client.get(f"/api/rooms/{source}/comments").json()["comments"]
+
+    first = client.post(f"/api/rooms/{target}/comments:import", json={"comments": exported}).json()
+    assert len(first["imported"]) == 2 and first["skipped"] == []
+
+    second = client.post(f"/api/rooms/{target}/comments:import", json={"comments": exported}).json()
+    assert second["imported"] == [] and second["skipped"] == [c["id"] for c in exported]
+    comments = client.get(f"/api/rooms/{target}/comments").json()["comments"]
+    assert [c["content"] for c in comments] == ["一", "二"]
+
+    # 匯入另一個房間時得到不同的 ID
+    other = client.post(f"/api/rooms/{make_room()}/comments:import", json={"comments": exported}).json()
+    assert set(other["imported"]).isdisjoint(first["imported"])
+
+
+def test_bulk_delete_counts_each_removed_vote_once(client, make_room, post_comment):
+    room = make_room()
+    other = make_room()
+    first = post_comment(room, "一")
+    second = post_comment(room, "二")
+    elsewhere = post_comment(other, "其他房間")
+    for comment_room, comment_id in ((room, first), (room, second), (other, elsewhere)):
+        for device_id in ("d1", "d2"):
+            client.post(f"/api/rooms/{comment_room}/comments/{comment_id}/vote",
+                        json={"device_id": device_id, "vote_type": "good"})
+
+    response = client.post(f"/api/rooms/{room}/comments:delete",
+                           json={"comment_ids": [first, first, elsewhere, "missing"]})
+    body = response.json()
+    assert body["deleted"] == [first]
+    assert body["votes_deleted"] == 2
+    assert body["not_found"] == [elsewhere, "missing"]
+    # 其他房間的留言與票數不受影響
+    comment = client.get(f"/api/rooms/{other}/comments").json()["comments"][0]
+    assert (comment["id"], comment["vote_good"]) == (elsewhere, 2)
+    assert [c["id"] for c in client.get(f"/api/rooms/{room}/comments").json()["comments"]] == [second]
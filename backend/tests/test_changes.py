@@ -0,0 +1,69 @@
+"""增量同步：房間變更紀錄與 /changes 端點"""
+
+from backend.api.room_store import RoomStore
+
+
+def make_store():
+    store = RoomStore()
+    store.create_room("R", {"code": "R", "created_at": 1.0, "status": "Stop"})
+    store.ensure_topic("R", "t")
+    return store
+
+
+def test_changes_since_returns_changes_after_cursor():
+    store = make_store()
+    v1 = store.bump_version("R", ("added", "a"))
+    store.bump_version("R", ("votes", "a"), ("added", "b"))
+    assert store.changes_since("R", v1) == [("votes", "a"), ("added", "b")]
+    assert store.changes_since("R", store.room_version("R")) == []
+
+
+def test_changes_since_rejects_future_and_expired_cursors():
+    store = make_store()
+    store.bump_version("R", ("added", "a"))
+    assert store.changes_since("R", store.room_version("R") + 1) is None
+
+    state = store._state("R")
+    for i in range(state.changes.maxlen + 5):
+        store.bump_version("R", ("votes", str(i)))
+    assert store.changes_since("R", 1) is None
+
+
+def test_restore_version_clears_log():
+    store = make_store()
+    store.bump_version("R", ("added", "a"))
+    store.restore_version("R", 10)
+    assert store.room_version("R") == 11
+    assert store.changes_since("R", 10) is None
+    assert store.changes_since("R", 11) == []
+
+
+def test_changes_endpoint_skips_comments_added_and_removed_after_cursor(client, make_room, post_comment):
+    room = make_room()
+    kept = post_comment(room, "保留")
+    since = client.get(f"/api/rooms/{room}/state").json()["version"]
+
+    added = post_comment(room, "新增")
+    transient = post_comment(room, "稍後刪除")
+    assert client.delete(f"/api/rooms/{room}/comments/{transient}").status_code == 200
+    assert client.post(f"/api/rooms/{room}/comments/{kept}/vote",
+                       json={"device_id": "d1", "vote_type": "good"}).status_code == 200
+
+    delta = client.get(f"/api/rooms/{room}/changes", params={"since": since}).json()
+    assert delta["full"] is False
+    assert [comment["id"] for comment in delta["added"]] == [added]
+    assert delta["removed"] == []
+    assert delta["votes"] == [{"comment_id": kept, "vote_good": 1, "vote_bad": 0, "votes": 1}]
+
+    caught_up = client.get(f"/api/rooms/{room}/changes", params={"since": delta["version"]}).json()
+    assert caught_up["added"] == caught_up["removed"] == caught_up["votes"] == []
+
+
+def test_changes_endpoint_falls_back_to_full_snapshot_on_topic_switch(client, make_room):
+    room = make_room(["一", "二"])
+    since = client.get(f"/api/rooms/{room}/state").json()["version"]
+    assert client.put(f"/api/rooms/{room}/topic", json={"topic": "二"}).status_code == 200
+
+    delta = client.get(f"/api/rooms/{room}/changes", params={"since": since}).json()
+    assert delta["full"] is True
+    assert delta["topic"] == "二"
@@ -0,0 +1,143 @@
+"""讀取端點與 threadpool 中的批次寫入同時進行"""
+
+import asyncio
+import sys
+import threading
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+
+from backend.api import participants_api
+from backend.api.records import CommentRecord
+from backend.api.room_actor import room_actors
+from backend.api.room_lifecycle import room_lifecycle
+from backend.api.room_store import RoomStore, room_store
+
+
+@pytest.fixture
+def app(client):
+    app = FastAPI()
+    app.include_router(participants_api.router)
+    return app
+
+
+@pytest.fixture
+def frequent_switches():
+    # 讓 threadpool 中的寫入與事件迴圈上的讀取頻繁交錯
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_reads_during_bulk_writes_never_fail(app, make_room, post_comment, frequent_switches,
+                                            monkeypatch, tmp_path):
+    monkeypatch.setattr(room_lifecycle, "directory", str(tmp_path))
+    room = make_room()
+    for i in range(50):
+        post_comment(room, f"留言 {i}")
+
+    async def scenario():
+        statuses = []
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def writer():
+                for round_ in range(15):
+                    response = await client.post(f"/api/rooms/{room}/comments:import", json={"comments": [
+                        {"nickname": "n", "content": f"匯入 {round_}-{i}"} for i in range(200)]})
+                    statuses.append(response.status_code)
+                    imported = response.json()["imported"]
+                    response = await client.post(f"/api/rooms/{room}/comments:delete",
+                                                 json={"comment_ids": imported[::2]})
+                    statuses.append(response.status_code)
+                    # 與背景清掃相同，在 threadpool 中於 actor 內封存；下一個請求會載回
+                    await run_in_threadpool(room_actors.run, room, lambda: room_lifecycle.archive(room))
+
+            async def reader(path, params):
+                # 每次換一個筆數，避開回應快取，每個請求都實際讀取索引
+                for n in range(1, 61):
+                    response = await client.get(path, params={key: n if value is None else value
+                                                              for key, value in params.items()})
+                    statuses.append(response.status_code)
+                    await asyncio.sleep(0)
+
+            await asyncio.gather(
+                writer(),
+                reader(f"/api/rooms/{room}/topics/主題一/top", {"k": None}),
+                reader(f"/api/rooms/{room}/comments", {"order": "score", "limit": None}),
+                reader(f"/api/rooms/{room}/comments", {"order": "time", "limit": None}),
+                reader(f"/api/rooms/{room}/changes", {"since": None}),
+                reader(f"/api/rooms/{room}/state", {"order": "score", "limit": None}),
+            )
+        return statuses
+
+    statuses = asyncio.run(scenario())
+    assert set(statuses) == {200}
+
+
+@pytest.mark.parametrize("path", ["/topics/主題一/top", "/comments?order=score&limit=5", "/changes?since=1",
+                                  "/state", "/votes?device_id=d1"])
+def test_reads_wait_for_the_room_actor(app, make_room, post_comment, path):
+    room = make_room()
+    post_comment(room, "留言")
+    entered, release = threading.Event(), threading.Event()
+
+    def hold_actor():
+        entered.set()
+        release.wait(5)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            writer = asyncio.ensure_future(run_in_threadpool(room_actors.run, room, hold_actor))
+            await run_in_threadpool(entered.wait, 5)
+            read = asyncio.ensure_future(client.get(f"/api/rooms/{room}{path}"))
+            await asyncio.sleep(0.1)
+            # 其他執行緒正在修改房間時，讀取等到修改完成才執行
+            waited = not read.done()
+            release.set()
+            await writer
+            return waited, (await read).status_code
+
+    assert asyncio.run(scenario()) == (True, 200)
+
+
+def test_snapshot_is_unaffected_by_later_writes():
+    store = RoomStore()
+    store.create_room("R", {"code": "R", "created_at": 1.0, "status": "Stop", "participants_list": ["a"]})
+    for i in range(3):
+        store.add_comment("R", "t", CommentRecord(f"c{i}", "n", str(i), float(i), device_id="d"))
+    store.cast_vote("R", "c2", "v1", "good")
+
+    snapshot = store.snapshot("R")
+    store.cast_vote("R", "c0", "v1", "good")
+    store.cast_vote("R", "c0", "v2", "good")
+    store.delete_comments("R", ["c1"])
+    store.rename_device_comments("R", "d", "新暱稱")
+    store.rooms["R"]["participants_list"].append("b")
+
+    assert [comment.id for comment in snapshot.topics[0]["comments"]] == ["c0", "c1", "c2"]
+    assert [comment.id for comment in snapshot.top_comments("R", "t")] == ["c2", "c0", "c1"]
+    assert [comment.id for comment in snapshot.top_comments("R", "t", 1)] == ["c2"]
+    assert snapshot.vote_counts("c0") == (0, 0) and snapshot.vote_counts("c2") == (1, 0)
+    assert {comment.nickname for comment in snapshot.topics[0]["comments"]} == {"n"}
+    assert snapshot.room["participants_list"] == ["a"]
+    assert store.snapshot("missing") is None
+
+
+def test_nested_run_for_another_room_keeps_the_outer_batch(make_room):
+    outer, inner = make_room(), make_room()
+    versions = {room: room_store.room_version(room) for room in (outer, inner)}
+
+    def command():
+        room_actors.publish(outer, "status", {"status": "Discussion"}, ("state",))
+        room_actors.run(inner, lambda: room_actors.publish(inner, "status", {"status": "End"}, ("state",)))
+        # 巢狀命令結束後仍在外層房間的批次中，推播延到整批結束
+        room_actors.publish(outer, "status", {"status": "End"}, ("state",))
+        return room_store.room_version(outer)
+
+    assert room_actors.run(outer, command) == versions[outer]
+    assert room_store.room_version(outer) == versions[outer] + 1
+    assert room_store.room_version(inner) == versions[inner] + 1
@@ -0,0 +1,112 @@
+"""房間目錄分頁與分派器合併多個 shard 的房間列表"""
+
+import asyncio
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+import pytest
+
+from backend.api.room_directory import RoomDirectory
+from backend.dispatcher import Dispatcher, merge_room_pages
+
+
+def make_directory(rooms):
+    directory = RoomDirectory()
+    for code, created_at, status in rooms:
+        directory.add(code, created_at, status)
+    return directory
+
+
+def walk(directory, limit, **filters):
+    codes, cursor = [], None
+    while True:
+        page, total, cursor = directory.page(after=cursor, limit=limit, **filters)
+        codes += page
+        if cursor is None:
+            return codes, total
+
+
+def test_page_filters_and_cursor():
+    directory = make_directory([("E", 5.0, "End"), ("A", 1.0, "Stop"), ("C", 3.0, "Stop"),
+                                ("B", 3.0, "Discussion"), ("D", 4.0, "Stop")])
+    assert walk(directory, 2) == (["A", "B", "C", "D", "E"], 5)
+    assert walk(directory, 1, status="Stop") == (["A", "C", "D"], 3)
+    assert walk(directory, 2, created_after=1.0, created_before=5.0) == (["B", "C", "D"], 3)
+    assert directory.page(limit=5) == (["A", "B", "C", "D", "E"], 5, None)
+    assert directory.page(status="Missing") == ([], 0, None)
+
+
+def test_status_change_and_remove_update_pages():
+    directory = make_directory([("A", 1.0, "Stop"), ("B", 2.0, "Stop")])
+    directory.set_status("A", "End")
+    assert walk(directory, 1, status="Stop") == (["B"], 1)
+    assert walk(directory, 1, status="End") == (["A"], 1)
+    directory.remove("B")
+    assert walk(directory, 1) == (["A"], 1)
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        RoomDirectory().page(after="not-a-cursor")
+
+
+SHARDS = {
+    "http://s1": make_directory([("A", 1.0, "Stop"), ("C", 3.0, "End"), ("E", 5.0, "Stop"), ("G", 7.0, "Stop")]),
+    "http://s2": make_directory([("B", 2.0, "Stop"), ("D", 4.0, "Stop"), ("F", 6.0, "End")]),
+}
+
+
+def shard_handler(request: httpx.Request) -> httpx.Response:
+    """以 RoomDirectory 模擬各 shard 的 GET /api/rooms"""
+    query = {key: values[0] for key, values in parse_qs(urlsplit(str(request.url)).query).items()}
+    limit = int(query["limit"]) if "limit" in query else None
+    try:
+        codes, total, next_cursor = SHARDS[f"http://{request.url.host}"].page(
+            query.get("status"), after=query.get("after"), limit=limit)
+    except ValueError:
+        return httpx.Response(400, json={"detail": "Invalid cursor"})
+    rooms = [{"code": code, "created_at": float(ord(code) - ord("A") + 1)} for code in codes]
+    result = {"rooms": rooms, "total": total}
+    if limit is not None:
+        result["next_cursor"] = next_cursor
+    return httpx.Response(200, json=result)
+
+
+def dispatch_get(params):
+    async def run():
+        dispatcher = Dispatcher(list(SHARDS))
+        async with httpx.AsyncClient(transport=httpx.MockTransport(shard_handler)) as shard_client:
+            dispatcher._client = shard_client
+            transport = httpx.ASGITransport(app=dispatcher)
+            async with httpx.AsyncClient(transport=transport, base_url="http://dispatcher") as client:
+                return await client.get("/api/rooms", params=params)
+    return asyncio.run(run())
+
+
+def test_dispatcher_pages_across_shards():
+    codes, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"after": cursor} if cursor else {})}
+        body = dispatch_get(params).json()
+        assert body["total"] == 7
+        assert len(body["rooms"]) <= 2
+        codes += [room["code"] for room in body["rooms"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert codes == ["A", "B", "C", "D", "E", "F", "G"]
+
+
+def test_dispatcher_forwards_filters_and_errors():
+    body = dispatch_get({"status": "Stop", "limit": 3}).json()
+    assert [room["code"] for room in body["rooms"]] == ["A", "B", "D"]
+    assert body["total"] == 5
+    assert dispatch_get({"after": "bad", "limit": 2}).status_code == 400
+    assert [room["code"] for room in dispatch_get({}).json()["rooms"]] == list("ABCDEFG")
+
+
+def test_merge_room_pages_without_limit_keeps_everything():
+    payloads = [{"rooms": [{"code": "B", "created_at": 2}], "total": 1},
+                {"rooms": [{"code": "A", "created_at": 2}], "total": 1}]
+    assert merge_room_pages(payloads, None) == {
+        "rooms": [{"code": "A", "created_at": 2}, {"code": "B", "created_at": 2}], "total": 2}
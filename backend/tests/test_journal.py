@@ -0,0 +1,129 @@
+"""二進位日誌：重播的冪等性、留言序號、快照一致性與不完整尾端紀錄"""
+
+import os
+import threading
+
+from backend.api.journal import JournalBackend, apply_record, dump_store, iter_records, read_records
+from backend.api.records import CommentRecord
+from backend.api.room_actor import room_actors
+from backend.api.room_store import RoomStore
+
+
+def populate(store):
+    store.create_room("R", {"code": "R", "created_at": 1.0, "status": "Stop"})
+    store.ensure_topic("R", "t")
+    for i in range(5):
+        store.add_comment("R", "t", CommentRecord(f"c{i}", "n", str(i), float(i), device_id="d1"))
+    store.cast_vote("R", "c1", "v1", "good")
+    store.cast_vote("R", "c1", "v1", "bad")
+    store.cast_vote("R", "c2", "v2", "good")
+    store.retract_vote("R", "c2", "v2", "good")
+    store.delete_comment("R", "c3")
+    store.rename_device_comments("R", "d1", "新暱稱")
+    store.rename_topic("R", "t", "u")
+
+
+def journal_bytes(directory):
+    data = b""
+    for name in sorted(os.listdir(directory)):
+        if name.startswith("journal-"):
+            with open(os.path.join(directory, name), "rb") as f:
+                data += f.read()
+    return data
+
+
+def write_journal(directory):
+    backend = JournalBackend(str(directory), snapshot_every=10 ** 9, snapshot_interval=10 ** 9)
+    store = RoomStore()
+    store.attach_backend(backend)
+    populate(store)
+    backend.flush()
+    return store, backend
+
+
+def test_replaying_twice_gives_the_same_state(tmp_path):
+    source, backend = write_journal(tmp_path)
+    data = journal_bytes(tmp_path)
+    backend._stop.set()
+
+    once = RoomStore()
+    for op, args in iter_records(data):
+        apply_record(once, op, args)
+    twice = RoomStore()
+    for _ in range(2):
+        for op, args in iter_records(data):
+            apply_record(twice, op, args)
+
+    assert dump_store(once) == dump_store(source)
+    assert dump_store(twice) == dump_store(source)
+    assert twice.vote_counts("c1") == (0, 1)
+    assert [c.nickname for c in twice.get_topic("R", "u")["comments"]] == ["新暱稱"] * 4
+
+
+def test_restart_replays_snapshot_and_overlapping_segment(tmp_path):
+    source, backend = write_journal(tmp_path)
+    backend.snapshot()
+    # 快照之後的段落重複寫入快照已涵蓋的紀錄
+    source.cast_vote("R", "c4", "v3", "good")
+    source.delete_comment("R", "c0")
+    backend.close()
+
+    restored = RoomStore()
+    restored.attach_backend(JournalBackend(str(tmp_path)))
+    assert dump_store(restored) == dump_store(source)
+    restored.backend.close()
+
+
+def test_truncated_tail_record_is_ignored(tmp_path):
+    _, backend = write_journal(tmp_path)
+    backend.close()
+    path = os.path.join(tmp_path, "partial.log")
+    data = journal_bytes(tmp_path)
+    with open(path, "wb") as f:
+        f.write(data + data[:7])
+    assert len(list(read_records(path))) == len(list(iter_records(data)))
+
+
+def test_restart_keeps_comment_seqs(tmp_path):
+    source, backend = write_journal(tmp_path)
+    backend.snapshot()
+    source.delete_comment("R", "c4")
+    backend.close()
+    before = [(c.id, c.seq) for c in source.get_topic("R", "u")["comments"]]
+    assert before == [("c0", 1), ("c1", 2), ("c2", 3)]
+
+    restored = RoomStore()
+    restored.attach_backend(JournalBackend(str(tmp_path)))
+    assert [(c.id, c.seq) for c in restored.get_topic("R", "u")["comments"]] == before
+    # 用戶端重新啟動前拿到的游標仍指向同一位置，新留言接在最大序號之後
+    page, _ = restored.comment_page("R", "u", "time", "2", 10)
+    assert [c.id for c in page] == ["c2"]
+    restored.add_comment("R", "u", CommentRecord("c9", "n", "new", 9.0))
+    assert restored.get_topic("R", "u")["comments"][-1].seq == 4
+    restored.backend.close()
+
+
+def test_snapshot_waits_for_the_room_actor():
+    store = RoomStore()
+    populate(store)
+    entered, release = threading.Event(), threading.Event()
+    result = {}
+
+    def hold_actor():
+        entered.set()
+        release.wait(5)
+        # 在 actor 中修改到一半的狀態不會出現在快照裡
+        store.add_comment("R", "u", CommentRecord("late", "n", "x", 9.0))
+
+    writer = threading.Thread(target=room_actors.run, args=("R", hold_actor))
+    writer.start()
+    entered.wait(5)
+    dumper = threading.Thread(target=lambda: result.setdefault("data", dump_store(store)))
+    dumper.start()
+    dumper.join(0.1)
+    assert dumper.is_alive()
+    release.set()
+    writer.join()
+    dumper.join()
+    comment_ids = [args[2]["id"] for op, args in iter_records(result["data"]) if args and op == 5]
+    assert comment_ids[-1] == "late"
@@ -0,0 +1,55 @@
+"""已封存房間在心跳與推播連線時自動載回；共用儲存後端時不封存"""
+
+from backend.api.room_lifecycle import RoomLifecycle, room_lifecycle
+from backend.api.room_store import room_store
+from backend.api.storage import MemoryBackend
+
+
+def test_batch_heartbeat_rehydrates_archived_room(client, make_room, post_comment, monkeypatch, tmp_path):
+    monkeypatch.setattr(room_lifecycle, "directory", str(tmp_path))
+    room = make_room()
+    post_comment(room, "封存前的留言")
+    assert room_lifecycle.archive(room)
+    assert not room_store.has_room(room)
+
+    response = client.post("/api/participants/heartbeat:batch", json={"heartbeats": [
+        {"room": room, "device_id": "d1"},
+        {"room": room, "device_id": "d2"},
+        {"room": "NOPE00", "device_id": "d3"},
+    ]})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["accepted"] == 2
+    assert body["missing_rooms"] == ["NOPE00"]
+    assert room_store.has_room(room)
+    comments = client.get(f"/api/rooms/{room}/comments").json()["comments"]
+    assert [c["content"] for c in comments] == ["封存前的留言"]
+
+
+def test_single_heartbeat_rehydrates_archived_room(client, make_room, monkeypatch, tmp_path):
+    monkeypatch.setattr(room_lifecycle, "directory", str(tmp_path))
+    room = make_room()
+    assert room_lifecycle.archive(room)
+    response = client.post("/api/participants/heartbeat", json={"room": room, "device_id": "d1"})
+    assert response.json() == {"success": True}
+    assert room_store.has_room(room)
+
+
+def test_websocket_rehydrates_archived_room(client, make_room, post_comment, monkeypatch, tmp_path):
+    monkeypatch.setattr(room_lifecycle, "directory", str(tmp_path))
+    room = make_room()
+    post_comment(room, "封存前的留言")
+    assert room_lifecycle.archive(room)
+
+    with client.websocket_connect(f"/ws/rooms/{room}") as websocket:
+        assert websocket.receive_json()["type"] == "snapshot"
+    assert room_store.has_room(room)
+
+
+def test_sweeper_is_disabled_with_shared_backend(monkeypatch, tmp_path):
+    shared = MemoryBackend()
+    shared.shared = True
+    monkeypatch.setattr(room_store, "backend", shared)
+    lifecycle = RoomLifecycle(str(tmp_path), end_ttl=1, idle_ttl=1)
+    lifecycle.start()
+    assert lifecycle._sweeper is None
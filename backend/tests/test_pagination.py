@@ -0,0 +1,84 @@
+"""留言分數索引與游標分頁"""
+
+from backend.api.records import CommentRecord
+from backend.api.room_store import RoomStore
+from backend.api.score_index import ScoreIndex
+
+
+def test_score_index_orders_by_score_then_seq():
+    index = ScoreIndex()
+    for seq, comment_id in enumerate("abcd", 1):
+        index.add(comment_id, seq)
+    index.update("c", 2)
+    index.update("b", -1)
+    index.update("d", 2)
+    assert index.top() == ["c", "d", "a", "b"]
+    assert index.top(2) == ["c", "d"]
+
+    index.update("c", 0)
+    assert index.top() == ["d", "a", "c", "b"]
+    index.remove("a")
+    index.remove_many(["b", "missing"])
+    assert index.top() == ["d", "c"]
+    assert len(index) == 2
+
+
+def test_score_index_page_walks_every_comment_once():
+    index = ScoreIndex()
+    for seq in range(1, 11):
+        index.add(f"c{seq}", seq, score=seq % 3)
+    seen = []
+    after = None
+    while True:
+        ids, after = index.page(after, 3)
+        seen.extend(ids)
+        if after is None:
+            break
+    assert seen == index.top()
+    assert len(seen) == 10
+
+
+def make_store(count):
+    store = RoomStore()
+    store.create_room("R", {"code": "R", "created_at": 1.0, "status": "Stop"})
+    for i in range(count):
+        store.add_comment("R", "t", CommentRecord(f"c{i}", "n", str(i), float(i)))
+    return store
+
+
+def collect(store, order, limit):
+    ids = []
+    after = None
+    while True:
+        page, after = store.comment_page("R", "t", order, after, limit)
+        ids.extend(comment.id for comment in page)
+        if after is None:
+            return ids
+
+
+def test_time_pages_survive_deletes_between_requests():
+    store = make_store(7)
+    first, cursor = store.comment_page("R", "t", "time", None, 3)
+    assert [c.id for c in first] == ["c0", "c1", "c2"]
+    store.delete_comment("R", "c1")
+    store.delete_comment("R", "c3")
+    rest, cursor = store.comment_page("R", "t", "time", cursor, 10)
+    assert [c.id for c in rest] == ["c4", "c5", "c6"]
+    assert cursor is None
+
+
+def test_score_pages_follow_votes():
+    store = make_store(6)
+    store.cast_vote("R", "c4", "d1", "good")
+    store.cast_vote("R", "c4", "d2", "good")
+    store.cast_vote("R", "c2", "d1", "good")
+    store.cast_vote("R", "c0", "d1", "bad")
+    assert collect(store, "score", 2) == ["c4", "c2", "c1", "c3", "c5", "c0"]
+    assert [c.id for c in store.top_comments("R", "t", 3)] == ["c4", "c2", "c1"]
+
+
+def test_invalid_cursor_is_rejected(client, make_room, post_comment):
+    room = make_room()
+    post_comment(room, "一")
+    response = client.get(f"/api/rooms/{room}/comments", params={"order": "score", "after": "x", "limit": 5})
+    assert response.status_code == 400
@@ -0,0 +1,111 @@
+"""在線狀態時間輪：以固定的時間點推進，檢查在線、保留、移除與重新排程"""
+
+import pytest
+
+from backend.api.presence import ONLINE_WINDOW, RETAIN_WINDOW, WHEEL_SIZE, PresenceTracker
+
+T0 = 1_000_000.0
+
+
+class Clock:
+    def __init__(self, now=T0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def rooms():
+    return {"R": {"participants_list": []}}
+
+
+@pytest.fixture
+def tracker(rooms):
+    return PresenceTracker(rooms, clock=Clock(), auto_sweep=False)
+
+
+def devices(rooms, room="R"):
+    return [p["device_id"] for p in rooms[room]["participants_list"]]
+
+
+def online(tracker, room="R"):
+    return [p["device_id"] for p in tracker.online(room)]
+
+
+def test_online_then_retained_then_dropped(tracker, rooms):
+    assert tracker.join("R", "d1", "小明", T0)
+    assert rooms["R"]["participants"] == 1
+
+    # 剛好 ONLINE_WINDOW 秒未活動仍算在線
+    assert tracker.advance(T0 + ONLINE_WINDOW) == []
+    assert online(tracker) == ["d1"]
+
+    assert tracker.advance(T0 + ONLINE_WINDOW + 1) == ["R"]
+    assert online(tracker) == []
+    assert rooms["R"]["participants"] == 0
+    assert devices(rooms) == ["d1"]
+
+    tracker.advance(T0 + RETAIN_WINDOW)
+    assert devices(rooms) == ["d1"]
+    tracker.advance(T0 + RETAIN_WINDOW + 1)
+    assert devices(rooms) == []
+
+
+def test_heartbeat_moves_device_to_a_later_slot(tracker, rooms):
+    tracker.join("R", "d1", "小明", T0)
+    tracker.join("R", "d2", "小華", T0)
+    assert not tracker.touch("R", "d1", T0 + 5)
+
+    # d1 原本的格子已過期：只有 d2 離線
+    assert tracker.advance(T0 + ONLINE_WINDOW + 1) == ["R"]
+    assert online(tracker) == ["d1"]
+    tracker.advance(T0 + 5 + ONLINE_WINDOW + 1)
+    assert online(tracker) == []
+
+    # 離線後再次心跳回到在線，並重新排入在線的到期格子
+    assert tracker.touch("R", "d1", T0 + 20)
+    assert rooms["R"]["participants"] == 1
+    tracker.advance(T0 + 20 + ONLINE_WINDOW)
+    assert online(tracker) == ["d1"]
+    tracker.advance(T0 + 20 + ONLINE_WINDOW + 1)
+    assert online(tracker) == []
+
+
+def test_wheel_wraps_beyond_its_size(tracker, rooms):
+    tracker.join("R", "d1", "小明", T0)
+    # 持續心跳跨越數圈時間輪，一直保持在線
+    for second in range(5, 3 * WHEEL_SIZE, 5):
+        tracker.touch("R", "d1", T0 + second)
+        assert tracker.advance(T0 + second) == []
+    assert online(tracker) == ["d1"]
+
+    # 停止心跳後，一次推進超過整個時間輪仍會依序離線並移除
+    last = T0 + 3 * WHEEL_SIZE - 5
+    assert tracker.advance(last + 2 * WHEEL_SIZE) == ["R"]
+    assert devices(rooms) == []
+
+
+def test_deadline_beyond_the_wheel_is_rescheduled(tracker, rooms):
+    # 時鐘誤差讓 last_seen 落在時間輪範圍之外：先排在最後一格，繞回時再排程
+    future = T0 + 2 * WHEEL_SIZE
+    tracker.join("R", "d1", "小明", future)
+    tracker.advance(T0 + WHEEL_SIZE)
+    assert online(tracker) == ["d1"]
+    tracker.advance(future + ONLINE_WINDOW)
+    assert online(tracker) == ["d1"]
+    assert tracker.advance(future + ONLINE_WINDOW + 1) == ["R"]
+    tracker.advance(future + RETAIN_WINDOW + 1)
+    assert devices(rooms) == []
+
+
+def test_drop_room_forgets_pending_deadlines(tracker, rooms):
+    tracker.join("R", "d1", "小明", T0)
+    rooms["S"] = {"participants_list": []}
+    tracker.join("S", "d2", "小華", T0)
+
+    tracker.drop_room("R")
+    del rooms["R"]
+    assert tracker.advance(T0 + ONLINE_WINDOW + 1) == ["S"]
+    assert tracker.online("R") == []
+    assert online(tracker, "S") == []
@@ -0,0 +1,37 @@
+"""回應快取：超過種類上限時淘汰最久未使用的一種"""
+
+from backend.api.response_cache import MAX_VARIANTS, ResponseCache
+
+
+def test_evicts_least_recently_used_variant():
+    cache = ResponseCache()
+    builds = []
+
+    def get(variant, stamp=1):
+        def build():
+            builds.append(variant)
+            return str(variant).encode()
+        return cache.get("R", variant, stamp, build)
+
+    for variant in range(MAX_VARIANTS):
+        get(variant)
+    get(0)  # 0 成為最近使用，最久未使用的是 1
+    get("new")
+    assert builds.count(0) == 1
+
+    builds.clear()
+    get(0)
+    for variant in range(2, MAX_VARIANTS):
+        get(variant)
+    get("new")
+    assert builds == []
+    get(1)
+    assert builds == [1]
+
+
+def test_stale_stamp_rebuilds_without_evicting_others():
+    cache = ResponseCache()
+    for variant in range(MAX_VARIANTS):
+        cache.get("R", variant, 1, lambda: b"v1")
+    assert cache.get("R", 0, 2, lambda: b"v2").identity == b"v2"
+    assert cache.get("R", MAX_VARIANTS - 1, 1, lambda: b"rebuilt").identity == b"v1"
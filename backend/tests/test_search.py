@@ -0,0 +1,83 @@
+"""全文檢索：斷詞、命中位置與倒排索引"""
+
+from backend.api.records import CommentRecord
+from backend.api.search_index import SearchIndex, highlight_spans, tokenize
+
+
+def test_tokenize_cjk_bigrams_and_unigrams():
+    assert tokenize("預算規劃") == ["預算", "算規", "規劃", "預", "算", "規", "劃"]
+    # 查詢時兩字以上只用兩字詞，單一字元時用單字
+    assert tokenize("預算規劃", query=True) == ["預算", "算規", "規劃"]
+    assert tokenize("預", query=True) == ["預"]
+
+
+def test_tokenize_normalizes_latin_text():
+    assert tokenize("Hello，ＡＢＣ123 straße_x") == ["hello", "abc123", "strasse", "x"]
+    assert tokenize("！？  ") == []
+    assert tokenize("會議 Meeting") == ["會議", "會", "議", "meeting"]
+
+
+def test_highlight_spans_merge_adjacent_terms():
+    assert highlight_spans("今年預算規劃很重要", ["預算", "算規", "規劃"]) == [(2, 6)]
+    assert highlight_spans("Hello hello", ["hello"]) == [(0, 5), (6, 11)]
+    assert highlight_spans("文字", []) == []
+
+
+def test_highlight_spans_map_normalized_matches_to_the_original_text():
+    # 全形與大小寫：比對正規化後的文字，位置仍是原文的位置
+    assert highlight_spans("ＡＢＣ123 test", tokenize("abc123", query=True)) == [(0, 6)]
+    # ß 正規化為 ss，整個 ß 都標示
+    assert highlight_spans("Straße 與 STRASSE", tokenize("strasse", query=True)) == [(0, 6), (9, 16)]
+    # 組合字元跟著前一個字元
+    assert highlight_spans("Cafe\u0301 ok", tokenize("café", query=True)) == [(0, 5)]
+
+
+def test_highlight_spans_match_whole_words_only():
+    assert highlight_spans("start art", ["art"]) == [(6, 9)]
+    assert highlight_spans("art_work 藝術art", ["art"]) == [(0, 3), (11, 14)]
+    # 中日韓文字沒有單字邊界
+    assert highlight_spans("藝術家", tokenize("藝術", query=True)) == [(0, 2)]
+
+
+def make_comment(comment_id, content, nickname="n"):
+    return CommentRecord(comment_id, nickname, content, 0.0)
+
+
+def test_search_ranks_requires_all_terms_and_tracks_updates():
+    index = SearchIndex()
+    budget = make_comment("c1", "明年預算規劃", "阿明")
+    other = make_comment("c2", "預算不足，規劃延後")
+    index.build([budget, other])
+
+    hits, total = index.search("預算規劃")
+    assert [comment_id for comment_id, _ in hits] == ["c1"] and total == 1
+    hits, total = index.search("預算")
+    assert {comment_id for comment_id, _ in hits} == {"c1", "c2"} and total == 2
+    assert index.search("不存在") == ([], 0)
+    assert index.search("阿明")[1] == 1
+
+    budget.nickname = "小華"
+    index.update(budget, "阿明")
+    assert index.search("阿明") == ([], 0)
+    assert [comment_id for comment_id, _ in index.search("小華")[0]] == ["c1"]
+
+    index.remove(other)
+    assert [comment_id for comment_id, _ in index.search("預算")[0]] == ["c1"]
+    assert len(index) == 1
+
+
+def test_unbuilt_index_ignores_updates():
+    index = SearchIndex()
+    index.add(make_comment("c1", "內容"))
+    assert len(index) == 0 and not index.built
+
+
+def test_search_endpoint(client, make_room, post_comment):
+    room = make_room()
+    comment_id = post_comment(room, "今年預算規劃", nickname="阿明")
+    post_comment(room, "午餐吃什麼")
+    body = client.get(f"/api/rooms/{room}/search", params={"q": "預算規劃"}).json()
+    assert body["total"] == 1
+    result = body["results"][0]
+    assert result["comment"]["id"] == comment_id
+    assert result["highlights"] == {"content": [[2, 6]], "nickname": []}
@@ -0,0 +1,157 @@
+"""一致性雜湊環的歸屬穩定性、分派器重新平衡與 shard 內部端點"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from backend.api import sharding_api
+from backend.api.room_store import room_store
+from backend.api.sharding import SHARD_SECRET_HEADER, HashRing, shard_config
+from backend.dispatcher import Dispatcher, RebalanceError
+
+CODES = [f"R{i:05d}" for i in range(2000)]
+SECRET = "shard-secret"
+
+
+def owners(ring):
+    return {code: ring.owner(code) for code in CODES}
+
+
+def test_ring_owner_does_not_depend_on_shard_order():
+    assert owners(HashRing(["a", "b", "c"])) == owners(HashRing(["c", "a", "b", "a"]))
+    assert HashRing([]).owner("R00001") is None
+
+
+def test_adding_a_shard_only_moves_rooms_to_it():
+    before = owners(HashRing(["a", "b", "c"]))
+    after = owners(HashRing(["a", "b", "c", "d"]))
+    moved = [code for code in CODES if before[code] != after[code]]
+    assert all(after[code] == "d" for code in moved)
+    # 理想為 1/4，虛擬節點讓實際比例落在附近
+    assert 0.15 < len(moved) / len(CODES) < 0.35
+
+
+def test_removing_a_shard_only_moves_its_rooms():
+    before = owners(HashRing(["a", "b", "c", "d"]))
+    after = owners(HashRing(["a", "b", "c"]))
+    for code in CODES:
+        if before[code] != "d":
+            assert after[code] == before[code]
+    assert set(after.values()) == {"a", "b", "c"}
+
+
+class FakeShards:
+    """以記憶體中的房間集合模擬各 shard 的 /internal/shard 端點"""
+
+    def __init__(self, rooms, fail_import=()):
+        self.rooms = {shard: set(codes) for shard, codes in rooms.items()}
+        self.rings = {}
+        self.fail_import = set(fail_import)
+        self.calls = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        if request.headers.get(SHARD_SECRET_HEADER) != SECRET:
+            return httpx.Response(403, json={"detail": "Invalid shard secret"})
+        shard = f"http://{request.url.host}"
+        path = request.url.path
+        rooms = self.rooms.setdefault(shard, set())
+        self.calls.append((request.method, shard, path))
+        if path == "/internal/shard":
+            return httpx.Response(200, json={"rooms": sorted(rooms)})
+        if path == "/internal/shard/ring":
+            self.rings[shard] = request.content
+            return httpx.Response(200, json={})
+        if path == "/internal/shard/rooms/import":
+            if shard in self.fail_import:
+                return httpx.Response(500, json={"detail": "boom"})
+            code = request.content.decode()
+            rooms.add(code)
+            return httpx.Response(200, json={"rooms": [code]})
+        code = path.split("/")[4]
+        if code not in rooms:
+            return httpx.Response(404, json={"detail": "Room not found"})
+        if request.method == "GET":
+            return httpx.Response(200, content=code.encode())
+        rooms.discard(code)
+        return httpx.Response(200, json={"success": True})
+
+
+def rebalance(fake, old_shards, new_shards):
+    async def run():
+        dispatcher = Dispatcher(old_shards, SECRET)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(fake.handler)) as shard_client:
+            dispatcher._client = shard_client
+            try:
+                return await dispatcher.rebalance(new_shards), dispatcher.ring.shards
+            except RebalanceError:
+                return None, dispatcher.ring.shards
+    return asyncio.run(run())
+
+
+def test_rebalance_moves_rooms_before_switching_ring():
+    ring = HashRing(["http://s1", "http://s2"])
+    codes = CODES[:200]
+    fake = FakeShards({shard: [c for c in codes if ring.owner(c) == shard] for shard in ring.shards})
+    new_shards = ["http://s1", "http://s2", "http://s3"]
+
+    moved, current = rebalance(fake, ring.shards, new_shards)
+
+    assert current == new_shards
+    new_ring = HashRing(new_shards)
+    for shard in new_shards:
+        assert fake.rooms[shard] == {c for c in codes if new_ring.owner(c) == shard}
+    assert moved == {"http://s3": len(fake.rooms["http://s3"])}
+    assert set(fake.rings) == set(new_shards)
+    # 每個 shard 都在所有匯入完成之後才收到新的雜湊環，移除舊複本又在那之後
+    methods = [method for method, _, _ in fake.calls]
+    last_import = max(i for i, (_, _, path) in enumerate(fake.calls) if path.endswith("/import"))
+    first_ring = methods.index("PUT")
+    first_delete = methods.index("DELETE")
+    assert last_import < first_ring < first_delete
+
+
+def test_failed_import_keeps_rooms_and_ring():
+    ring = HashRing(["http://s1", "http://s2"])
+    codes = CODES[:200]
+    fake = FakeShards({shard: [c for c in codes if ring.owner(c) == shard] for shard in ring.shards},
+                      fail_import=["http://s3"])
+    before = {shard: set(rooms) for shard, rooms in fake.rooms.items()}
+
+    moved, current = rebalance(fake, ring.shards, ["http://s1", "http://s2", "http://s3"])
+
+    assert moved is None
+    assert current == ring.shards
+    assert fake.rings == {}
+    assert {shard: rooms for shard, rooms in fake.rooms.items() if rooms} == before
+
+
+@pytest.fixture
+def shard_client(client, monkeypatch):
+    monkeypatch.setattr(shard_config, "secret", SECRET)
+    client.app.include_router(sharding_api.router)
+    return client
+
+
+def test_internal_endpoints_require_secret(shard_client, make_room):
+    room = make_room()
+    assert shard_client.get(f"/internal/shard/rooms/{room}/export").status_code == 403
+    wrong = {SHARD_SECRET_HEADER: "wrong"}
+    assert shard_client.delete(f"/internal/shard/rooms/{room}", headers=wrong).status_code == 403
+    assert room_store.has_room(room)
+
+
+def test_export_drop_and_import_round_trip(shard_client, make_room, post_comment):
+    headers = {SHARD_SECRET_HEADER: SECRET}
+    room = make_room()
+    comment_id = post_comment(room, "搬家前的留言")
+    exported = shard_client.get(f"/internal/shard/rooms/{room}/export", headers=headers)
+    assert exported.status_code == 200
+
+    assert shard_client.delete(f"/internal/shard/rooms/{room}", headers=headers).json() == {"success": True}
+    assert not room_store.has_room(room)
+
+    imported = shard_client.post("/internal/shard/rooms/import", content=exported.content, headers=headers)
+    assert imported.json() == {"rooms": [room]}
+    comments = shard_client.get(f"/api/rooms/{room}/comments").json()["comments"]
+    assert [comment["id"] for comment in comments] == [comment_id]
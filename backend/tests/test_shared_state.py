@@ -0,0 +1,88 @@
+"""多個 worker 共用狀態：帶 worker 代號的版本號與參與者複製"""
+
+import pytest
+
+from backend.api.presence import presence_tracker
+from backend.api.room_store import RoomStore, room_store
+
+
+def test_tags_without_shared_backend_are_plain_numbers():
+    store = RoomStore()
+    assert store.tag(5) == 5
+    assert store.untag("5") == 5
+    assert store.untag("abc.5") is None
+    assert store.untag("x") is None
+
+
+def test_tags_from_other_workers_are_rejected():
+    store = RoomStore()
+    store.instance_id = "w1"
+    assert store.tag(5) == "w1.5"
+    assert store.untag("w1.5") == 5
+    assert store.untag("w2.5") is None
+    assert store.untag("5") is None
+
+
+def test_etag_and_cursor_from_another_worker_get_full_content(client, make_room, post_comment, monkeypatch):
+    room = make_room()
+    post_comment(room, "一")
+    monkeypatch.setattr(room_store, "instance_id", "w1")
+    first = client.get(f"/api/rooms/{room}/state")
+    etag, version = first.headers["ETag"], first.json()["version"]
+    assert version.startswith("w1.")
+    assert client.get(f"/api/rooms/{room}/state", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"/api/rooms/{room}/changes", params={"since": version}).json()["full"] is False
+
+    # 同一個版本號在另一個 worker 上代表不同的內容
+    monkeypatch.setattr(room_store, "instance_id", "w2")
+    assert client.get(f"/api/rooms/{room}/state", headers={"If-None-Match": etag}).status_code == 200
+    assert client.get(f"/api/rooms/{room}/changes", params={"since": version}).json()["full"] is True
+
+
+def test_participant_joined_on_another_worker_is_known_locally(client, make_room, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    from backend.api.redis_backend import RedisBackend
+
+    room = make_room()
+    server = fakeredis.FakeServer()
+    other = RedisBackend(client=fakeredis.FakeRedis(server=server))
+    local = RedisBackend(client=fakeredis.FakeRedis(server=server))
+    monkeypatch.setattr(local, "_store", room_store)
+
+    other.save_participant(room, "dev-1", "小明", 1.0)
+    other.flush()
+    entries = fakeredis.FakeRedis(server=server).xread({local.stream_key: b"0-0"})[0][1]
+    local._apply_entries(entries, notify=True)
+
+    assert [p["device_id"] for p in room_store.get_room(room)["participants_list"]] == ["dev-1"]
+    response = client.put(f"/api/rooms/{room}/participants/dev-1/nickname", json={"new_nickname": "小華"})
+    assert response.status_code == 200
+    assert presence_tracker.online(room) == [{"device_id": "dev-1", "nickname": "小華"}]
+
+    # 以此裝置的暱稱留言時帶上 device_id，改暱稱會一併更新
+    comment_id = client.post(f"/api/rooms/{room}/comments", json={"nickname": "小華", "content": "hi"}).json()["comment_id"]
+    assert room_store.find_comment(room, comment_id)[1].device_id == "dev-1"
+
+
+def test_room_deleted_on_another_worker_closes_local_connections(client, make_room, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    from starlette.websockets import WebSocketDisconnect
+    from backend.api.redis_backend import RedisBackend
+
+    room = make_room()
+    server = fakeredis.FakeServer()
+    other = RedisBackend(client=fakeredis.FakeRedis(server=server))
+    local = RedisBackend(client=fakeredis.FakeRedis(server=server))
+    monkeypatch.setattr(local, "_store", room_store)
+
+    with client.websocket_connect(f"/ws/rooms/{room}") as websocket:
+        assert websocket.receive_json()["type"] == "snapshot"
+        other.delete_room(room)
+        other.flush()
+        entries = fakeredis.FakeRedis(server=server).xread({local.stream_key: b"0-0"})[0][1]
+        local._apply_entries(entries, notify=True)
+
+        assert not room_store.has_room(room)
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+        assert closed.value.code == 4410
@@ -0,0 +1,125 @@
+"""SQLite 後端：重新啟動後的留言順序與序號、寫入失敗時的重試"""
+
+import sqlite3
+
+from backend.api.records import CommentRecord
+from backend.api.room_store import RoomStore
+from backend.api import storage
+from backend.api.storage import SQL_INSERT_COMMENT, SQLiteBackend
+
+
+def open_store(path):
+    store = RoomStore()
+    store.attach_backend(SQLiteBackend(str(path), flush_interval=0))
+    return store
+
+
+def comment_ids(store):
+    return [comment.id for comment in store.get_topic("R", "t")["comments"]]
+
+
+def test_order_survives_two_restarts(tmp_path):
+    path = tmp_path / "syncai.db"
+    store = open_store(path)
+    store.create_room("R", {"code": "R", "created_at": 1.0, "status": "Stop"})
+    for i in range(10):
+        store.add_comment("R", "t", CommentRecord(f"x{i}", "n", str(i), float(i)))
+    store.delete_comments("R", [f"x{i}" for i in range(5)])
+    store.backend.close()
+
+    store = open_store(path)
+    assert comment_ids(store) == ["x5", "x6", "x7", "x8", "x9"]
+    store.add_comment("R", "t", CommentRecord("NEW", "n", "new", 10.0))
+    assert store.get_topic("R", "t")["comments"][-1].seq == 11
+    store.backend.close()
+
+    store = open_store(path)
+    assert comment_ids(store) == ["x5", "x6", "x7", "x8", "x9", "NEW"]
+    page, _ = store.comment_page("R", "t", "time", "10", 10)
+    assert [comment.id for comment in page] == ["NEW"]
+    store.backend.close()
+
+
+def test_duplicate_seqs_are_renumbered_on_load(tmp_path):
+    path = tmp_path / "syncai.db"
+    store = open_store(path)
+    store.create_room("R", {"code": "R", "created_at": 1.0, "status": "Stop"})
+    for i in range(3):
+        store.add_comment("R", "t", CommentRecord(f"x{i}", "n", str(i), float(i)))
+    store.backend.close()
+    # 舊版重新編號後留下的重複序號
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE comments SET seq = 2 WHERE id = 'x2'")
+
+    store = open_store(path)
+    assert comment_ids(store) == ["x0", "x1", "x2"]
+    assert [comment.seq for comment in store.get_topic("R", "t")["comments"]] == [1, 2, 3]
+    store.backend.close()
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT seq FROM comments WHERE id = 'x2'").fetchone() == (3,)
+
+
+def test_busy_database_keeps_batch_and_retries(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "COMMIT_RETRY_DELAY", 0.001)
+    store = open_store(tmp_path / "syncai.db")
+    backend = store.backend
+    execute = backend._execute
+    failures = []
+
+    def flaky(batch):
+        if len(failures) < 3:
+            failures.append(backend.healthy)
+            raise sqlite3.OperationalError("database is locked")
+        return execute(batch)
+
+    monkeypatch.setattr(backend, "_execute", flaky)
+    store.create_room("R", {"code": "R", "created_at": 1.0, "status": "Stop"})
+    store.add_comment("R", "t", CommentRecord("c1", "n", "內容", 1.0))
+    backend.flush()
+    # 第一次失敗前是正常的，之後標記為不健康，成功後恢復
+    assert failures == [True, False, False]
+    assert backend.healthy and backend.last_error is None
+    backend.close()
+
+    store = open_store(tmp_path / "syncai.db")
+    assert comment_ids(store) == ["c1"]
+    store.backend.close()
+
+
+def test_invalid_statement_only_drops_itself(tmp_path):
+    store = open_store(tmp_path / "syncai.db")
+    backend = store.backend
+    store.create_room("R", {"code": "R", "created_at": 1.0, "status": "Stop"})
+    store.add_comment("R", "t", CommentRecord("c1", "n", "1", 1.0))
+    # nickname 為 NOT NULL，這筆違反限制
+    backend._enqueue(SQL_INSERT_COMMENT, ("bad", "R", "t", 9, None, None, "x", 1.0, 0))
+    store.add_comment("R", "t", CommentRecord("c2", "n", "2", 2.0))
+    backend.flush()
+    assert backend.dropped_writes == 1
+    backend.close()
+
+    store = open_store(tmp_path / "syncai.db")
+    assert comment_ids(store) == ["c1", "c2"]
+    store.backend.close()
+
+
+def test_room_fields_without_version_bump_are_saved(tmp_path):
+    store = open_store(tmp_path / "syncai.db")
+    store.create_room("R", {"code": "R", "created_at": 1.0, "status": "Stop", "workspace_slug": None})
+    store.update_room("R", {"workspace_slug": "room-r", "workspace_id": 7})
+    store.backend.close()
+
+    store = open_store(tmp_path / "syncai.db")
+    room = store.get_room("R")
+    assert (room["workspace_slug"], room["workspace_id"]) == ("room-r", 7)
+    store.backend.close()
+
+
+def test_default_storage_uses_redis_only_for_multiple_workers(monkeypatch):
+    monkeypatch.delenv("SYNCAI_SQLITE_PATH", raising=False)
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    assert storage.default_storage_kind() == "memory"
+    monkeypatch.setenv("SYNCAI_SQLITE_PATH", "data/syncai.db")
+    assert storage.default_storage_kind() == "sqlite"
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert storage.default_storage_kind() == "redis"
@@ -0,0 +1,90 @@
+"""投票帳本：改票、撤回與批次投票"""
+
+from backend.api.vote_ledger import VoteLedger
+
+
+def test_cast_flip_and_retract():
+    ledger = VoteLedger()
+    assert ledger.cast("R1", "c1", "d1", "good")
+    assert not ledger.cast("R1", "c1", "d1", "good")
+    assert ledger.cast("R1", "c1", "d2", "good")
+    assert ledger.counts("c1") == (2, 0)
+
+    # 改投差評：好評減一、差評加一，個人紀錄跟著改
+    assert ledger.cast("R1", "c1", "d1", "bad")
+    assert ledger.counts("c1") == (1, 1)
+    assert ledger.device_votes("R1", "d1") == {"c1": "bad"}
+    assert sorted(ledger.voters("c1")) == [("d1", "bad"), ("d2", "good")]
+
+    # 撤回的類型不符時不變
+    assert not ledger.retract("R1", "c1", "d1", "good")
+    assert ledger.retract("R1", "c1", "d1", "bad")
+    assert ledger.counts("c1") == (1, 0)
+    assert ledger.device_votes("R1", "d1") == {}
+
+    assert ledger.retract("R1", "c1", "d2", "good")
+    assert ledger.counts("c1") == (0, 0)
+    assert ledger.as_dict() == {}
+
+
+def test_device_votes_are_scoped_to_room_and_copied():
+    ledger = VoteLedger()
+    ledger.cast("R1", "c1", "d1", "good")
+    ledger.cast("R2", "c2", "d1", "bad")
+    votes = ledger.device_votes("R1", "d1")
+    assert votes == {"c1": "good"}
+    votes["c9"] = "good"
+    assert ledger.device_votes("R1", "d1") == {"c1": "good"}
+    assert ledger.device_votes("R2", "d1") == {"c2": "bad"}
+
+
+def test_drop_comment_clears_device_index():
+    ledger = VoteLedger()
+    ledger.cast("R1", "c1", "d1", "good")
+    ledger.cast("R1", "c2", "d1", "bad")
+    ledger.drop_comment("R1", "c1")
+    assert ledger.counts("c1") == (0, 0)
+    assert ledger.device_votes("R1", "d1") == {"c2": "bad"}
+    ledger.drop_comment("R1", "c2")
+    assert ledger.device_votes("R1", "d1") == {}
+
+
+def test_vote_endpoints_flip(client, make_room, post_comment):
+    room = make_room()
+    comment_id = post_comment(room, "留言")
+    url = f"/api/rooms/{room}/comments/{comment_id}/vote"
+
+    assert client.post(url, json={"device_id": "d1", "vote_type": "good"}).status_code == 200
+    assert client.post(url, json={"device_id": "d1", "vote_type": "good"}).status_code == 409
+    assert client.post(url, json={"device_id": "d1", "vote_type": "bad"}).status_code == 200
+    comment = client.get(f"/api/rooms/{room}/comments").json()["comments"][0]
+    assert (comment["vote_good"], comment["vote_bad"]) == (0, 1)
+    assert client.get(f"/api/rooms/{room}/votes", params={"device_id": "d1"}).json() == {
+        "voted_good": [], "voted_bad": [comment_id]}
+
+    assert client.request("DELETE", url, json={"device_id": "d1", "vote_type": "good"}).status_code == 404
+    assert client.request("DELETE", url, json={"device_id": "d1", "vote_type": "bad"}).status_code == 200
+    comment = client.get(f"/api/rooms/{room}/comments").json()["comments"][0]
+    assert (comment["vote_good"], comment["vote_bad"]) == (0, 0)
+
+
+def test_batch_votes(client, make_room, post_comment):
+    room = make_room()
+    first = post_comment(room, "一")
+    second = post_comment(room, "二")
+    response = client.post(f"/api/rooms/{room}/votes:batch", json={"device_id": "d1", "votes": [
+        {"comment_id": first, "vote_type": "good"},
+        {"comment_id": first, "vote_type": "bad"},
+        {"comment_id": second, "vote_type": "good"},
+        {"comment_id": second, "vote_type": "good"},
+        {"comment_id": second, "vote_type": "good", "action": "retract"},
+        {"comment_id": "missing", "vote_type": "good"},
+        {"comment_id": first, "vote_type": "meh"},
+    ]})
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["status"] for r in body["results"]] == [
+        "ok", "ok", "ok", "already_voted", "ok", "not_found", "invalid"]
+    counts = {c["comment_id"]: (c["vote_good"], c["vote_bad"]) for c in body["counts"]}
+    assert counts == {first: (0, 1), second: (0, 0)}
+    assert body["voted_good"] == [] and body["voted_bad"] == [first]
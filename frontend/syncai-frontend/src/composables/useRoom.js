@@ -1,6 +1,7 @@
 import { ref, onMounted, onBeforeUnmount, computed } from 'vue';
 import { useRoute, useRouter } from 'vue-router';
 import { API_BASE_URL } from '@/utils/api';
+import { openRoomChannel } from '@/utils/roomChannel';
 
 export function useRoom() {
   const route = useRoute();
@@ -19,6 +20,13 @@ export function useRoom() {
 
   // --- Private Vars ---
   let statePoller, localTimerPoller, heartbeatPoller;
+  let roomChannel = null;
+  let roomStateEtag = null;
+  let roomVersion = null;
+  // 尚未送出的投票操作，短時間內的多次點擊合併成一次批次請求
+  let pendingVotes = [];
+  let voteFlushTimer = null;
+  const VOTE_BATCH_DELAY = 150;
   const getRoomNicknameKey = () => `nickname_${roomCode.value}`;
 
   // --- Computed ---
@@ -46,10 +54,22 @@ export function useRoom() {
 
   const clearAllPolling = () => {
     clearInterval(statePoller);
+    statePoller = null;
     clearInterval(localTimerPoller);
     clearInterval(heartbeatPoller);
+    // 離開頁面前送出還在等待合併的投票
+    if (voteFlushTimer) {
+      clearTimeout(voteFlushTimer);
+      flushVotes();
+    }
+    if (roomChannel) {
+      roomChannel.close();
+      roomChannel = null;
+    }
   };
 
+  const isChannelOpen = () => !!roomChannel && roomChannel.isOpen();
+
   const goHome = () => {
     clearAllPolling();
     router.push('/');
@@ -58,24 +78,124 @@ export function useRoom() {
   const fetchRoomState = async () => {
     if (!roomCode.value) return 'NotFound';
     try {
-      const response = await fetch(`${API_BASE_URL}/api/rooms/${roomCode.value}/state`);
+      // 帶上 ETag，房間沒有變更時後端回傳 304，沿用目前狀態並由本地計時器遞減倒數
+      const headers = roomStateEtag ? { 'If-None-Match': roomStateEtag } : {};
+      const response = await fetch(`${API_BASE_URL}/api/rooms/${roomCode.value}/state`, { headers, cache: 'no-store' });
+      if (response.status === 304) return roomStatus.value;
       if (response.status === 404) throw new Error('NotFound');
       if (!response.ok) throw new Error(`HTTP Error ${response.status}`);
       const data = await response.json();
-      roomStatus.value = data.status;
-      currentTopic.value = data.topic || '等待主持人設定主題';
-      questions.value = data.comments || [];
-      remainingTime.value = (data.status === 'End' || data.status === 'Stop') ? 0 : (data.countdown || 0);
+      roomStateEtag = response.headers.get('ETag');
+      applyRoomState(data);
       return data.status;
     } catch (error) {
-      roomStatus.value = 'NotFound';
-      clearAllPolling();
-      showNotification('討論不存在或已結束', 'error');
-      setTimeout(goHome, 3000);
+      handleRoomNotFound();
       return 'NotFound';
     }
   };
 
+  // 輪詢時只取得上次版本之後的變更
+  const pollRoomChanges = async () => {
+    if (roomVersion === null) return fetchRoomState();
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/rooms/${roomCode.value}/changes?since=${roomVersion}`, { cache: 'no-store' });
+      if (response.status === 404) throw new Error('NotFound');
+      if (!response.ok) throw new Error(`HTTP Error ${response.status}`);
+      applyRoomChanges(await response.json());
+    } catch (error) {
+      handleRoomNotFound();
+    }
+  };
+
+  const applyRoomChanges = (data) => {
+    if (data.full) {
+      applyRoomState(data);
+      return;
+    }
+    roomVersion = data.version;
+    roomStatus.value = data.status;
+    currentTopic.value = data.topic || '等待主持人設定主題';
+    remainingTime.value = (data.status === 'End' || data.status === 'Stop') ? 0 : (data.countdown || 0);
+    if (data.removed.length) {
+      const removed = new Set(data.removed);
+      questions.value = questions.value.filter(q => !removed.has(q.id));
+    }
+    data.added.forEach(comment => {
+      if (!questions.value.some(q => q.id === comment.id)) questions.value.push(comment);
+    });
+    applyVoteCounts(data.votes);
+    data.nicknames.forEach(({ device_id, nickname }) => {
+      questions.value.forEach(q => {
+        if (q.device_id === device_id) q.nickname = nickname;
+      });
+    });
+  };
+
+  // 套用 {comment_id, vote_good, vote_bad, votes} 票數列表
+  const applyVoteCounts = (updates) => {
+    if (!updates.length) return;
+    const byId = new Map(questions.value.map(q => [q.id, q]));
+    updates.forEach(update => {
+      const question = byId.get(update.comment_id);
+      if (question) {
+        question.vote_good = update.vote_good;
+        question.vote_bad = update.vote_bad;
+        question.votes = update.votes;
+      }
+    });
+  };
+
+  const applyRoomState = (data) => {
+    roomVersion = data.version ?? null;
+    roomStatus.value = data.status;
+    currentTopic.value = data.topic || '等待主持人設定主題';
+    questions.value = data.comments || [];
+    remainingTime.value = (data.status === 'End' || data.status === 'Stop') ? 0 : (data.countdown || 0);
+  };
+
+  const handleRoomNotFound = () => {
+    roomStatus.value = 'NotFound';
+    clearAllPolling();
+    showNotification('討論不存在或已結束', 'error');
+    setTimeout(goHome, 3000);
+  };
+
+  // 套用 WebSocket 推播的房間事件
+  const applyRoomEvent = (event) => {
+    const data = event.data || {};
+    switch (event.type) {
+      case 'snapshot':
+        applyRoomState(data);
+        break;
+      case 'comment_added':
+        if (data.topic === currentTopic.value && !questions.value.some(q => q.id === data.comment.id)) {
+          questions.value.push(data.comment);
+        }
+        break;
+      case 'comment_deleted':
+        questions.value = questions.value.filter(q => q.id !== data.comment_id);
+        break;
+      case 'votes':
+        applyVoteCounts([data]);
+        break;
+      case 'status':
+        roomStatus.value = data.status;
+        remainingTime.value = (data.status === 'End' || data.status === 'Stop') ? 0 : (data.countdown || 0);
+        break;
+      case 'topics':
+        currentTopic.value = data.current_topic || '等待主持人設定主題';
+        break;
+      case 'nickname':
+        questions.value.forEach(q => {
+          if (q.device_id === data.device_id) q.nickname = data.nickname;
+        });
+        break;
+      case 'error':
+        handleRoomNotFound();
+        break;
+    }
+  };
+
   const submitQuestion = async (content) => {
     if (!content.trim() || !roomCode.value) return;
     try {
@@ -85,28 +205,54 @@ export function useRoom() {
         body: JSON.stringify({ content, nickname: currentNickname.value, isAISummary: false })
       });
       if (!response.ok) throw new Error('提交失敗');
-      await fetchRoomState();
+      if (!isChannelOpen()) await fetchRoomState();
       showNotification('意見已提交', 'success');
     } catch (error) {
       showNotification(error.message, 'error');
     }
   };
 
-  const voteQuestion = async (questionId, voteType) => {
-    const isVoted = votedQuestions.value[voteType].has(questionId);
-    const method = isVoted ? 'DELETE' : 'POST';
+  // 先在畫面上切換投票狀態，操作排入佇列後批次送出
+  const voteQuestion = (questionId, voteType) => {
+    const voted = votedQuestions.value;
+    const action = voted[voteType].has(questionId) ? 'retract' : 'cast';
+    if (action === 'cast') {
+      voted[voteType].add(questionId);
+      voted[voteType === 'good' ? 'bad' : 'good'].delete(questionId);
+    } else {
+      voted[voteType].delete(questionId);
+    }
+    pendingVotes.push({ comment_id: questionId, vote_type: voteType, action });
+    clearTimeout(voteFlushTimer);
+    voteFlushTimer = setTimeout(flushVotes, VOTE_BATCH_DELAY);
+  };
+
+  const flushVotes = async () => {
+    voteFlushTimer = null;
+    if (!pendingVotes.length || !roomCode.value) return;
+    const batch = pendingVotes;
+    pendingVotes = [];
     try {
-      const response = await fetch(`${API_BASE_URL}/api/rooms/${roomCode.value}/comments/${questionId}/vote`, {
-        method,
+      const response = await fetch(`${API_BASE_URL}/api/rooms/${roomCode.value}/votes:batch`, {
+        method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ device_id: deviceId.value, vote_type: voteType })
+        body: JSON.stringify({ device_id: deviceId.value, votes: batch })
       });
-      if (!response.ok) throw new Error('投票失敗');
-      await fetchUserVotes();
-      await fetchRoomState();
+      if (!response.ok) {
+        const data = await response.json().catch(() => ({}));
+        throw new Error(data.detail || '投票失敗');
+      }
+      const data = await response.json();
+      // 回應已包含最新票數與投票紀錄，不需要再重新取得；期間又有新的點擊時保留畫面上的狀態
+      applyVoteCounts(data.counts);
+      if (!pendingVotes.length) {
+        votedQuestions.value.good = new Set(data.voted_good);
+        votedQuestions.value.bad = new Set(data.voted_bad);
+      }
       showNotification('投票操作成功', 'success');
     } catch (error) {
       showNotification(error.message, 'error');
+      await fetchUserVotes();
     }
   };
 
@@ -125,6 +271,8 @@ export function useRoom() {
 
   const sendHeartbeat = async () => {
     if (!roomCode.value || !deviceId.value) return;
+    // 推播通道可用時，心跳直接走同一條連線
+    if (roomChannel && roomChannel.send({ type: 'heartbeat', device_id: deviceId.value })) return;
     try {
       await fetch(`${API_BASE_URL}/api/participants/heartbeat`, {
         method: 'POST',
@@ -200,14 +348,35 @@ export function useRoom() {
       localStorage.setItem(getRoomNicknameKey(), newNickname);
       currentNickname.value = newNickname;
       showNotification(`暱稱已更新為「${newNickname}」`, 'success');
-      await fetchRoomState();
+      if (!isChannelOpen()) await fetchRoomState();
     } catch (error) {
       showNotification(error.message, 'error');
     }
   };
 
+  // HTTP 輪詢只在推播通道不可用時啟動
+  const startStatePolling = () => {
+    if (!statePoller) statePoller = setInterval(pollRoomChanges, 3000);
+  };
+
+  const stopStatePolling = () => {
+    clearInterval(statePoller);
+    statePoller = null;
+  };
+
+  const connectRoomChannel = () => {
+    roomChannel = openRoomChannel(roomCode.value, {
+      onEvent: applyRoomEvent,
+      onOpen: stopStatePolling,
+      onClose: () => {
+        if (roomChannel) startStatePolling();
+      }
+    });
+  };
+
   const startPolling = () => {
-    statePoller = setInterval(fetchRoomState, 3000);
+    startStatePolling();
+    connectRoomChannel();
     localTimerPoller = setInterval(() => {
       if (remainingTime.value > 0 && roomStatus.value === 'Discussion') {
         remainingTime.value--;
@@ -0,0 +1,103 @@
+// 討論室即時推播通道
+// 優先透過 WebSocket 接收房間快照與增量事件，斷線時自動重連；
+// 若 WebSocket 始終無法建立（例如代理伺服器擋下 Upgrade），改用 SSE，
+// 由瀏覽器自動帶上 Last-Event-ID 續傳。兩者皆不可用期間由呼叫端退回 HTTP 輪詢。
+import { API_BASE_URL } from '@/utils/api';
+
+const WS_BASE_URL = API_BASE_URL.replace(/^http/, 'ws');
+const MAX_RETRY_DELAY = 30000;
+const WS_FAILURES_BEFORE_SSE = 2;
+
+export function openRoomChannel(roomCode, { onEvent, onOpen, onClose } = {}) {
+  let socket = null;
+  let eventSource = null;
+  let closedByUser = false;
+  let retryDelay = 1000;
+  let retryTimer = null;
+  let wsFailures = 0;
+
+  const isOpen = () => {
+    if (socket) return socket.readyState === WebSocket.OPEN;
+    if (eventSource) return eventSource.readyState === EventSource.OPEN;
+    return false;
+  };
+
+  const handleMessage = (message) => {
+    let event;
+    try {
+      event = JSON.parse(message.data);
+    } catch (error) {
+      return;
+    }
+    if (!onEvent) return;
+    // 同一批寫入的多個事件由後端合併成一個 batch 事件，依序展開
+    if (event.type === 'batch') {
+      for (const sub of event.data.events) {
+        onEvent({ ...sub, id: event.id, room: event.room, ts: event.ts });
+      }
+      return;
+    }
+    onEvent(event);
+  };
+
+  const connectEventSource = () => {
+    socket = null;
+    eventSource = new EventSource(`${API_BASE_URL}/api/rooms/${roomCode}/events`);
+    eventSource.onopen = () => {
+      if (onOpen) onOpen();
+    };
+    eventSource.onmessage = handleMessage;
+    // EventSource 會自行重連，這裡只通知呼叫端暫時退回輪詢
+    eventSource.onerror = () => {
+      if (onClose) onClose();
+    };
+  };
+
+  const connectWebSocket = () => {
+    let opened = false;
+    socket = new WebSocket(`${WS_BASE_URL}/ws/rooms/${roomCode}`);
+    socket.onopen = () => {
+      opened = true;
+      wsFailures = 0;
+      retryDelay = 1000;
+      if (onOpen) onOpen();
+    };
+    socket.onmessage = handleMessage;
+    socket.onclose = () => {
+      if (onClose) onClose();
+      if (closedByUser) return;
+      if (!opened) wsFailures++;
+      if (wsFailures >= WS_FAILURES_BEFORE_SSE && typeof EventSource !== 'undefined') {
+        connectEventSource();
+        return;
+      }
+      retryTimer = setTimeout(connectWebSocket, retryDelay);
+      retryDelay = Math.min(retryDelay * 2, MAX_RETRY_DELAY);
+    };
+    socket.onerror = () => socket.close();
+  };
+
+  if (typeof WebSocket !== 'undefined') {
+    connectWebSocket();
+  } else if (typeof EventSource !== 'undefined') {
+    connectEventSource();
+  } else if (onClose) {
+    onClose();
+  }
+
+  return {
+    isOpen,
+    // WebSocket 連線中才送出，回傳是否送出成功（SSE 為單向，呼叫端需改走 HTTP）
+    send(payload) {
+      if (!socket || socket.readyState !== WebSocket.OPEN) return false;
+      socket.send(JSON.stringify(payload));
+      return true;
+    },
+    close() {
+      closedByUser = true;
+      clearTimeout(retryTimer);
+      if (socket) socket.close();
+      if (eventSource) eventSource.close();
+    }
+  };
+}